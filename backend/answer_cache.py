@@ -0,0 +1,196 @@
+"""Semantic answer cache for first-turn chat questions.
+
+Answers are keyed by the normalized question text. A lookup hits either on an
+exact normalized match or, failing that, on the most similar cached question
+whose embedding cosine similarity reaches the threshold. The cache is scoped
+to one index version: when the corpus changes every cached answer is dropped.
+Entries expire after a TTL and the least recently used ones are evicted once
+the cache is full.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n?!.,;:\"'"
+
+
+def normalize_question(question: str) -> str:
+    """Case-folded question with collapsed whitespace and no edge punctuation."""
+    return _WHITESPACE.sub(" ", question.casefold()).strip(_EDGE_PUNCTUATION)
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: list
+    embedding: Optional[np.ndarray] = None
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class AnswerCache:
+    """LRU/TTL-bounded map of normalized question -> answer, for one index version."""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.95,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Values above 1 disable similarity matching (exact matches only)
+        self.similarity_threshold = similarity_threshold
+        self.index_version: Optional[str] = None
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Stacked embeddings of the entries, rebuilt lazily after changes
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold <= 1
+
+    def set_index_version(self, version: str) -> None:
+        """Scopes the cache to an index version, dropping answers of any other one."""
+        with self._lock:
+            if version == self.index_version:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self.index_version = version
+            self._entries.clear()
+            self._matrix = None
+
+    def lookup_exact(self, question: str) -> Optional[CachedAnswer]:
+        """Exact normalized match; does not count a miss (see `lookup_similar`)."""
+        key = normalize_question(question)
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.exact_hits += 1
+            return entry
+
+    def lookup_similar(
+        self, embedding: Sequence[float]
+    ) -> Optional[Tuple[CachedAnswer, float]]:
+        """Most similar cached question at or above the threshold, with its similarity."""
+        with self._lock:
+            self._evict_expired()
+            match = None
+            if self.semantic_enabled:
+                match = self._best_match(_unit(embedding))
+            if match is None:
+                self.misses += 1
+                return None
+            key, similarity = match
+            entry = self._entries[key]
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.semantic_hits += 1
+            return entry, similarity
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def put(
+        self,
+        question: str,
+        answer: str,
+        sources: list,
+        embedding: Optional[Sequence[float]],
+        index_version: Optional[str],
+    ) -> None:
+        """Caches an answer computed against `index_version` (ignored if it is stale)."""
+        key = normalize_question(question)
+        if not key or not answer:
+            return
+        with self._lock:
+            if index_version != self.index_version:
+                return
+            self._entries[key] = CachedAnswer(
+                question=question,
+                answer=answer,
+                sources=sources,
+                embedding=None if embedding is None else _unit(embedding),
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            key for key, entry in self._entries.items() if entry.created_at < cutoff
+        ]
+        for key in expired:
+            del self._entries[key]
+            self.evictions += 1
+        if expired:
+            self._matrix = None
+
+    def _best_match(self, query: np.ndarray) -> Optional[Tuple[str, float]]:
+        if self._matrix is None:
+            self._matrix_keys = [
+                key
+                for key, entry in self._entries.items()
+                if entry.embedding is not None
+            ]
+            self._matrix = (
+                np.stack([self._entries[key].embedding for key in self._matrix_keys])
+                if self._matrix_keys
+                else np.empty((0, len(query)), dtype=np.float32)
+            )
+        if not len(self._matrix_keys):
+            return None
+        similarities = self._matrix @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return self._matrix_keys[best], float(similarities[best])
+
+
+def _unit(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
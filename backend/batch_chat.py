@@ -0,0 +1,139 @@
+"""Batch answering of independent, stateless questions.
+
+The query embeddings of the whole batch are computed concurrently and
+retrieval runs for every question up front; synthesis, the LLM-bound part,
+then runs concurrently up to a limit. Answers are yielded in
+question order as soon as each one and all before it are done, so a batch
+takes about as long as its slowest question rather than the sum of them.
+
+Questions are first-turn questions without history, so they share the
+answer cache with /api/chat: cached answers are returned without retrieval
+or synthesis and new answers are cached. Repeated questions within a batch
+are answered once.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import QueryBundle
+
+from answer_cache import AnswerCache, normalize_question
+from embedding_cache import aget_query_embeddings
+
+
+@dataclass
+class BatchAnswer:
+    index: int
+    question: str
+    response: Optional[str] = None
+    sources: Optional[list] = None
+    cached: bool = False
+    # Set instead of the response when this question failed
+    error: Optional[str] = None
+
+
+async def answer_batch(
+    questions: List[str],
+    query_engine,
+    embed_model: BaseEmbedding,
+    answer_cache: AnswerCache,
+    serialize_sources: Callable[[list], list],
+    max_concurrency: int = 8,
+) -> AsyncIterator[BatchAnswer]:
+    """Answers `questions` with a retriever query engine, yielding answers in order.
+
+    A failing question is reported in its answer's `error` and does not
+    affect the others.
+    """
+    index_version = answer_cache.index_version
+    # One entry per distinct question; duplicates reuse its answer
+    first_index: Dict[str, int] = {}
+    for i, question in enumerate(questions):
+        first_index.setdefault(normalize_question(question), i)
+    unique = sorted(first_index.values())
+
+    answers: Dict[int, BatchAnswer] = {}
+    pending = []
+    for i in unique:
+        entry = answer_cache.lookup_exact(questions[i])
+        if entry is not None:
+            answers[i] = _cached_answer(i, questions[i], entry)
+        else:
+            pending.append(i)
+
+    embeddings = await aget_query_embeddings(
+        embed_model, [questions[i] for i in pending]
+    )
+    bundles = {}
+    for i, embedding in zip(pending, embeddings):
+        match = answer_cache.lookup_similar(embedding)
+        if match is not None:
+            answers[i] = _cached_answer(i, questions[i], match[0])
+        else:
+            bundles[i] = QueryBundle(query_str=questions[i], embedding=embedding)
+
+    # Retrieval is local and cheap, so it runs for the whole batch at once
+    retrieved = await asyncio.gather(
+        *(query_engine.aretrieve(bundle) for bundle in bundles.values()),
+        return_exceptions=True,
+    )
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def synthesize(i: int, nodes) -> BatchAnswer:
+        try:
+            if isinstance(nodes, BaseException):
+                raise nodes
+            async with semaphore:
+                response = await query_engine.asynthesize(bundles[i], nodes)
+            answer = BatchAnswer(
+                index=i,
+                question=questions[i],
+                response=str(response),
+                sources=serialize_sources(response.source_nodes),
+            )
+            answer_cache.put(
+                answer.question,
+                answer.response,
+                answer.sources,
+                bundles[i].embedding,
+                index_version,
+            )
+            return answer
+        except Exception as e:
+            logging.exception(f"Error answering batch question {i}:")
+            return BatchAnswer(index=i, question=questions[i], error=str(e))
+
+    tasks = {
+        i: asyncio.ensure_future(synthesize(i, nodes))
+        for i, nodes in zip(bundles, retrieved)
+    }
+    try:
+        for i, question in enumerate(questions):
+            source = first_index[normalize_question(question)]
+            if source not in answers:
+                answers[source] = await tasks[source]
+            answer = answers[source]
+            yield BatchAnswer(
+                index=i,
+                question=question,
+                response=answer.response,
+                sources=answer.sources,
+                cached=answer.cached or source != i,
+                error=answer.error,
+            )
+    finally:
+        for task in tasks.values():  # The client went away mid-batch
+            task.cancel()
+
+
+def _cached_answer(index: int, question: str, entry) -> BatchAnswer:
+    return BatchAnswer(
+        index=index,
+        question=question,
+        response=entry.answer,
+        sources=entry.sources,
+        cached=True,
+    )
@@ -0,0 +1,140 @@
+"""Recall vs. latency of IVF search compared with exact search.
+
+Builds a memory-mapped vector store over synthetic clustered embeddings,
+persists it once with exact search and once with an IVF index, and reports
+recall@k and query latency for a range of `ivf_probes` values.
+
+    python benchmarks/ann_recall.py --vectors 100000 --dim 384
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_store import MmapVectorStore, store_base_path  # noqa: E402
+
+
+def synthetic_embeddings(
+    n: int, dim: int, topics: int, spread: float, seed: int
+) -> np.ndarray:
+    """Unit vectors scattered around `topics` centres, like chunk embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim)).astype(np.float32)
+    labels = rng.integers(0, topics, n)
+    vectors = centres[labels] + spread * rng.standard_normal((n, dim)).astype(
+        np.float32
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_store(vectors: np.ndarray, persist_dir: str, **options) -> MmapVectorStore:
+    store = MmapVectorStore(**options)
+    nodes = [
+        TextNode(id_=str(i), text="", embedding=vector.tolist())
+        for i, vector in enumerate(vectors)
+    ]
+    store.add(nodes)
+    started = time.perf_counter()
+    store.persist(f"{store_base_path(persist_dir)}.json")
+    print(f"Persisted {options} in {time.perf_counter() - started:.1f}s")
+    return store
+
+
+def run_queries(store: MmapVectorStore, queries: np.ndarray, k: int, **kwargs):
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        result = store.query(
+            VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=k),
+            **kwargs,
+        )
+        latencies.append(time.perf_counter() - started)
+        results.append(result.ids)
+    return results, np.asarray(latencies) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--spread", type=float, default=0.35, help="Topic spread")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-noise", type=float, default=0.1)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=0, help="0: sqrt(vectors)")
+    parser.add_argument("--probes", default="1,2,4,8,16,32")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "int8"])
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(
+        args.vectors, args.dim, args.topics, args.spread, seed=0
+    )
+    rng = np.random.default_rng(1)
+    picks = rng.choice(args.vectors, args.queries, replace=False)
+    queries = vectors[picks] + args.query_noise * rng.standard_normal(
+        (args.queries, args.dim)
+    ).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = build_store(vectors, os.path.join(tmp, "exact"), dtype=args.dtype)
+        ivf = build_store(
+            vectors,
+            os.path.join(tmp, "ivf"),
+            dtype=args.dtype,
+            search="ivf",
+            ivf_lists=args.lists,
+            ivf_min_rows=0,
+        )
+        truth, exact_ms = run_queries(exact, queries, args.top_k)
+        rows = [
+            {
+                "search": "exact",
+                "probes": None,
+                "recall": 1.0,
+                "p50_ms": float(np.percentile(exact_ms, 50)),
+                "p95_ms": float(np.percentile(exact_ms, 95)),
+            }
+        ]
+        for probes in [int(p) for p in args.probes.split(",")]:
+            found, ivf_ms = run_queries(ivf, queries, args.top_k, ivf_probes=probes)
+            recall = np.mean(
+                [len(set(a) & set(b)) / len(b) for a, b in zip(found, truth) if len(b)]
+            )
+            rows.append(
+                {
+                    "search": "ivf",
+                    "probes": probes,
+                    "recall": float(recall),
+                    "p50_ms": float(np.percentile(ivf_ms, 50)),
+                    "p95_ms": float(np.percentile(ivf_ms, 95)),
+                }
+            )
+
+    print(
+        f"\n{args.vectors} vectors, dim {args.dim}, {ivf.stats()['ivf_lists']} lists, "
+        f"recall@{args.top_k}"
+    )
+    print(f"{'search':<8}{'probes':>8}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for row in rows:
+        print(
+            f"{row['search']:<8}{row['probes'] or '-':>8}{row['recall']:>9.3f}"
+            f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
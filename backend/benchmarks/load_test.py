@@ -0,0 +1,358 @@
+"""Offline load test of the FastAPI backend.
+
+Starts the server with MODEL_BACKEND=fake (deterministic local LLM and
+embedding models with configurable latency, see fake_models.py) against
+synthetic PDF corpora of the requested sizes and measures, per corpus:
+
+- startup: seconds until the port is bound and until /api/ready (cold build
+  and warm restart from the persisted index),
+- per endpoint: p50/p95/p99 latency, requests/sec and errors (plus time to
+  first token for the streaming chat),
+- peak RSS of the server process.
+
+Results are written to benchmarks/results/<timestamp>_<commit>.json and
+compared with the previous run for the same corpus, so regressions between
+commits are visible.
+
+    python benchmarks/load_test.py --pages 20,200 --requests 100 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from synthetic_corpus import OBJECTS, generate_corpus  # noqa: E402
+
+ENDPOINTS = ("chat", "chat_stream", "summarize")
+TOPICS = [obj.split(" {n}")[0] for obj in OBJECTS]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """Peak resident set size of a process (Linux /proc; None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def summarize_latencies(latencies_ms: List[float]) -> dict:
+    if not latencies_ms:
+        return {}
+    values = np.asarray(latencies_ms)
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "mean_ms": round(float(values.mean()), 1),
+        "max_ms": round(float(values.max()), 1),
+    }
+
+
+class Server:
+    """The backend running in a subprocess against a given workspace."""
+
+    def __init__(self, workspace: str, env: Dict[str, str]):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.log_path = os.path.join(workspace, "server.log")
+        self.env = {
+            **os.environ,
+            "MODEL_BACKEND": "fake",
+            "PDF_DIR": os.path.join(workspace, "data"),
+            "PERSIST_DIR": os.path.join(workspace, "storage"),
+            "CACHE_DIR": os.path.join(workspace, "cache"),
+            **env,
+        }
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port)],
+            cwd=BACKEND_DIR,
+            env=self.env,
+            stdout=self._log,
+            stderr=subprocess.STDOUT,
+        )
+
+    def wait_for(self, path: str, timeout: float) -> float:
+        """Seconds from process start until `path` answers 200."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited; see {self.log_path}")
+            try:
+                if httpx.get(self.base_url + path, timeout=2).status_code == 200:
+                    return round(time.perf_counter() - self.started_at, 2)
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+        raise TimeoutError(f"{path} not ready after {timeout}s; see {self.log_path}")
+
+    def stop(self) -> Optional[float]:
+        """Stops the server and returns its peak RSS in MB."""
+        rss = peak_rss_mb(self.process.pid)
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+        return rss
+
+
+def make_questions(count: int, repeat_ratio: float, seed: int = 0) -> List[str]:
+    """Distinct first-turn questions, with a share of repeats (answer cache hits)."""
+    rng = random.Random(seed)
+    questions: List[str] = []
+    for number in range(count):
+        if questions and rng.random() < repeat_ratio:
+            questions.append(rng.choice(questions))
+        else:
+            a, b = rng.sample(TOPICS, 2)
+            questions.append(f"Case {seed}-{number}: how do {a} and {b} compare?")
+    return questions
+
+
+async def timed_request(client: httpx.AsyncClient, endpoint: str, payload) -> dict:
+    started = time.perf_counter()
+    if endpoint == "chat":
+        response = await client.post("/api/chat", json={"message": payload})
+        response.raise_for_status()
+        return {"latency_ms": (time.perf_counter() - started) * 1000}
+    if endpoint == "chat_stream":
+        first_token_ms = None
+        async with client.stream(
+            "POST", "/api/chat/stream", json={"message": payload}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[6:])
+                if event["type"] == "error":
+                    raise RuntimeError(event["message"])
+                if event["type"] == "token" and first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+        return {
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "ttft_ms": first_token_ms,
+        }
+    # Crew mode is not measured: its agents' LLM is not faked (see README.md)
+    response = await client.get(
+        "/api/summarize_esg", params={"mode": "map_reduce", "refresh": True}
+    )
+    response.raise_for_status()
+    return {"latency_ms": (time.perf_counter() - started) * 1000}
+
+
+async def run_endpoint(
+    base_url: str, endpoint: str, payloads: list, concurrency: int
+) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[dict] = []
+    errors: List[str] = []
+
+    async def one(client: httpx.AsyncClient, payload) -> None:
+        async with semaphore:
+            try:
+                samples.append(await timed_request(client, endpoint, payload))
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=600, limits=limits
+    ) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, payload) for payload in payloads))
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "requests": len(payloads),
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "requests_per_second": round(len(samples) / elapsed, 2) if elapsed else None,
+        **summarize_latencies([s["latency_ms"] for s in samples]),
+    }
+    ttfts = [s["ttft_ms"] for s in samples if s.get("ttft_ms") is not None]
+    if ttfts:
+        result["ttft"] = summarize_latencies(ttfts)
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def benchmark_corpus(args, pages: int) -> dict:
+    env = {
+        "FAKE_LLM_LATENCY": str(args.llm_latency),
+        "FAKE_LLM_TOKEN_LATENCY": str(args.token_latency),
+        "FAKE_EMBED_LATENCY": str(args.embed_latency),
+        **dict(item.split("=", 1) for item in args.env),
+    }
+    with tempfile.TemporaryDirectory(prefix="byteme-bench-") as workspace:
+        generate_corpus(os.path.join(workspace, "data"), args.files, pages)
+        result: dict = {"files": args.files, "pages_per_file": pages, "endpoints": {}}
+
+        server = Server(workspace, env)
+        server.start()
+        try:
+            result["startup_bind_s"] = server.wait_for("/api/health", 120)
+            result["startup_ready_cold_s"] = server.wait_for(
+                "/api/ready", args.startup_timeout
+            )
+            for endpoint in args.endpoints:
+                if endpoint == "summarize":
+                    payloads = [None] * args.summary_requests
+                    concurrency = min(args.concurrency, args.summary_requests)
+                else:
+                    # Distinct per endpoint so one does not warm the answer cache for another
+                    payloads = make_questions(
+                        args.requests, args.repeat_ratio, seed=ENDPOINTS.index(endpoint)
+                    )
+                    concurrency = args.concurrency
+                print(f"  {endpoint}: {len(payloads)} requests...")
+                result["endpoints"][endpoint] = asyncio.run(
+                    run_endpoint(server.base_url, endpoint, payloads, concurrency)
+                )
+        finally:
+            result["peak_rss_mb"] = server.stop()
+
+        # Warm restart: index, text and embedding caches are on disk
+        server = Server(workspace, env)
+        server.start()
+        try:
+            result["startup_ready_warm_s"] = server.wait_for(
+                "/api/ready", args.startup_timeout
+            )
+        finally:
+            result["peak_rss_warm_mb"] = server.stop()
+    return result
+
+
+def previous_result(results_dir: str, corpus_key: str, exclude: str) -> Optional[dict]:
+    for path in sorted(glob.glob(os.path.join(results_dir, "*.json")), reverse=True):
+        if path == exclude:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            run = json.load(f)
+        if corpus_key in run.get("corpora", {}):
+            return run
+    return None
+
+
+def print_report(run: dict, path: str) -> None:
+    for key, corpus in run["corpora"].items():
+        previous = previous_result(os.path.dirname(path), key, path)
+        baseline = previous["corpora"][key] if previous else {}
+        print(f"\nCorpus {key} (commit {run['commit']})")
+        print(
+            f"  startup: bind {corpus['startup_bind_s']}s, ready cold "
+            f"{corpus['startup_ready_cold_s']}s / warm {corpus['startup_ready_warm_s']}s,"
+            f" peak RSS {corpus['peak_rss_mb']} MB"
+        )
+        print(
+            f"  {'endpoint':<12}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'req/s':>8}{'errors':>8}  p95 vs {previous['commit'] if previous else '-'}"
+        )
+        for name, stats in corpus["endpoints"].items():
+            before = baseline.get("endpoints", {}).get(name, {}).get("p95_ms")
+            delta = (
+                f"{(stats['p95_ms'] - before) / before * 100:+.1f}%"
+                if before and stats.get("p95_ms")
+                else "-"
+            )
+            print(
+                f"  {name:<12}{stats.get('p50_ms', '-'):>9}{stats.get('p95_ms', '-'):>9}"
+                f"{stats.get('p99_ms', '-'):>9}{stats['requests_per_second'] or '-':>8}"
+                f"{stats['errors']:>8}  {delta}"
+            )
+    print(f"\nResults saved to {path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--pages", default="20,200", help="Comma-separated pages per file"
+    )
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--summary-requests", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--repeat-ratio", type=float, default=0.0, help="Share of repeated questions"
+    )
+    parser.add_argument(
+        "--endpoints", default=",".join(ENDPOINTS), help="Comma-separated endpoints"
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--startup-timeout", type=float, default=1800)
+    parser.add_argument(
+        "--env", action="append", default=[], help="Extra server env, KEY=VALUE"
+    )
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    args = parser.parse_args()
+    args.endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    run = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k != "output_dir"},
+        "corpora": {},
+    }
+    for pages in [int(p) for p in args.pages.split(",")]:
+        print(f"Benchmarking {args.files} files x {pages} pages...")
+        run["corpora"][f"{args.files}x{pages}"] = benchmark_corpus(args, pages)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(args.output_dir, f"{stamp}_{run['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+    print_report(run, path)
+
+
+if __name__ == "__main__":
+    main()
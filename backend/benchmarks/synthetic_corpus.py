@@ -0,0 +1,143 @@
+"""Synthetic PDF corpora for benchmarks.
+
+Writes text-only PDFs (Helvetica, one text object per page) with a minimal
+hand-rolled writer, so no PDF library is needed. The sentences are
+deterministic for a given seed and mix ESG report and mortgage vocabulary,
+which keeps retrieval and summarization prompts realistic in size.
+
+    python benchmarks/synthetic_corpus.py out_dir --files 5 --pages 20
+"""
+
+import argparse
+import os
+import random
+from typing import List
+
+SUBJECTS = [
+    "The company",
+    "The board",
+    "Our mortgage portfolio",
+    "The sustainability committee",
+    "The group",
+    "Management",
+    "The bank",
+]
+VERBS = [
+    "reduced",
+    "reported",
+    "increased",
+    "disclosed",
+    "reviewed",
+    "targets",
+    "monitors",
+]
+OBJECTS = [
+    "scope 1 and 2 emissions by {n} percent",
+    "the share of women in leadership to {n} percent",
+    "water consumption across {n} production sites",
+    "the affordability (Tragbarkeit) threshold at {n} percent of gross income",
+    "a minimum equity contribution of {n} percent",
+    "SARON mortgages against fixed-rate tranches over {n} years",
+    "climate-related risks in {n} supplier regions",
+    "governance controls for {n} subsidiaries",
+    "renewable energy use of {n} GWh",
+]
+
+LINES_PER_PAGE = 48
+WORDS_PER_LINE = 14
+
+
+def sentence(rng: random.Random) -> str:
+    obj = rng.choice(OBJECTS).format(n=rng.randint(2, 95))
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {obj}."
+
+
+def page_lines(rng: random.Random) -> List[str]:
+    words: List[str] = []
+    while len(words) < LINES_PER_PAGE * WORDS_PER_LINE:
+        words.extend(sentence(rng).split())
+    return [
+        " ".join(words[i : i + WORDS_PER_LINE])
+        for i in range(0, LINES_PER_PAGE * WORDS_PER_LINE, WORDS_PER_LINE)
+    ]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """Writes a PDF with one page per list of text lines."""
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # Filled in once the page tree exists
+    page_tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for lines in pages:
+        text = " T* ".join(f"({_escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 760 Td {text} ET".encode("latin-1", "replace")
+        contents = add(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        page_ids.append(
+            add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+                b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+                % (page_tree, font, contents)
+            )
+        )
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        kids,
+        len(page_ids),
+    )
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        catalog,
+        xref,
+    )
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_corpus(directory: str, files: int, pages: int, seed: int = 0) -> List[str]:
+    """Writes `files` PDFs of `pages` pages each; returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for number in range(files):
+        path = os.path.join(directory, f"report_{number:03d}.pdf")
+        write_pdf(path, [page_lines(rng) for _ in range(pages)])
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    paths = generate_corpus(args.directory, args.files, args.pages, args.seed)
+    print(f"Wrote {len(paths)} PDFs to '{args.directory}'.")
+
+
+if __name__ == "__main__":
+    main()
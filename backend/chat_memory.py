@@ -0,0 +1,205 @@
+"""Chat memory with a bounded window and a rolling summary of older turns.
+
+The condense step rewrites every new message against the chat history, so
+with a plain buffer its prompt (and latency) grows with the conversation.
+This memory keeps the last `recent_turns` turns verbatim and folds older
+turns into a running summary, which is updated incrementally (previous
+summary + newly folded turns) by a background task started when a turn
+completes, off the request path. The next turn only waits for it if it is
+still running. The history handed to the chat engine is additionally cut to
+`token_limit` tokens, oldest messages first.
+
+The summary is stored as a system message at the head of the chat store, so
+session size accounting sees it like any other message.
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Tuple
+
+from llama_index.core.llms import LLM, ChatMessage, MessageRole
+from llama_index.core.memory.types import BaseChatStoreMemory
+from llama_index.core.utils import get_tokenizer
+from pydantic import Field, PrivateAttr
+
+SUMMARY_PROMPT = (
+    "Progressively summarize a conversation between a user and an assistant, "
+    "adding the new lines to the previous summary. Keep the topics, names, figures "
+    "and open questions the user may refer back to. Answer with the new summary "
+    "only, in at most {max_words} words.\n\n"
+    "Previous summary:\n{summary}\n\n"
+    "New lines of conversation:\n{transcript}\n\n"
+    "New summary:"
+)
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+class RollingSummaryMemory(BaseChatStoreMemory):
+    """Last `recent_turns` turns verbatim plus a summary of the older ones.
+
+    Without an LLM, older turns are dropped instead of summarized.
+    """
+
+    llm: Optional[LLM] = Field(default=None, exclude=True)
+    recent_turns: int = 4
+    # Hard cap on the history returned to the chat engine
+    token_limit: int = 3000
+    summary_token_limit: int = 300
+    tokenizer_fn: Callable[[str], List] = Field(
+        default_factory=get_tokenizer, exclude=True
+    )
+
+    # Background fold of older turns into the summary, if one is running
+    _pending: Optional[asyncio.Task] = PrivateAttr(default=None)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RollingSummaryMemory"
+
+    @classmethod
+    def from_defaults(
+        cls,
+        chat_history: Optional[List[ChatMessage]] = None,
+        llm: Optional[LLM] = None,
+        **kwargs: Any,
+    ) -> "RollingSummaryMemory":
+        memory = cls(llm=llm, **kwargs)
+        if chat_history:
+            memory.set(chat_history)
+        return memory
+
+    # --- Reading ---
+
+    def get(self, input: Optional[str] = None, **kwargs: Any) -> List[ChatMessage]:
+        if self._pending is None and self._overflow():
+            self._fold_sync()
+        return self._bounded(self.get_all())
+
+    async def aget(
+        self, input: Optional[str] = None, **kwargs: Any
+    ) -> List[ChatMessage]:
+        if self._pending is not None:
+            # Shielded: a cancelled request must not abort the fold
+            await asyncio.shield(self._pending)
+        elif self._overflow():
+            await self._afold()
+        return self._bounded(self.get_all())
+
+    # --- Writing ---
+
+    def put(self, message: ChatMessage) -> None:
+        super().put(message)
+        self._after_put(message)
+
+    async def aput(self, message: ChatMessage) -> None:
+        await super().aput(message)
+        self._after_put(message)
+
+    def reset(self) -> None:
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        super().reset()
+
+    def _after_put(self, message: ChatMessage) -> None:
+        """Starts folding older turns once a turn is complete (on a running loop)."""
+        if message.role != MessageRole.ASSISTANT or self._pending is not None:
+            return
+        if not self._overflow():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Synchronous use: folded by the next get()
+        self._pending = loop.create_task(self._afold())
+
+    # --- Folding ---
+
+    def _split(self, messages: List[ChatMessage]) -> Tuple[str, List[ChatMessage]]:
+        """(summary text, messages after the summary)."""
+        if messages and messages[0].role == MessageRole.SYSTEM:
+            return (messages[0].content or "")[len(SUMMARY_PREFIX) :], messages[1:]
+        return "", messages
+
+    def _overflow(self) -> List[ChatMessage]:
+        """Messages older than the verbatim window."""
+        _, messages = self._split(self.get_all())
+        return messages[: max(0, len(messages) - 2 * self.recent_turns)]
+
+    def _summary_prompt(self, summary: str, folded: List[ChatMessage]) -> str:
+        transcript = "\n".join(
+            f"{message.role.value}: {message.content}" for message in folded
+        )
+        return SUMMARY_PROMPT.format(
+            max_words=self.summary_token_limit * 3 // 4,
+            summary=summary or "(none)",
+            transcript=transcript,
+        )
+
+    def _fold_sync(self) -> None:
+        summary, _ = self._split(self.get_all())
+        folded = self._overflow()
+        try:
+            if self.llm is not None:
+                prompt = self._summary_prompt(summary, folded)
+                summary = self.llm.complete(prompt).text.strip()
+        except Exception:
+            logging.exception("Summarizing the chat history failed:")
+            return  # Retried after the next turn; the history stays bounded
+        self._replace(folded, summary)
+
+    async def _afold(self) -> None:
+        try:
+            summary, _ = self._split(self.get_all())
+            folded = self._overflow()
+            if self.llm is not None:
+                prompt = self._summary_prompt(summary, folded)
+                summary = (await self.llm.acomplete(prompt)).text.strip()
+            self._replace(folded, summary)
+        except Exception:
+            logging.exception("Summarizing the chat history failed:")
+        finally:
+            self._pending = None
+
+    def _replace(self, folded: List[ChatMessage], summary: str) -> None:
+        """Swaps the folded messages for the new summary (later messages are kept)."""
+        _, messages = self._split(self.get_all())
+        summary = self._truncate(summary, self.summary_token_limit)
+        head = (
+            [ChatMessage(role=MessageRole.SYSTEM, content=SUMMARY_PREFIX + summary)]
+            if summary
+            else []
+        )
+        self.set(head + messages[len(folded) :])
+
+    # --- Budget ---
+
+    def _bounded(self, messages: List[ChatMessage]) -> List[ChatMessage]:
+        """The summary and as many recent messages as fit into `token_limit`."""
+        summary, messages = self._split(messages)
+        messages = messages[-2 * self.recent_turns :] if self.recent_turns else []
+        head = []
+        budget = self.token_limit
+        if summary:
+            content = SUMMARY_PREFIX + self._truncate(summary, budget // 2)
+            head = [ChatMessage(role=MessageRole.SYSTEM, content=content)]
+            budget -= self._tokens(content)
+        kept: List[ChatMessage] = []
+        for message in reversed(messages):
+            tokens = self._tokens(message.content or "")
+            if tokens > budget:
+                break
+            kept.insert(0, message)
+            budget -= tokens
+        while kept and kept[0].role != MessageRole.USER:
+            kept.pop(0)  # Never start with half a turn
+        return head + kept
+
+    def _tokens(self, text: str) -> int:
+        return len(self.tokenizer_fn(text))
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self._tokens(text)
+        if tokens <= max_tokens:
+            return text
+        return text[: len(text) * max_tokens // tokens]
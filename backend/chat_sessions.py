@@ -0,0 +1,119 @@
+"""Per-session chat state kept in a bounded LRU/TTL pool.
+
+Each session owns only its chat memory; lightweight chat engines are bound to
+it per request on top of query engines shared by all sessions. The pool
+evicts sessions that are idle for longer than the TTL and the least recently
+used ones once the number of sessions or the total size of their histories
+exceeds a cap.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from llama_index.core.memory import BaseMemory
+
+
+@dataclass
+class ChatSession:
+    session_id: str
+    memory: BaseMemory
+    created_at: float = field(default_factory=time.time)
+    last_used_at: float = field(default_factory=time.time)
+    # Approximate size of the session's chat history, in characters
+    history_chars: int = 0
+    # Serializes turns within one session so histories never interleave
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+def history_size(memory: BaseMemory) -> int:
+    """Approximate size of a session's chat history in characters."""
+    return sum(len(message.content or "") for message in memory.get_all())
+
+
+class ChatSessionPool:
+    """LRU/TTL-bounded map of session id -> ChatSession."""
+
+    def __init__(
+        self,
+        memory_factory: Callable[[], BaseMemory],
+        max_sessions: int = 1000,
+        ttl_seconds: float = 3600,
+        max_total_chars: int = 20_000_000,
+    ):
+        self.memory_factory = memory_factory
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_total_chars = max_total_chars
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._total_chars = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ChatSession:
+        """Returns the session (creating it if unknown) and marks it most recently used."""
+        self.evict_expired()
+        session_id = session_id or uuid.uuid4().hex
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = ChatSession(session_id=session_id, memory=self.memory_factory())
+            self._sessions[session_id] = session
+            self._evict_over_capacity(keep=session_id)
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_used_at = time.time()
+        return session
+
+    def record_usage(self, session: ChatSession) -> None:
+        """Re-measures a session's history after a turn and enforces the memory cap."""
+        if self._sessions.get(session.session_id) is not session:
+            return  # Evicted while the turn was running
+        size = history_size(session.memory)
+        self._total_chars += size - session.history_chars
+        session.history_chars = size
+        session.last_used_at = time.time()
+        self._evict_over_capacity(keep=session.session_id)
+
+    def reset(self, session_id: str) -> bool:
+        """Drops a session; returns False if it did not exist."""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._total_chars -= session.history_chars
+        return True
+
+    def evict_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        # Sessions are in LRU order, so expired ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used_at >= cutoff:
+                break
+            self._evict(session.session_id)
+
+    def _evict_over_capacity(self, keep: str) -> None:
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions
+            or self._total_chars > self.max_total_chars
+        ):
+            oldest_id = next(iter(self._sessions))
+            if oldest_id == keep:
+                break
+            self._evict(oldest_id)
+
+    def _evict(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        self._total_chars -= session.history_chars
+        self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "history_chars": self._total_chars,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,119 @@
+"""Retrieval-guided context for the ESG analysis.
+
+Instead of the beginning of the concatenated corpus (mostly cover pages and
+tables of contents), the analysis gets the chunks of the vector index that
+are most relevant to each ESG theme. Themes are retrieved concurrently,
+duplicate chunks are dropped, and chunks are taken round-robin across themes
+(best first) until a token budget is reached, so every theme is covered
+before any theme gets its next-best chunk. The packed chunks are put back
+into document order and labelled with their source.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+from embedding_cache import aget_query_embeddings
+from esg_mapreduce import count_tokens
+from indexing import LiveIndexRetriever
+
+# Theme -> retrieval query
+ESG_THEMES = {
+    "environmental": (
+        "Environmental initiatives, greenhouse gas emissions, energy use, "
+        "climate targets and decarbonisation"
+    ),
+    "social": (
+        "Social responsibility programs, employees, diversity and inclusion, "
+        "health and safety, communities"
+    ),
+    "governance": (
+        "Governance structures, board composition, executive remuneration, "
+        "ethics, compliance and anti-corruption"
+    ),
+    "risks": "Major ESG risks, climate-related risks and risk management",
+    "opportunities": "Key ESG opportunities and sustainable business strategy",
+    "kpis": (
+        "Quantitative ESG metrics and KPIs: CO2 emissions in tonnes, energy "
+        "consumption, water, waste, diversity ratios, targets versus actuals"
+    ),
+}
+
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+
+@dataclass
+class PackedContext:
+    text: str
+    chunks: int
+    tokens: int
+
+
+async def pack_theme_context(
+    index: VectorStoreIndex,
+    embed_model: BaseEmbedding,
+    themes: Dict[str, str],
+    token_budget: int,
+    top_k: int,
+) -> PackedContext:
+    """Retrieves `top_k` chunks per theme and packs the best ones into `token_budget`."""
+    queries = list(themes.values())
+    embeddings = await aget_query_embeddings(embed_model, queries)
+    retriever = LiveIndexRetriever(index, similarity_top_k=top_k)
+    rankings: List[List[NodeWithScore]] = await asyncio.gather(
+        *(
+            retriever.aretrieve(QueryBundle(query_str=query, embedding=embedding))
+            for query, embedding in zip(queries, embeddings)
+        )
+    )
+
+    selected: Dict[str, Tuple[NodeWithScore, str]] = {}
+    seen_texts = set()  # Identical boilerplate can appear in several files
+    used_tokens = 0
+    for rank in range(top_k):
+        for ranking in rankings:
+            if rank >= len(ranking):
+                continue
+            node = ranking[rank]
+            content = node.node.get_content().strip()
+            if node.node.node_id in selected or content in seen_texts:
+                continue
+            block = f"[{_source_label(node)}]\n{content}"
+            tokens = count_tokens(block)
+            if used_tokens + tokens > token_budget:
+                continue  # A shorter chunk further down may still fit
+            selected[node.node.node_id] = (node, block)
+            seen_texts.add(content)
+            used_tokens += tokens
+
+    blocks = [
+        block
+        for _, block in sorted(
+            selected.values(), key=lambda item: _document_position(item[0])
+        )
+    ]
+    return PackedContext(
+        text=CHUNK_SEPARATOR.join(blocks), chunks=len(blocks), tokens=used_tokens
+    )
+
+
+def _source_label(node: NodeWithScore) -> str:
+    metadata = node.node.metadata
+    label = metadata.get("file_name") or "document"
+    if metadata.get("page_label"):
+        label += f", page {metadata['page_label']}"
+    return label
+
+
+def _document_position(node: NodeWithScore) -> tuple:
+    metadata = node.node.metadata
+    page = str(metadata.get("page_label", ""))
+    return (
+        metadata.get("file_name") or "",
+        int(page) if page.isdigit() else 0,
+        node.node.start_char_idx or 0,
+    )
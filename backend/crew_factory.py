@@ -0,0 +1,208 @@
+"""Reusable CrewAI crews with pooled LLM clients.
+
+Agents are defined once at startup. Each run gets cheap copies of them bound to
+an LLM leased from a pool, plus its own task inputs and callbacks. Creating a
+CrewAI LLM builds a new OpenAI client with its own HTTP connection pool (about
+100 ms, plus new connections on the first call), so pooled LLMs are reused
+across runs and keep their connections alive. A pooled LLM serves one run at a
+time, which keeps its (cumulative) token counters attributable to that run.
+Runs on the event loop lease with `alease`, which waits for a busy pool
+without blocking the loop.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import (
+    AsyncIterator,
+    Callable,
+    Deque,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from crewai import Agent, Crew, Process, Task
+from crewai.llms.base_llm import BaseLLM
+from crewai.types.usage_metrics import UsageMetrics
+
+# Returned by `LLMPool._take` when the caller may create a new LLM
+_CREATE = object()
+
+
+class LLMPool:
+    """Up to `max_size` LLM instances, created on demand and leased one run at a time."""
+
+    def __init__(self, create_llm: Callable[[], BaseLLM], max_size: int):
+        self._create_llm = create_llm
+        self.max_size = max_size
+        self._idle: List[BaseLLM] = []  # Most recently used last
+        self._created = 0
+        self._lock = threading.Lock()
+        # Wake callbacks of waiting leases, first come first served
+        self._waiters: Deque[Callable[[], None]] = deque()
+
+    @contextmanager
+    def lease(self) -> Iterator[BaseLLM]:
+        """Yields an idle LLM, creating one if below `max_size`, else waits for one."""
+        event = threading.Event()
+        while (taken := self._take(event.set)) is None:
+            event.wait()
+            event.clear()
+        llm = self._checkout(taken)
+        try:
+            yield llm
+        finally:
+            self._put_back(llm)
+
+    @asynccontextmanager
+    async def alease(self) -> AsyncIterator[BaseLLM]:
+        """Like `lease`, but waits on the event loop instead of blocking it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            woken = loop.create_future()
+
+            def wake(woken: asyncio.Future = woken) -> None:
+                loop.call_soon_threadsafe(
+                    lambda: woken.done() or woken.set_result(None)
+                )
+
+            taken = self._take(wake)
+            if taken is not None:
+                break
+            try:
+                await woken
+            except asyncio.CancelledError:
+                self._forget(wake)
+                raise
+        llm = self._checkout(taken)
+        try:
+            yield llm
+        finally:
+            self._put_back(llm)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "created": self._created,
+                "idle": len(self._idle),
+                "waiting": len(self._waiters),
+            }
+
+    def _take(self, wake: Callable[[], None]) -> Union[BaseLLM, object, None]:
+        """An idle LLM, `_CREATE`, or None after queuing `wake` for the next release."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            if self._created < self.max_size:
+                self._created += 1
+                return _CREATE
+            self._waiters.append(wake)
+            return None
+
+    def _checkout(self, taken: Union[BaseLLM, object]) -> BaseLLM:
+        if taken is not _CREATE:
+            return taken
+        try:
+            return self._create_llm()
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            self._wake_next()
+            raise
+
+    def _put_back(self, llm: BaseLLM) -> None:
+        with self._lock:
+            self._idle.append(llm)  # Reused first, while its connections are warm
+        self._wake_next()
+
+    def _wake_next(self) -> None:
+        with self._lock:
+            wake = self._waiters.popleft() if self._waiters else None
+        if wake is not None:
+            wake()
+
+    def _forget(self, wake: Callable[[], None]) -> None:
+        """Drops a cancelled waiter, passing its wake-up on if it already had one."""
+        with self._lock:
+            if wake in self._waiters:
+                self._waiters.remove(wake)
+                return
+        self._wake_next()
+
+
+@dataclass
+class CrewRun:
+    crew: Crew
+    llm: BaseLLM
+    # Token counters of the leased LLM before the run
+    usage_before: UsageMetrics
+
+    def token_usage(self) -> UsageMetrics:
+        """Tokens used by this run so far (`Crew.token_usage` counts shared LLMs twice)."""
+        return self.llm.get_token_usage_summary().delta_since(self.usage_before)
+
+
+class CrewFactory:
+    """Builds sequential crews from agent and task definitions.
+
+    Task i is performed by agent i and receives the output of task i - 1 as
+    context. Task descriptions are format strings filled with a run's inputs.
+    """
+
+    def __init__(
+        self,
+        agents: Sequence[dict],
+        tasks: Sequence[dict],
+        llm_pool: LLMPool,
+        verbose: bool = True,
+    ):
+        if len(agents) != len(tasks):
+            raise ValueError("Every task needs exactly one agent.")
+        self.tasks = list(tasks)
+        self.llm_pool = llm_pool
+        self.verbose = verbose
+        # Validated once here; runs only copy them
+        with llm_pool.lease() as llm:
+            self.model = llm.model  # Every pooled LLM is configured alike
+            self._agents = [
+                Agent(**config, verbose=verbose, allow_delegation=False, llm=llm)
+                for config in agents
+            ]
+
+    @asynccontextmanager
+    async def run(
+        self,
+        inputs: dict,
+        task_callback: Optional[Callable] = None,
+        step_callback: Optional[Callable] = None,
+    ) -> AsyncIterator[CrewRun]:
+        """Yields a crew bound to `inputs` and a leased LLM, for one kickoff."""
+        async with self.llm_pool.alease() as llm:
+            tasks: List[Task] = []
+            agents = []
+            for template, config in zip(self._agents, self.tasks):
+                agent = template.copy()
+                agent.llm = llm
+                agents.append(agent)
+                tasks.append(
+                    Task(
+                        description=config["description"].format(**inputs),
+                        expected_output=config["expected_output"],
+                        agent=agent,
+                        callback=task_callback,
+                        **({"context": tasks[-1:]} if tasks else {}),
+                    )
+                )
+            crew = Crew(
+                agents=agents,
+                tasks=tasks,
+                process=Process.sequential,  # Tasks run one after another
+                verbose=self.verbose,
+                step_callback=step_callback,
+            )
+            yield CrewRun(crew, llm, llm.get_token_usage_summary())
@@ -0,0 +1,186 @@
+"""Content-addressed cache of chunk embeddings.
+
+Embeddings are stored in a local SQLite database keyed by the embedding model
+name plus a hash of the exact text that is embedded, so a rebuild (for
+example after a parser or chunking tweak) only pays for chunks whose text is
+actually new. Cache misses are embedded in large batches with a bounded
+number of concurrent requests.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import BaseNode, MetadataMode
+
+# Texts per embedding request and number of requests in flight at once
+EMBED_BATCH_SIZE = 256
+EMBED_MAX_CONCURRENCY = 4
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+def embedding_model_name(embed_model: BaseEmbedding) -> str:
+    return f"{type(embed_model).__name__}:{embed_model.model_name}"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite store of (model, text hash) -> float32 embedding."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " text_hash TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, text_hash))"
+            )
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_CHUNK):
+                chunk = unique[start : start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings"
+                    f" WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]) -> None:
+        rows = [
+            (model, key, array("f", vector).tobytes())
+            for key, vector in vectors.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector)"
+                " VALUES (?, ?, ?)",
+                rows,
+            )
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 4),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def embed_nodes_cached(
+    nodes: Sequence[BaseNode],
+    embed_model: BaseEmbedding,
+    cache: EmbeddingCache,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_concurrency: int = EMBED_MAX_CONCURRENCY,
+) -> int:
+    """Sets `node.embedding` on every node, embedding only cache misses.
+
+    Nodes that already carry an embedding are left alone. Returns the number
+    of texts that had to be sent to the embedding model.
+    """
+    model = embedding_model_name(embed_model)
+    targets = [node for node in nodes if node.embedding is None]
+    if not targets:
+        return 0
+    hashes = [
+        text_hash(node.get_content(metadata_mode=MetadataMode.EMBED))
+        for node in targets
+    ]
+    vectors = cache.get_many(model, hashes)
+
+    # Identical chunks are embedded once
+    missing: Dict[str, str] = {}
+    for node, key in zip(targets, hashes):
+        if key not in vectors and key not in missing:
+            missing[key] = node.get_content(metadata_mode=MetadataMode.EMBED)
+    cache.hits += len(targets) - len(missing)
+    cache.misses += len(missing)
+
+    if missing:
+        keys = list(missing)
+        batches = [
+            keys[start : start + batch_size]
+            for start in range(0, len(keys), batch_size)
+        ]
+
+        def embed_batch(batch_keys: List[str]) -> Dict[str, List[float]]:
+            embeddings = embed_model.get_text_embedding_batch(
+                [missing[key] for key in batch_keys]
+            )
+            new_vectors = dict(zip(batch_keys, embeddings))
+            try:
+                cache.put_many(model, new_vectors)
+            except sqlite3.Error as e:
+                logging.warning(f"Failed to store embeddings in cache: {e}")
+            return new_vectors
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_concurrency, len(batches))),
+            thread_name_prefix="embed",
+        ) as pool:
+            for new_vectors in pool.map(embed_batch, batches):
+                vectors.update(new_vectors)
+
+    for node, key in zip(targets, hashes):
+        node.embedding = vectors[key]
+    return len(missing)
+
+
+async def aget_query_embeddings(
+    embed_model: BaseEmbedding,
+    queries: List[str],
+    max_concurrency: int = EMBED_MAX_CONCURRENCY,
+) -> List[List[float]]:
+    """Query embeddings of several queries, in order.
+
+    Models may embed queries differently from documents (for example with
+    an instruction prefix), so document-embedding batches are not used. The
+    model's query batch method is used if it has one; otherwise the queries
+    are embedded one by one, at most `max_concurrency` at a time.
+    """
+    if not queries:
+        return []
+    batch = getattr(embed_model, "aget_query_embedding_batch", None)
+    if batch is not None:
+        return await batch(queries)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def embed(query: str) -> List[float]:
+        async with semaphore:
+            return await embed_model.aget_query_embedding(query)
+
+    return list(await asyncio.gather(*(embed(query) for query in queries)))
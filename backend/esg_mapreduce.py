@@ -0,0 +1,161 @@
+"""Map-reduce ESG analysis over the full document corpus.
+
+Instead of truncating the corpus to fit one prompt, the text is split into
+token-budgeted chunks that are analysed concurrently (with a bound on the
+number of parallel LLM calls). The partial analyses are then merged
+hierarchically until a single analysis remains, from which the executive
+summary is written. Wall-clock time scales with parallelism rather than with
+corpus length, and every part of every report is read.
+"""
+
+import asyncio
+from typing import Callable, List, Optional
+
+from llama_index.core.llms import LLM
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.utils import get_tokenizer
+
+MAP_PROMPT = (
+    "You are an expert ESG analyst. Review the following excerpt ({index} of {total}) "
+    "of a set of ESG documents: \n\n---\n{text}\n---\n\n"
+    "Identify and list the key environmental initiatives, social responsibility programs, "
+    "governance structures, major risks mentioned, key opportunities highlighted, "
+    "and any significant quantitative metrics reported (e.g., CO2 emissions, diversity ratios). "
+    "Only report what this excerpt contains; say 'nothing relevant' for empty categories. "
+    "Provide a structured analysis."
+)
+
+MERGE_PROMPT = (
+    "You are an expert ESG analyst. The following are structured analyses of different "
+    "parts of the same set of ESG documents:\n\n{analyses}\n\n"
+    "Merge them into a single structured analysis with the same categories (environmental "
+    "initiatives, social programs, governance, risks, opportunities, quantitative metrics). "
+    "Deduplicate overlapping points, keep every distinct quantitative metric with its value "
+    "and unit, and drop 'nothing relevant' entries."
+)
+
+SUMMARY_PROMPT = (
+    "You are a skilled writer specializing in creating high-level executive summaries "
+    "for busy stakeholders. Based on the following ESG analysis, write a concise executive "
+    "summary (2-3 paragraphs). The summary should highlight the company's main ESG "
+    "strengths, weaknesses/risks, and key performance indicators mentioned. Make it "
+    "suitable for a board-level overview.\n\n---\n{analysis}\n---"
+)
+
+ANALYSIS_SEPARATOR = "\n\n=====\n\n"
+
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer()(text))
+
+
+def split_corpus(text: str, chunk_tokens: int, overlap_tokens: int) -> List[str]:
+    """Splits the corpus into chunks of at most `chunk_tokens` tokens."""
+    splitter = SentenceSplitter(chunk_size=chunk_tokens, chunk_overlap=overlap_tokens)
+    return [chunk for chunk in splitter.split_text(text) if chunk.strip()]
+
+
+def group_for_merge(analyses: List[str], budget_tokens: int) -> List[List[str]]:
+    """Packs consecutive analyses into groups that fit one merge prompt.
+
+    Every group holds at least two analyses so each round strictly shrinks the
+    list, even when single analyses are close to the budget.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for analysis in analyses:
+        tokens = count_tokens(analysis)
+        if len(current) >= 2 and current_tokens + tokens > budget_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(analysis)
+        current_tokens += tokens
+    if len(current) == 1 and groups:
+        groups[-1].append(current[0])
+    elif current:
+        groups.append(current)
+    return groups
+
+
+async def run_esg_map_reduce(
+    document_texts: str,
+    llm: LLM,
+    chunk_tokens: int = 3000,
+    overlap_tokens: int = 200,
+    max_concurrency: int = 4,
+    merge_budget_tokens: int = 6000,
+    publish: Optional[Callable[[dict], None]] = None,
+    check_cancelled: Callable[[], None] = lambda: None,
+) -> str:
+    """Analyses every chunk of the corpus, merges the analyses and writes the summary."""
+    publish = publish or (lambda event: None)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def complete(prompt: str) -> str:
+        async with semaphore:
+            check_cancelled()
+            response = await llm.acomplete(prompt)
+        check_cancelled()
+        return response.text
+
+    chunks = split_corpus(document_texts, chunk_tokens, overlap_tokens)
+    if not chunks:
+        return "Error: No document content provided to summarize."
+    print(f"Map-reduce ESG analysis over {len(chunks)} chunks...")
+    publish(
+        {
+            "status": "thinking",
+            "agent": "ESG Agent",
+            "thought": f"Analysing {len(chunks)} document chunks...",
+        }
+    )
+
+    completed = 0
+
+    async def analyse(index: int, chunk: str) -> str:
+        nonlocal completed
+        analysis = await complete(
+            MAP_PROMPT.format(index=index + 1, total=len(chunks), text=chunk)
+        )
+        completed += 1
+        publish(
+            {
+                "status": "thinking",
+                "agent": "ESG Agent",
+                "thought": f"Analysed chunk {completed}/{len(chunks)}...",
+            }
+        )
+        return analysis
+
+    analyses = await asyncio.gather(
+        *(analyse(index, chunk) for index, chunk in enumerate(chunks))
+    )
+
+    # Reduce: merge groups of analyses level by level until one remains
+    level = 0
+    while len(analyses) > 1:
+        level += 1
+        groups = group_for_merge(list(analyses), merge_budget_tokens)
+        publish(
+            {
+                "status": "thinking",
+                "agent": "ESG Agent",
+                "thought": f"Merging {len(analyses)} analyses (level {level})...",
+            }
+        )
+        analyses = await asyncio.gather(
+            *(
+                complete(MERGE_PROMPT.format(analyses=ANALYSIS_SEPARATOR.join(group)))
+                for group in groups
+            )
+        )
+
+    publish(
+        {
+            "status": "thinking",
+            "agent": "Summary Writer",
+            "thought": "Writing executive summary...",
+        }
+    )
+    return await complete(SUMMARY_PROMPT.format(analysis=analyses[0]))
@@ -0,0 +1,204 @@
+"""Deterministic local stand-ins for the OpenAI LLM and embedding models.
+
+Used with MODEL_BACKEND=fake for offline benchmarks and load tests: no network
+access or API key is needed, outputs depend only on the input text, and each
+call can be given an artificial latency that mimics the remote service.
+"""
+
+import asyncio
+import hashlib
+import re
+import time
+from typing import Any, List, Sequence
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.llms.generic_utils import (
+    completion_response_to_chat_response,
+    stream_completion_response_to_chat_response,
+)
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.custom import CustomLLM
+
+_VOCABULARY = (
+    "the company reports emissions governance board risk opportunity mortgage "
+    "equity income affordability rate fixed saron portfolio climate target "
+    "scope reduction diversity policy disclosure capital tranche amortization "
+    "interest strategy sustainability water energy supply chain social metric"
+).split()
+_WORD = re.compile(r"\w+")
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+class FakeLLM(CustomLLM):
+    """Returns a pseudo-random answer seeded by the prompt after a fixed delay."""
+
+    latency_seconds: float = 0.0  # Before the first token
+    token_latency_seconds: float = 0.0  # Between streamed tokens
+    response_tokens: int = 48
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(
+            context_window=128000,
+            num_output=self.response_tokens,
+            model_name="fake-llm",
+        )
+
+    def _tokens(self, prompt: str) -> List[str]:
+        rng = np.random.default_rng(_seed(prompt))
+        words = rng.choice(_VOCABULARY, self.response_tokens)
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+    # Undecorated implementations: the chat methods call these rather than the
+    # public completion methods, so every call emits exactly one LLM event
+
+    def _complete(self, prompt: str) -> CompletionResponse:
+        time.sleep(
+            self.latency_seconds + self.token_latency_seconds * self.response_tokens
+        )
+        return CompletionResponse(text="".join(self._tokens(prompt)))
+
+    def _stream_complete(self, prompt: str) -> CompletionResponseGen:
+        time.sleep(self.latency_seconds)
+        text = ""
+        for token in self._tokens(prompt):
+            time.sleep(self.token_latency_seconds)
+            text += token
+            yield CompletionResponse(text=text, delta=token)
+
+    # The async variants sleep without blocking the event loop, like a real client
+
+    async def _acomplete(self, prompt: str) -> CompletionResponse:
+        await asyncio.sleep(
+            self.latency_seconds + self.token_latency_seconds * self.response_tokens
+        )
+        return CompletionResponse(text="".join(self._tokens(prompt)))
+
+    async def _astream_complete(self, prompt: str) -> CompletionResponseAsyncGen:
+        await asyncio.sleep(self.latency_seconds)
+        text = ""
+        for token in self._tokens(prompt):
+            await asyncio.sleep(self.token_latency_seconds)
+            text += token
+            yield CompletionResponse(text=text, delta=token)
+
+    @llm_completion_callback()
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        return self._complete(prompt)
+
+    @llm_completion_callback()
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        return self._stream_complete(prompt)
+
+    @llm_completion_callback()
+    async def acomplete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        return await self._acomplete(prompt)
+
+    @llm_completion_callback()
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        return self._astream_complete(prompt)
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        prompt = self.messages_to_prompt(messages)
+        return completion_response_to_chat_response(self._complete(prompt))
+
+    @llm_chat_callback()
+    def stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseGen:
+        prompt = self.messages_to_prompt(messages)
+        return stream_completion_response_to_chat_response(
+            self._stream_complete(prompt)
+        )
+
+    @llm_chat_callback()
+    async def achat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        prompt = self.messages_to_prompt(messages)
+        return completion_response_to_chat_response(await self._acomplete(prompt))
+
+    @llm_chat_callback()
+    async def astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        prompt = self.messages_to_prompt(messages)
+
+        async def gen() -> ChatResponseAsyncGen:
+            async for completion in self._astream_complete(prompt):
+                yield completion_response_to_chat_response(completion)
+
+        return gen()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeLLM"
+
+
+class FakeEmbedding(BaseEmbedding):
+    """Hashed bag-of-words vectors: texts sharing words get similar embeddings."""
+
+    embed_dim: int = 256
+    latency_seconds: float = 0.0  # Per request (a batch is one request)
+
+    def __init__(self, **kwargs: Any) -> None:
+        kwargs.setdefault("model_name", "fake-embedding")
+        super().__init__(**kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.embed_dim, dtype=np.float32)
+        for word in _WORD.findall(text.casefold()):
+            seed = _seed(word)
+            vector[seed % self.embed_dim] += 1.0 if (seed >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        time.sleep(self.latency_seconds)
+        return self._vector(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_seconds)
+        return [self._vector(text) for text in texts]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        await asyncio.sleep(self.latency_seconds)
+        return self._vector(query)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency_seconds)
+        return self._vector(text)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency_seconds)
+        return [self._vector(text) for text in texts]
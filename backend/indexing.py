@@ -0,0 +1,564 @@
+"""Incremental indexing of the PDF corpus.
+
+A manifest of per-file content hashes (plus size and mtime) is stored next to
+the persisted index. On refresh only added, changed or removed files are
+parsed, embedded and inserted into / deleted from the index, so the cost of a
+refresh depends on the size of the change rather than the size of the corpus.
+The index is persisted to a staging directory that then replaces the old one,
+so it can be refreshed while it is serving queries; a `LiveIndexRetriever`
+sees every refresh as a whole.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+from llama_index.core import (
+    Settings,
+    StorageContext,
+    VectorStoreIndex,
+    load_index_from_storage,
+)
+from llama_index.core.indices.utils import embed_nodes
+from llama_index.core.indices.vector_store.retrievers import VectorIndexRetriever
+from llama_index.core.ingestion import run_transformations
+from llama_index.core.schema import BaseNode, Document, NodeWithScore, QueryBundle
+
+from embedding_cache import EmbeddingCache, embed_nodes_cached
+from parallel_ingest import parse_files
+from vector_store import MmapVectorStore
+
+MANIFEST_FILENAME = "corpus_manifest.json"
+MANIFEST_VERSION = 1
+# Nodes are inserted (and therefore embedded) in batches of this size so
+# progress can be reported while a large corpus is being indexed. With an
+# embedding cache each batch is split into concurrent embedding requests.
+INSERT_BATCH_SIZE = 1024
+
+
+class ReadWriteLock:
+    """Many readers or one writer; a waiting writer holds off new readers."""
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._changed:
+            while self._writer or self._writers_waiting:
+                self._changed.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._changed:
+                self._readers -= 1
+                if not self._readers:
+                    self._changed.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._changed:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._changed.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._changed:
+                self._writer = False
+                self._changed.notify_all()
+
+
+# Held exclusively while a live refresh swaps documents (see `apply_corpus_diff`)
+# and shared by `LiveIndexRetriever` lookups
+index_swap_lock = ReadWriteLock()
+
+
+class LiveIndexRetriever(VectorIndexRetriever):
+    """Retriever over the whole index that never sees a half-applied refresh.
+
+    Unlike `index.as_retriever()`, it is not pinned to the nodes that existed
+    when it was created, so it finds nodes inserted by later refreshes. The
+    vector store query and the node lookups in the index and docstore run
+    under a shared `index_swap_lock`.
+    """
+
+    def _get_nodes_with_embeddings(
+        self, query_bundle_with_embeddings: QueryBundle
+    ) -> List[NodeWithScore]:
+        with index_swap_lock.read():
+            return super()._get_nodes_with_embeddings(query_bundle_with_embeddings)
+
+    async def _aget_nodes_with_embeddings(
+        self, query_bundle_with_embeddings: QueryBundle
+    ) -> List[NodeWithScore]:
+        # The store query scores every vector and may wait out a swap, so it
+        # runs off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self._get_nodes_with_embeddings, query_bundle_with_embeddings
+        )
+
+
+@dataclass
+class IndexingProgress:
+    """Mutable progress counters for a load/build/refresh of the index.
+
+    Written from the indexing thread and read by the readiness endpoint; the
+    fields are plain ints/strings, so reads never see a torn value.
+    """
+
+    phase: str = "pending"
+    files_total: int = 0
+    documents_parsed: int = 0
+    nodes_total: int = 0
+    nodes_embedded: int = 0
+    # Nodes whose embedding came from the embedding cache / the embedding model
+    embeddings_cached: int = 0
+    embeddings_computed: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    def start(self, phase: str) -> None:
+        """Enters `phase`; the first call after `finish` starts a new run from zero."""
+        if self.started_at is None or self.finished_at is not None:
+            for name, value in asdict(IndexingProgress()).items():
+                setattr(self, name, value)
+            self.started_at = time.time()
+        self.phase = phase
+
+    def finish(self, phase: str = "ready") -> None:
+        self.phase = phase
+        self.finished_at = time.time()
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class CorpusDiff:
+    """Files that need to be (re-)indexed or dropped, relative to the manifest."""
+
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    # Fresh stat/hash entries for every file currently in the corpus
+    entries: Dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_corpus_files(directory: str) -> List[str]:
+    """Lists the (non-hidden) files SimpleDirectoryReader would pick up, sorted."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(directory)
+        if not name.startswith(".") and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def manifest_path(persist_dir: str) -> str:
+    return os.path.join(persist_dir, MANIFEST_FILENAME)
+
+
+def load_manifest(persist_dir: str) -> Optional[dict]:
+    """Loads the corpus manifest, or returns None if it is missing or unreadable."""
+    path = manifest_path(persist_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read corpus manifest '{path}': {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(persist_dir: str, manifest: dict) -> None:
+    """Writes the manifest atomically (temp file + rename)."""
+    os.makedirs(persist_dir, exist_ok=True)
+    path = manifest_path(persist_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def empty_manifest() -> dict:
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def corpus_version(manifest: Optional[dict]) -> str:
+    """Identifies the indexed corpus; changes whenever any file is added, changed or removed."""
+    files = (manifest or {}).get("files", {})
+    payload = json.dumps(
+        sorted((name, entry["sha256"]) for name, entry in files.items())
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def diff_corpus(directory: str, manifest: dict) -> CorpusDiff:
+    """Compares the files in `directory` against the manifest.
+
+    Files whose size and mtime match the manifest are trusted without hashing;
+    only files with a different stat are hashed, and a file whose hash still
+    matches (e.g. it was only touched) is treated as unchanged.
+    """
+    known = manifest.get("files", {})
+    diff = CorpusDiff()
+
+    for name in list_corpus_files(directory):
+        path = os.path.join(directory, name)
+        stat = os.stat(path)
+        previous = known.get(name)
+
+        if (
+            previous
+            and previous["size"] == stat.st_size
+            and previous["mtime"] == stat.st_mtime
+        ):
+            diff.entries[name] = dict(previous)
+            diff.unchanged.append(name)
+            continue
+
+        entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": hash_file(path),
+            "doc_ids": [],
+        }
+        if previous is None:
+            diff.added.append(name)
+        elif previous["sha256"] == entry["sha256"]:
+            entry["doc_ids"] = previous.get("doc_ids", [])
+            diff.unchanged.append(name)
+        else:
+            diff.changed.append(name)
+        diff.entries[name] = entry
+
+    diff.removed = sorted(set(known) - set(diff.entries))
+    return diff
+
+
+def apply_corpus_diff(
+    index: VectorStoreIndex,
+    directory: str,
+    manifest: dict,
+    diff: CorpusDiff,
+    progress: Optional[IndexingProgress] = None,
+    workers: int = 1,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    live: bool = False,
+    on_swap: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """Removes stale documents and inserts new ones; returns the updated manifest.
+
+    Files are parsed across `workers` processes; each file's nodes are
+    embedded and inserted as soon as it is parsed, while others are still
+    being extracted. With an `embedding_cache`, only chunks whose text was
+    never embedded before are sent to the embedding model.
+
+    With `live`, the index is serving queries: all nodes are embedded first
+    and then swapped in together with the deletes while `index_swap_lock` is
+    held exclusively, so a `LiveIndexRetriever` sees either the old or the new
+    corpus. `on_swap` is called with the new manifest before the lock is
+    released, e.g. to drop answers cached for the old corpus.
+    """
+    progress = progress or IndexingProgress()
+    known = manifest.get("files", {})
+    stale_doc_ids = [
+        doc_id
+        for name in diff.removed + diff.changed
+        for doc_id in known.get(name, {}).get("doc_ids", [])
+    ]
+
+    def delete_stale() -> None:
+        for doc_id in stale_doc_ids:
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+
+    if not live:
+        delete_stale()
+
+    to_parse = diff.added + diff.changed
+    progress.start("ingesting")
+    progress.files_total = len(to_parse)
+    pending: List[BaseNode] = []
+    staged: List[BaseNode] = []
+
+    def insert_pending() -> None:
+        if embedding_cache is not None:
+            computed = embed_nodes_cached(
+                pending, Settings.embed_model, embedding_cache
+            )
+            progress.embeddings_computed += computed
+            progress.embeddings_cached += len(pending) - computed
+        else:
+            if live:
+                embeddings = embed_nodes(pending, Settings.embed_model)
+                for node in pending:
+                    node.embedding = embeddings[node.node_id]
+            progress.embeddings_computed += len(pending)
+        if live:
+            staged.extend(pending)
+        else:
+            index.insert_nodes(pending)
+        progress.nodes_embedded += len(pending)
+        pending.clear()
+
+    documents: List[Document] = []
+    paths = [os.path.join(directory, name) for name in to_parse]
+    for path, file_documents in parse_files(paths, workers):
+        name = os.path.basename(path)
+        diff.entries[name]["doc_ids"] = [doc.doc_id for doc in file_documents]
+        progress.documents_parsed += len(file_documents)
+        print(f"Parsed '{name}' ({len(file_documents)} document sections).")
+
+        nodes = run_transformations(file_documents, Settings.transformations)
+        progress.nodes_total += len(nodes)
+        pending.extend(nodes)
+        if len(pending) >= INSERT_BATCH_SIZE:
+            insert_pending()
+        documents.extend(file_documents)
+        if not live:
+            set_document_hashes(index, file_documents)
+
+    if pending:
+        insert_pending()
+    new_manifest = {"version": MANIFEST_VERSION, "files": diff.entries}
+    if live:
+        # Already embedded, so this only takes the in-memory updates
+        with index_swap_lock.write():
+            delete_stale()
+            index.insert_nodes(staged)
+            set_document_hashes(index, documents)
+            if on_swap is not None:
+                on_swap(new_manifest)
+    if embedding_cache is not None and progress.nodes_total:
+        print(
+            f"Embedding cache: {progress.embeddings_cached} of "
+            f"{progress.embeddings_cached + progress.embeddings_computed} "
+            "chunks reused."
+        )
+
+    return new_manifest
+
+
+def set_document_hashes(index: VectorStoreIndex, documents: List[Document]) -> None:
+    for doc in documents:
+        index.docstore.set_document_hash(doc.doc_id, doc.hash)
+
+
+def previous_persist_dir(persist_dir: str) -> str:
+    return os.path.normpath(persist_dir) + ".previous"
+
+
+def persist_index(index: VectorStoreIndex, persist_dir: str, manifest: dict) -> None:
+    """Persists the index and its manifest atomically.
+
+    Everything is written to a sibling staging directory that then replaces
+    `persist_dir`, so a crash mid-write leaves the previous index intact (it
+    is restored by `recover_persist_dir`).
+    """
+    parent = os.path.dirname(os.path.abspath(persist_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(
+        prefix=f".{os.path.basename(os.path.normpath(persist_dir))}-", dir=parent
+    )
+    try:
+        index.storage_context.persist(persist_dir=staging)
+        save_manifest(staging, manifest)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    # The memory-mapped vectors stay valid across the renames
+    previous = previous_persist_dir(persist_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(persist_dir):
+        os.rename(persist_dir, previous)
+    os.rename(staging, persist_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def recover_persist_dir(persist_dir: str) -> None:
+    """Restores the previous index if a swap in `persist_index` was interrupted."""
+    previous = previous_persist_dir(persist_dir)
+    if not os.path.isdir(previous):
+        return
+    if os.path.exists(persist_dir):
+        shutil.rmtree(previous)
+    else:
+        print(f"Restoring the index from interrupted save '{previous}'.")
+        os.rename(previous, persist_dir)
+
+
+def refresh_index(
+    index: VectorStoreIndex,
+    directory: str,
+    persist_dir: str,
+    progress: Optional[IndexingProgress] = None,
+    workers: int = 1,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    live: bool = False,
+    on_swap: Optional[Callable[[dict], None]] = None,
+) -> CorpusDiff:
+    """Brings an existing index in line with the corpus and persists it if changed.
+
+    Pass `live` (and optionally `on_swap`) while the index is serving queries
+    (see `apply_corpus_diff`).
+    """
+    manifest = load_manifest(persist_dir) or empty_manifest()
+    diff = diff_corpus(directory, manifest)
+    if diff.is_empty:
+        print("Index is up to date with the document corpus.")
+        # Still record refreshed mtimes of touched-but-identical files
+        if diff.entries != manifest.get("files"):
+            save_manifest(
+                persist_dir, {"version": MANIFEST_VERSION, "files": diff.entries}
+            )
+        return diff
+
+    print(
+        f"Refreshing index: {len(diff.added)} added, {len(diff.changed)} changed, "
+        f"{len(diff.removed)} removed, {len(diff.unchanged)} unchanged."
+    )
+    new_manifest = apply_corpus_diff(
+        index,
+        directory,
+        manifest,
+        diff,
+        progress,
+        workers,
+        embedding_cache,
+        live,
+        on_swap,
+    )
+    persist_index(index, persist_dir, new_manifest)
+    print("Index refreshed and saved successfully.")
+    return diff
+
+
+def build_index(
+    directory: str,
+    persist_dir: str,
+    progress: Optional[IndexingProgress] = None,
+    workers: int = 1,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    vector_store_options: Optional[dict] = None,
+) -> VectorStoreIndex:
+    """Builds a fresh index for the whole corpus and persists it with its manifest.
+
+    An index already in `persist_dir` is only replaced once the new one is
+    complete (see `persist_index`).
+    """
+    storage_context = StorageContext.from_defaults(
+        vector_store=MmapVectorStore(**(vector_store_options or {}))
+    )
+    index = VectorStoreIndex(nodes=[], storage_context=storage_context)
+    manifest = empty_manifest()
+    diff = diff_corpus(directory, manifest)
+    print(f"Building new index from {len(diff.added)} files in '{directory}'...")
+    new_manifest = apply_corpus_diff(
+        index, directory, manifest, diff, progress, workers, embedding_cache
+    )
+    persist_index(index, persist_dir, new_manifest)
+    print("Index built and saved successfully.")
+    return index
+
+
+def load_or_build_index(
+    directory: str,
+    persist_dir: str,
+    progress: Optional[IndexingProgress] = None,
+    workers: int = 1,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    vector_store_options: Optional[dict] = None,
+) -> VectorStoreIndex:
+    """Loads the persisted index and applies incremental changes, or builds one.
+
+    An index without a manifest (persisted by an older version) cannot be
+    diffed safely, so it is rebuilt once from scratch; so is one whose vectors
+    were persisted in the old JSON format. A failed refresh (e.g. an embedding
+    API error) does not cause a rebuild: the loaded index is served unchanged
+    and the error is recorded in `progress.error`.
+    """
+    recover_persist_dir(persist_dir)
+    if os.path.exists(persist_dir) and load_manifest(persist_dir) is not None:
+        index = None
+        try:
+            print(f"Loading existing index from '{persist_dir}'...")
+            if progress:
+                progress.start("loading")
+            # Embeddings are memory-mapped; the persisted dtype is kept until
+            # the next full rebuild
+            storage_context = StorageContext.from_defaults(
+                persist_dir=persist_dir,
+                vector_store=MmapVectorStore.from_persist_dir(
+                    persist_dir, **(vector_store_options or {})
+                ),
+            )
+            index = load_index_from_storage(storage_context)
+            print("Index loaded successfully.")
+        except Exception as e:
+            print(
+                f"Error loading index from '{persist_dir}': {e}. Attempting to rebuild."
+            )
+            logging.warning(f"Failed to load existing index, rebuilding: {e}")
+        if index is not None:
+            try:
+                # Live: nothing is deleted before the new nodes are embedded,
+                # so a failure leaves the loaded index as it was
+                refresh_index(
+                    index,
+                    directory,
+                    persist_dir,
+                    progress,
+                    workers,
+                    embedding_cache,
+                    live=True,
+                )
+            except Exception as e:
+                logging.exception("Refreshing the index failed; serving it unchanged:")
+                if progress:
+                    progress.error = f"Index refresh failed: {e}"
+            return index
+    else:
+        print(
+            f"Index storage directory '{persist_dir}' not found or has no manifest. Building new index..."
+        )
+
+    return build_index(
+        directory, persist_dir, progress, workers, embedding_cache, vector_store_options
+    )
@@ -0,0 +1,94 @@
+"""Per-job progress event channels.
+
+Every summarization run gets its own channel. Worker threads publish events
+thread-safely onto the event loop; subscribers are woken as soon as an event
+arrives (no polling), any number of them can follow the same job, and late
+joiners first receive a replay of everything published so far.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+
+
+class JobChannel:
+    """Append-only event log of one job with wake-ups for its subscribers."""
+
+    def __init__(self, job_id: str, loop: asyncio.AbstractEventLoop):
+        self.job_id = job_id
+        self.events: list = []
+        self.closed = False
+        self.closed_at: Optional[float] = None
+        self._loop = loop
+        # Resolved (and replaced) whenever the log changes
+        self._changed = loop.create_future()
+
+    def publish(self, event: dict) -> None:
+        """Appends an event; safe to call from any thread."""
+        self._loop.call_soon_threadsafe(self._append, event)
+
+    def close(self) -> None:
+        """Marks the job's stream as finished; safe to call from any thread."""
+        self._loop.call_soon_threadsafe(self._close)
+
+    def _append(self, event: dict) -> None:
+        if self.closed:
+            return
+        self.events.append(event)
+        self._notify()
+
+    def _close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.closed_at = time.time()
+        self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, self._loop.create_future()
+        changed.set_result(None)
+
+    async def subscribe(self) -> AsyncIterator[dict]:
+        """Yields every event from the start of the job until it is closed."""
+        position = 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.closed:
+                return
+            # Shielded so a disconnecting subscriber does not cancel the shared future
+            await asyncio.shield(self._changed)
+
+
+class JobEventBroker:
+    """Registry of job channels; finished channels are kept for replay for a while."""
+
+    def __init__(self, retention_seconds: float = 3600, max_channels: int = 1000):
+        self.retention_seconds = retention_seconds
+        self.max_channels = max_channels
+        self._channels: "OrderedDict[str, JobChannel]" = OrderedDict()
+
+    def create(self, job_id: Optional[str] = None) -> JobChannel:
+        """Creates a channel for a new job; must be called on the event loop."""
+        self._prune()
+        job_id = job_id or uuid.uuid4().hex
+        channel = JobChannel(job_id, asyncio.get_running_loop())
+        self._channels[job_id] = channel
+        return channel
+
+    def get(self, job_id: str) -> Optional[JobChannel]:
+        return self._channels.get(job_id)
+
+    def latest(self) -> Optional[JobChannel]:
+        return next(reversed(self._channels.values()), None)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id, channel in list(self._channels.items()):
+            if not channel.closed:
+                continue  # Never drop a running job's channel
+            if channel.closed_at < cutoff or len(self._channels) >= self.max_channels:
+                del self._channels[job_id]
@@ -0,0 +1,244 @@
+"""Bounded scheduler for long-running summarization jobs.
+
+Jobs are queued in a priority queue (FIFO within a priority) and executed by
+a fixed number of workers, which caps how many multi-minute summarization
+runs can be in flight at once. Coroutine jobs run on the event loop, so
+waiting on LLM calls ties up no thread; blocking jobs run on a dedicated
+thread pool. Each job records its status and timing and can be cancelled:
+queued jobs are dropped right away, running coroutine jobs are cancelled at
+their current await, and blocking jobs stop at their next cancellation
+checkpoint.
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Optional
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised at a cancellation checkpoint of a job that was cancelled."""
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its limit."""
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    # Coroutine function (run on the event loop) or blocking function (run on a
+    # worker thread); receives the job, for cancellation checks
+    func: Callable[["Job"], Any]
+    priority: int = 0
+    status: JobStatus = JobStatus.QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    future: Optional[asyncio.Future] = None
+    # Task of a running coroutine job
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (
+            JobStatus.SUCCEEDED,
+            JobStatus.FAILED,
+            JobStatus.CANCELLED,
+        )
+
+    def check_cancelled(self) -> None:
+        """Cancellation checkpoint; call regularly from the job function."""
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.job_id} was cancelled.")
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        queued_until = self.started_at or self.finished_at or now
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "priority": self.priority,
+            "status": self.status.value,
+            "cancel_requested": self.cancel_event.is_set(),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queued_seconds": round(queued_until - self.submitted_at, 3),
+            "run_seconds": (
+                round((self.finished_at or now) - self.started_at, 3)
+                if self.started_at
+                else None
+            ),
+            "error": self.error,
+        }
+
+
+class JobScheduler:
+    """Priority queue + fixed worker pool for coroutine and blocking jobs."""
+
+    def __init__(
+        self, max_workers: int = 2, max_queued: int = 50, max_retained: int = 1000
+    ):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_retained = max_retained
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._sequence = itertools.count()  # FIFO tie-breaker within a priority
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers: list = []
+        self.running = 0
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._queue = asyncio.PriorityQueue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="job-worker"
+        )
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.max_workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancels queued and running jobs and shuts the workers down."""
+        self._stopping = True
+        for job in self._jobs.values():
+            if not job.is_finished:
+                self.cancel(job.job_id)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == JobStatus.QUEUED)
+
+    def submit(
+        self,
+        func: Callable[[Job], Any],
+        kind: str,
+        priority: int = 0,
+        job_id: Optional[str] = None,
+    ) -> Job:
+        """Queues a job (lower priority value runs first); raises QueueFull at the limit."""
+        if self._queue is None:
+            raise RuntimeError("Job scheduler is not running.")
+        if self.queue_depth >= self.max_queued:
+            raise QueueFull(f"{self.queue_depth} jobs already queued.")
+        job = Job(
+            job_id=job_id or uuid.uuid4().hex, kind=kind, func=func, priority=priority
+        )
+        job.future = asyncio.get_running_loop().create_future()
+        self._jobs[job.job_id] = job
+        self._prune()
+        self._queue.put_nowait((priority, next(self._sequence), job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list:
+        """Retained jobs, oldest first."""
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Requests cancellation; returns False for unknown or already finished jobs."""
+        job = self._jobs.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        job.cancel_event.set()
+        if job.status == JobStatus.QUEUED:
+            # Workers skip it when it reaches the front of the queue
+            self._finish(job, JobStatus.CANCELLED, exception=JobCancelled(job_id))
+        elif job.task is not None:
+            job.task.cancel()
+        return True
+
+    async def wait(self, job: Job) -> Any:
+        """Waits for a job's result; the job keeps running if the waiter goes away."""
+        return await asyncio.shield(job.future)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "running": self.running,
+            "queued": self.queue_depth,
+            "max_queued": self.max_queued,
+        }
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job = await self._queue.get()
+            if job.is_finished:  # Cancelled while queued
+                continue
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            self.running += 1
+            try:
+                if asyncio.iscoroutinefunction(job.func):
+                    job.task = asyncio.ensure_future(job.func(job))
+                    result = await job.task
+                else:
+                    result = await loop.run_in_executor(self._executor, job.func, job)
+                if job.cancel_event.is_set():
+                    raise JobCancelled(job.job_id)
+                self._finish(job, JobStatus.SUCCEEDED, result=result)
+            except JobCancelled as e:
+                self._finish(job, JobStatus.CANCELLED, exception=e)
+            except asyncio.CancelledError:
+                self._finish(
+                    job, JobStatus.CANCELLED, exception=JobCancelled(job.job_id)
+                )
+                if self._stopping or not job.cancel_event.is_set():
+                    raise  # The worker itself was cancelled
+            except Exception as e:
+                job.error = str(e)
+                self._finish(job, JobStatus.FAILED, exception=e)
+            finally:
+                job.task = None
+                self.running -= 1
+
+    def _finish(
+        self,
+        job: Job,
+        status: JobStatus,
+        result: Any = None,
+        exception: Optional[BaseException] = None,
+    ) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        if job.future.done():
+            return
+        if exception is not None:
+            job.future.set_exception(exception)
+            # Mark as retrieved so unobserved failures are not logged as warnings
+            job.future.exception()
+        else:
+            job.future.set_result(result)
+
+    def _prune(self) -> None:
+        for job_id, job in list(self._jobs.items()):
+            if len(self._jobs) <= self.max_retained:
+                break
+            if job.is_finished:
+                del self._jobs[job_id]
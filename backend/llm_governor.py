@@ -0,0 +1,684 @@
+"""Shared admission control for LLM calls.
+
+Every LLM call of the chat engine, the map-reduce summaries and the CrewAI
+runs holds a slot of one process-wide governor, which combines:
+
+- a concurrency limit (calls in flight), with a smaller share for background
+  work such as summaries, so it can never take every slot from interactive
+  requests,
+- token buckets for requests and tokens per minute, so bursts are spread out
+  instead of running into the provider's rate limits,
+- fair queuing: waiting calls are queued per client and clients are served
+  round-robin, so one busy client cannot starve the others,
+- bounded queues: once they are full, or a call has waited too long,
+  `LLMOverloaded` is raised right away and the API answers 429 with a
+  Retry-After estimate, so latency degrades predictably under load.
+
+`GovernedLLM` wraps a LlamaIndex LLM so that all of its calls go through the
+governor. `govern_crew_llm` does the same for a CrewAI LLM.
+
+Token charges are estimated before a call (prompt characters / 4 plus the
+expected completion) and corrected with the reported usage after it.
+"""
+
+import asyncio
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterator,
+    Optional,
+    Sequence,
+)
+
+from crewai.llms.base_llm import BaseLLM
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.llms.llm import LLM
+from pydantic import Field
+
+CHARS_PER_TOKEN = 4  # Rough prompt size estimate, corrected after the call
+
+# Client on whose behalf LLM calls are made (fair queuing lane)
+current_client: contextvars.ContextVar = contextvars.ContextVar(
+    "llm_client", default="default"
+)
+# Seconds LLM calls may wait for a slot; None: the governor's default
+current_max_wait: contextvars.ContextVar = contextvars.ContextVar(
+    "llm_max_wait", default=None
+)
+# Whether LLM calls count against the background share of the slots
+current_background: contextvars.ContextVar = contextvars.ContextVar(
+    "llm_background", default=False
+)
+
+
+@contextmanager
+def client_context(
+    client: str, max_wait: Optional[float] = None, background: bool = False
+) -> Iterator[None]:
+    """Attributes the LLM calls made in this block to `client`.
+
+    `max_wait` overrides how long they may wait for a slot (`math.inf`: until
+    granted, e.g. for cancellable background jobs). `background` calls only
+    use the governor's background share of the slots.
+    """
+    client_token = current_client.set(client)
+    wait_token = current_max_wait.set(max_wait)
+    background_token = current_background.set(background)
+    try:
+        yield
+    finally:
+        current_background.reset(background_token)
+        current_max_wait.reset(wait_token)
+        current_client.reset(client_token)
+
+
+class ClientIdentityMiddleware:
+    """ASGI middleware setting `current_client` for each HTTP request.
+
+    Clients are identified by their X-Client-Id header, falling back to the
+    peer address (put a proxy that sets the header in front when all traffic
+    comes through one address).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        client = dict(scope["headers"]).get(b"x-client-id", b"").decode("latin-1")
+        if not client:
+            client = scope["client"][0] if scope.get("client") else "default"
+        with client_context(client):
+            await self.app(scope, receive, send)
+
+
+class LLMOverloaded(Exception):
+    """Raised instead of queuing an LLM call when the governor is saturated."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to a burst of one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (capped at the capacity)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float, now: float) -> None:
+        """Takes units; the level may go negative (debt is paid back by refills)."""
+        self._refill(now)
+        self.level -= amount
+
+
+class _Waiter:
+    __slots__ = ("client", "tokens", "background", "wake", "granted")
+
+    def __init__(
+        self, client: str, tokens: int, background: bool, wake: Callable[[], None]
+    ):
+        self.client = client
+        self.tokens = tokens
+        self.background = background
+        self.wake = wake
+        self.granted = False
+
+
+class Lease:
+    """One admitted LLM call; release it when the call is over."""
+
+    def __init__(self, governor: "LLMGovernor", tokens: int, background: bool):
+        self.governor = governor
+        self.tokens = tokens
+        self.background = background
+        self.started = time.monotonic()
+        self.released = False
+
+    def settle(self, actual_tokens: Optional[int]) -> None:
+        """Corrects the token charge with the usage the provider reported."""
+        if actual_tokens:
+            self.governor._adjust_tokens(actual_tokens - self.tokens)
+            self.tokens = actual_tokens
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.governor._release(time.monotonic() - self.started, self.background)
+
+
+class LLMGovernor:
+    """Concurrency limit + rate budgets + per-client fair queue for LLM calls.
+
+    Background calls (see `client_context`) may hold at most
+    `max_background_concurrency` of the `max_concurrency` slots; the value is
+    clamped so that at least one slot stays free for interactive calls.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        max_background_concurrency: int = 4,
+        requests_per_minute: float = 0,  # 0: unlimited
+        tokens_per_minute: float = 0,  # 0: unlimited
+        max_queued: int = 100,
+        max_queued_per_client: int = 20,
+        max_wait_seconds: float = 30,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("The concurrency limit must be at least 1.")
+        # A single slot cannot be split; background calls then share it
+        background_limit = max(1, max_concurrency - 1)
+        if not 0 < max_background_concurrency <= background_limit:
+            clamped = min(max(1, max_background_concurrency), background_limit)
+            logging.warning(
+                f"Background LLM concurrency {max_background_concurrency} is "
+                f"outside 1..{background_limit} for a concurrency limit of "
+                f"{max_concurrency}; using {clamped}."
+            )
+            max_background_concurrency = clamped
+        if max_background_concurrency == max_concurrency:
+            logging.warning(
+                "With a concurrency limit of 1, no LLM slot is reserved for "
+                "interactive calls; summaries can delay chats."
+            )
+        self.max_concurrency = max_concurrency
+        self.max_background_concurrency = max_background_concurrency
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+        self.max_wait_seconds = max_wait_seconds
+        self._requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+        # Client -> its waiting calls; served round-robin in this order
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._timer: Optional[threading.Timer] = None
+        self.active = 0
+        self.background_active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._avg_call_seconds = 1.0  # Moving average, for Retry-After estimates
+
+    # --- Admission ---
+
+    def check_admission(self, client: Optional[str] = None) -> None:
+        """Raises LLMOverloaded if a new call from `client` would be rejected.
+
+        Lets endpoints answer 429 before doing any work for the request.
+        """
+        client = client or current_client.get()
+        with self._lock:
+            self._check_queue_bounds(client)
+
+    @contextmanager
+    def reserve_sync(
+        self, tokens: int, client: Optional[str] = None
+    ) -> Iterator[Lease]:
+        """Holds a slot for the duration of the block (blocking; for worker threads)."""
+        lease = self.acquire_sync(tokens, client)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    @asynccontextmanager
+    async def reserve(
+        self, tokens: int, client: Optional[str] = None
+    ) -> AsyncIterator[Lease]:
+        lease = await self.acquire(tokens, client)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    def acquire_sync(self, tokens: int, client: Optional[str] = None) -> Lease:
+        event = threading.Event()
+        background = current_background.get()
+        waiter = self._enqueue(
+            client or current_client.get(), tokens, background, event.set
+        )
+        if waiter is not None and not event.wait(self._wait_timeout()):
+            self._abandon(waiter)
+        return Lease(self, tokens, background)
+
+    async def acquire(self, tokens: int, client: Optional[str] = None) -> Lease:
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(
+                lambda: granted.done() or granted.set_result(None)
+            )
+
+        background = current_background.get()
+        waiter = self._enqueue(client or current_client.get(), tokens, background, wake)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(granted, self._wait_timeout())
+            except asyncio.TimeoutError:
+                self._abandon(waiter)
+            except asyncio.CancelledError:
+                self._abandon(waiter, cancelled=True)
+                raise
+        return Lease(self, tokens, background)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self.active,
+                "max_concurrency": self.max_concurrency,
+                "background_active": self.background_active,
+                "max_background_concurrency": self.max_background_concurrency,
+                "queued": self.queued,
+                "waiting_clients": len(self._queues),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+    # --- Internals (call with self._lock held unless noted) ---
+
+    def _wait_timeout(self) -> Optional[float]:
+        max_wait = current_max_wait.get()
+        if max_wait is None:
+            return self.max_wait_seconds
+        return None if math.isinf(max_wait) else max_wait
+
+    def _check_queue_bounds(self, client: str) -> None:
+        if not self._queues and self.active < self.max_concurrency:
+            return
+        client_queue = self._queues.get(client, ())
+        if self.queued >= self.max_queued:
+            reason = f"{self.queued} LLM calls queued"
+        elif len(client_queue) >= self.max_queued_per_client:
+            reason = f"{len(client_queue)} LLM calls queued for this client"
+        else:
+            return
+        self.rejected += 1
+        raise LLMOverloaded(reason, self._retry_after())
+
+    def _enqueue(
+        self, client: str, tokens: int, background: bool, wake: Callable[[], None]
+    ) -> Optional[_Waiter]:
+        """Grants right away (returns None) or queues a waiter; takes the lock."""
+        with self._lock:
+            if (
+                not self._queues
+                and self.active < self.max_concurrency
+                and self._has_slot(background)
+                and self._budget_wait(tokens) == 0
+            ):
+                self._grant(tokens, background)
+                return None
+            self._check_queue_bounds(client)
+            waiter = _Waiter(client, tokens, background, wake)
+            self._queues.setdefault(client, deque()).append(waiter)
+            self.queued += 1
+            self._dispatch()
+            return waiter
+
+    def _abandon(self, waiter: _Waiter, cancelled: bool = False) -> None:
+        """Handles a waiter that gave up: raises LLMOverloaded on a timeout."""
+        with self._lock:
+            if waiter.granted:
+                if not cancelled:
+                    return  # Granted just as the wait timed out; keep the slot
+                self.active -= 1
+                if waiter.background:
+                    self.background_active -= 1
+                self._dispatch()
+                return
+            queue = self._queues.get(waiter.client)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                self.queued -= 1
+                if not queue:
+                    del self._queues[waiter.client]
+            if cancelled:
+                return
+            self.timeouts += 1
+            retry_after = self._retry_after()
+        raise LLMOverloaded(
+            f"Waited more than {self._wait_timeout():g}s for an LLM slot", retry_after
+        )
+
+    def _budget_wait(self, tokens: int) -> float:
+        now = time.monotonic()
+        return max(
+            self._requests.wait_time(1, now) if self._requests else 0.0,
+            self._tokens.wait_time(tokens, now) if self._tokens else 0.0,
+        )
+
+    def _has_slot(self, background: bool) -> bool:
+        return (
+            not background or self.background_active < self.max_background_concurrency
+        )
+
+    def _grant(self, tokens: int, background: bool) -> None:
+        now = time.monotonic()
+        if self._requests:
+            self._requests.take(1, now)
+        if self._tokens:
+            self._tokens.take(tokens, now)
+        self.active += 1
+        if background:
+            self.background_active += 1
+        self.admitted += 1
+
+    def _dispatch(self) -> None:
+        """Grants queued calls round-robin while slots and budget allow.
+
+        Clients whose next call would exceed the background share are skipped.
+        """
+        while self._queues and self.active < self.max_concurrency:
+            for client, queue in self._queues.items():
+                if self._has_slot(queue[0].background):
+                    break
+            else:
+                return  # Only background calls are waiting, and their share is used
+            waiter = queue[0]
+            wait = self._budget_wait(waiter.tokens)
+            if wait > 0:
+                self._schedule_dispatch(wait)
+                return
+            queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            self._grant(waiter.tokens, waiter.background)
+            waiter.granted = True
+            waiter.wake()
+
+    def _schedule_dispatch(self, delay: float) -> None:
+        if self._timer is not None and self._timer.is_alive():
+            return
+
+        def run():
+            with self._lock:
+                self._timer = None
+                self._dispatch()
+
+        self._timer = threading.Timer(delay, run)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _release(self, held_seconds: float, background: bool) -> None:
+        """Frees a slot (takes the lock)."""
+        with self._lock:
+            self.active -= 1
+            if background:
+                self.background_active -= 1
+            self._avg_call_seconds += 0.1 * (held_seconds - self._avg_call_seconds)
+            self._dispatch()
+
+    def _adjust_tokens(self, delta: int) -> None:
+        """Takes the lock."""
+        if self._tokens is None:
+            return
+        with self._lock:
+            self._tokens.take(delta, time.monotonic())
+
+    def _retry_after(self) -> int:
+        """Estimated seconds until the queue has drained enough to admit a call."""
+        drain = (self.queued + 1) * self._avg_call_seconds / self.max_concurrency
+        budget = self._budget_wait(0)
+        return max(1, min(60, math.ceil(max(drain, budget))))
+
+
+def estimate_tokens(text: str, completion_tokens: int) -> int:
+    return len(text) // CHARS_PER_TOKEN + completion_tokens
+
+
+def reported_tokens(response) -> Optional[int]:
+    """Total tokens of a LlamaIndex response, if the provider reported usage."""
+    usage = getattr(response, "additional_kwargs", None) or {}
+    total = usage.get("total_tokens") or (
+        usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+    )
+    return total or None
+
+
+class GovernedLLM(LLM):
+    """Delegates to another LLM, holding a governor slot for each call.
+
+    Streaming calls keep their slot until the stream is exhausted or closed.
+    The wrapped LLM emits the instrumentation events, so this class does not.
+    """
+
+    llm: LLM
+    governor: Any = Field(exclude=True)
+    # Expected completion size when the model has no output limit configured
+    completion_tokens_estimate: int = 256
+
+    def __init__(self, llm: LLM, governor: LLMGovernor, **kwargs: Any):
+        super().__init__(
+            llm=llm,
+            governor=governor,
+            system_prompt=llm.system_prompt,
+            callback_manager=llm.callback_manager,
+            **kwargs,
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "GovernedLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return self.llm.metadata
+
+    def _estimate(self, text: str) -> int:
+        num_output = self.llm.metadata.num_output
+        return estimate_tokens(
+            text, num_output if num_output > 0 else self.completion_tokens_estimate
+        )
+
+    def _chat_estimate(self, messages: Sequence[ChatMessage]) -> int:
+        return self._estimate("".join(str(message.content) for message in messages))
+
+    # --- Blocking calls ---
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        with self.governor.reserve_sync(self._chat_estimate(messages)) as lease:
+            response = self.llm.chat(messages, **kwargs)
+            lease.settle(reported_tokens(response))
+            return response
+
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        with self.governor.reserve_sync(self._estimate(prompt)) as lease:
+            response = self.llm.complete(prompt, formatted=formatted, **kwargs)
+            lease.settle(reported_tokens(response))
+            return response
+
+    def stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseGen:
+        lease = self.governor.acquire_sync(self._chat_estimate(messages))
+        return _release_after(lease, lambda: self.llm.stream_chat(messages, **kwargs))
+
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        lease = self.governor.acquire_sync(self._estimate(prompt))
+        return _release_after(
+            lease,
+            lambda: self.llm.stream_complete(prompt, formatted=formatted, **kwargs),
+        )
+
+    # --- Async calls ---
+
+    async def achat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        async with self.governor.reserve(self._chat_estimate(messages)) as lease:
+            response = await self.llm.achat(messages, **kwargs)
+            lease.settle(reported_tokens(response))
+            return response
+
+    async def acomplete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        async with self.governor.reserve(self._estimate(prompt)) as lease:
+            response = await self.llm.acomplete(prompt, formatted=formatted, **kwargs)
+            lease.settle(reported_tokens(response))
+            return response
+
+    async def astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        lease = await self.governor.acquire(self._chat_estimate(messages))
+        try:
+            stream = await self.llm.astream_chat(messages, **kwargs)
+        except BaseException:
+            lease.release()
+            raise
+        return _arelease_after(lease, stream)
+
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        lease = await self.governor.acquire(self._estimate(prompt))
+        try:
+            stream = await self.llm.astream_complete(
+                prompt, formatted=formatted, **kwargs
+            )
+        except BaseException:
+            lease.release()
+            raise
+        return _arelease_after(lease, stream)
+
+
+class _GovernedCrewLLM:
+    """Mixin for CrewAI LLM classes holding a governor slot for each call."""
+
+    governor: ClassVar[Any]
+    completion_tokens: ClassVar[int]
+
+    def _estimate(self, messages) -> int:
+        if isinstance(messages, str):
+            text = messages
+        else:
+            text = "".join(str(message.get("content") or "") for message in messages)
+        max_tokens = getattr(self, "max_tokens", None)
+        return estimate_tokens(text, max_tokens or self.completion_tokens)
+
+    def _used_since(self, before) -> int:
+        return self.get_token_usage_summary().delta_since(before).total_tokens
+
+    def call(self, messages, *args: Any, **kwargs: Any) -> Any:
+        with self.governor.reserve_sync(self._estimate(messages)) as lease:
+            before = self.get_token_usage_summary()
+            result = super().call(messages, *args, **kwargs)
+            lease.settle(self._used_since(before))
+            return result
+
+    async def acall(self, messages, *args: Any, **kwargs: Any) -> Any:
+        async with self.governor.reserve(self._estimate(messages)) as lease:
+            before = self.get_token_usage_summary()
+            result = await super().acall(messages, *args, **kwargs)
+            lease.settle(self._used_since(before))
+            return result
+
+
+_governed_crew_classes: Dict[tuple, type] = {}
+
+
+def govern_crew_llm(
+    llm: BaseLLM, governor: LLMGovernor, completion_tokens: int = 1024
+) -> BaseLLM:
+    """Makes every call of a CrewAI LLM hold a slot of `governor`.
+
+    CrewAI's LLM call hooks are synchronous and the LLM classes differ per
+    provider, so the instance is switched to a subclass of its own class
+    that wraps `call` and `acall`. `completion_tokens` is the expected output
+    of a call when the LLM has no `max_tokens`.
+    """
+    key = (type(llm), id(governor), completion_tokens)
+    governed_class = _governed_crew_classes.get(key)
+    if governed_class is None:
+        governed_class = type(
+            f"Governed{type(llm).__name__}",
+            (_GovernedCrewLLM, type(llm)),
+            {
+                "__annotations__": {
+                    "governor": ClassVar[Any],
+                    "completion_tokens": ClassVar[int],
+                },
+                "governor": governor,
+                "completion_tokens": completion_tokens,
+            },
+        )
+        _governed_crew_classes[key] = governed_class
+    llm.__class__ = governed_class
+    return llm
+
+
+def _release_after(lease: Lease, start_stream: Callable[[], Iterator]) -> Iterator:
+    try:
+        stream = start_stream()
+    except BaseException:
+        lease.release()
+        raise
+
+    def gen():
+        last = None
+        try:
+            for last in stream:
+                yield last
+            lease.settle(reported_tokens(last))
+        finally:
+            lease.release()
+
+    return gen()
+
+
+async def _arelease_after(lease: Lease, stream) -> AsyncIterator:
+    last = None
+    try:
+        async for last in stream:
+            yield last
+        lease.settle(reported_tokens(last))
+    finally:
+        lease.release()
@@ -4,39 +4,66 @@ import sys
 from dotenv import load_dotenv
 import asyncio  # For running sync code in async endpoint
 import json
-import threading
-from queue import Queue
+import math
+import shutil
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict
 
-# Intialize Langtrace
-# Must precede any llm module imports
-
-from langtrace_python_sdk import langtrace
-
-langtrace.init(
-    api_key="503673573713bee42d7940dc2db7209381305ef1f0c1f186197efa596e337108"
-)
-
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, File, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Tuple, Optional
+from typing import Awaitable, Callable, List, Literal, Tuple, Optional
 
-from crewai import Agent, Crew, Process, Task
-from crewai.project import CrewBase, agent, crew, task
 from crewai.tasks.task_output import TaskOutput
+from crewai.utilities.llm_utils import create_llm
 
 
 # LlamaIndex imports
 from llama_index.core import (
     VectorStoreIndex,
-    SimpleDirectoryReader,
-    StorageContext,
-    load_index_from_storage,
     Settings,
 )
+from answer_cache import AnswerCache, CachedAnswer
+from batch_chat import answer_batch
+from chat_memory import RollingSummaryMemory
+from chat_sessions import ChatSession, ChatSessionPool
+from context_packing import ESG_THEMES, pack_theme_context
+from crew_factory import CrewFactory, CrewRun, LLMPool
+from embedding_cache import EmbeddingCache
+from esg_mapreduce import MAP_PROMPT, MERGE_PROMPT, SUMMARY_PROMPT, run_esg_map_reduce
+from fake_models import FakeEmbedding, FakeLLM
+from indexing import (
+    CorpusDiff,
+    IndexingProgress,
+    LiveIndexRetriever,
+    corpus_version,
+    load_manifest,
+    load_or_build_index,
+    refresh_index,
+)
+from job_events import JobEventBroker
+from job_scheduler import Job, JobCancelled, JobScheduler, JobStatus, QueueFull
+from llm_governor import (
+    ClientIdentityMiddleware,
+    GovernedLLM,
+    LLMGovernor,
+    LLMOverloaded,
+    client_context,
+    govern_crew_llm,
+)
+from metrics import MetricsMiddleware, MetricsRegistry, instrument_llama_index
+from parallel_ingest import default_ingest_workers
+from summary_cache import SummaryCache, corpus_fingerprint, summary_cache_key
+from standalone_questions import is_standalone
+from text_cache import load_corpus_entries
+import tracing
 from llama_index.core.chat_engine import CondenseQuestionChatEngine
-from llama_index.llms.openai import OpenAI  # Or your preferred LLM
+from llama_index.core.llms import ChatMessage, MessageRole
+from llama_index.core.memory import BaseMemory, ChatMemoryBuffer
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.base.llms.generic_utils import messages_to_history_str
 
 # --- Basic Setup & Configuration ---
 # Load environment variables from .env file (especially OPENAI_API_KEY)
@@ -47,10 +74,23 @@ logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 logging.getLogger().addHandler(logging.StreamHandler(stream=sys.stdout))
 
 
+# "openai", or "fake" for deterministic local stand-ins with configurable
+# latency (offline benchmarks, see fake_models.py and benchmarks/load_test.py)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "openai")
+
 # Check for OpenAI API Key
 api_key = os.getenv("OPENAI_API_KEY")
 
-if not api_key:
+if MODEL_BACKEND == "fake":
+    Settings.llm = FakeLLM(
+        latency_seconds=float(os.getenv("FAKE_LLM_LATENCY", "0.5")),
+        token_latency_seconds=float(os.getenv("FAKE_LLM_TOKEN_LATENCY", "0.01")),
+    )
+    Settings.embed_model = FakeEmbedding(
+        latency_seconds=float(os.getenv("FAKE_EMBED_LATENCY", "0.05"))
+    )
+    print("Using fake local LLM and embedding models.")
+elif not api_key:
     print("Error: OPENAI_API_KEY environment variable not set.")
     sys.exit(1)
 
@@ -66,288 +106,602 @@ if not api_key:
 print(api_key)
 
 # --- Constants ---
-PDF_DIR = "data"  # Directory containing your PDF(s)
-PERSIST_DIR = "./storage"  # Directory to store the index
+PDF_DIR = os.getenv("PDF_DIR", "data")  # Directory containing your PDF(s)
+PERSIST_DIR = os.getenv("PERSIST_DIR", "./storage")  # Directory to store the index
+# Directory for derived data caches (safe to delete)
+CACHE_DIR = os.getenv("CACHE_DIR", "./cache")
+TEXT_CACHE_DIR = os.path.join(CACHE_DIR, "text")  # Extracted document text
+SUMMARY_CACHE_DIR = os.path.join(CACHE_DIR, "summaries")  # ESG summaries
+# Chunk embeddings keyed by model + text hash
+EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite3")
+
+# Chat session pool limits (per-session engines, see chat_sessions.py)
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "3600"))  # Seconds idle
+CHAT_SESSION_TOKEN_LIMIT = int(os.getenv("CHAT_SESSION_TOKEN_LIMIT", "3000"))
+# Chat history policy (see chat_memory.py): "summary" keeps the last turns
+# verbatim and summarizes older ones, "window" drops older turns, "buffer"
+# keeps whatever fits into CHAT_SESSION_TOKEN_LIMIT.
+CHAT_MEMORY_POLICY = os.getenv("CHAT_MEMORY_POLICY", "summary")
+CHAT_MEMORY_RECENT_TURNS = int(os.getenv("CHAT_MEMORY_RECENT_TURNS", "4"))
+CHAT_MEMORY_SUMMARY_TOKENS = int(os.getenv("CHAT_MEMORY_SUMMARY_TOKENS", "300"))
+# Skip the condense LLM call for follow-ups that look self-contained; a local
+# heuristic that can misjudge elliptical follow-ups (see standalone_questions.py)
+CHAT_SKIP_STANDALONE_CONDENSE = (
+    os.getenv("CHAT_SKIP_STANDALONE_CONDENSE", "false").lower() == "true"
+)
+CHAT_MAX_TOTAL_CHARS = int(os.getenv("CHAT_MAX_TOTAL_CHARS", "20000000"))
+SOURCE_SNIPPET_CHARS = 300  # Length of source node excerpts sent to the client
+
+# Answer cache for first-turn questions (see answer_cache.py)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # Seconds
+# Minimum cosine similarity for a paraphrase to hit; above 1 disables it
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+# Batch questions (/api/chat/batch, see batch_chat.py)
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))  # Parallel syntheses
+
+# Summarization job scheduler limits (see job_scheduler.py)
+# Summaries run on the event loop and mostly wait on the LLM, so many can be in
+# flight without extra threads; their LLM calls share LLM_MAX_BACKGROUND_CONCURRENCY
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "8"))  # Concurrent summary runs
+SUMMARY_MAX_QUEUED = int(os.getenv("SUMMARY_MAX_QUEUED", "50"))
+
+# Persisted vector store (see vector_store.py and ann_index.py)
+VECTOR_STORE_OPTIONS = {
+    # On-disk embedding format: "float32" or "int8" (4x smaller)
+    "dtype": os.getenv("VECTOR_STORE_DTYPE", "float32"),
+    # "exact" scans every vector; "ivf" only the closest clusters (approximate)
+    "search": os.getenv("VECTOR_SEARCH", "exact"),
+    "ivf_lists": int(os.getenv("VECTOR_IVF_LISTS", "0")),  # 0: sqrt(vectors)
+    "ivf_probes": int(os.getenv("VECTOR_IVF_PROBES", "8")),  # Higher: better recall
+    "ivf_min_rows": int(os.getenv("VECTOR_IVF_MIN_ROWS", "20000")),
+}
+
+# Processes used to parse source documents (see parallel_ingest.py)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(default_ingest_workers())))
+# Document uploads (/api/documents)
+INGEST_MAX_UPLOAD_MB = float(os.getenv("INGEST_MAX_UPLOAD_MB", "100"))  # Per file
+
+# Map-reduce summarization (see esg_mapreduce.py)
+ESG_CHUNK_TOKENS = int(os.getenv("ESG_CHUNK_TOKENS", "3000"))  # Per map prompt
+ESG_CHUNK_OVERLAP_TOKENS = int(os.getenv("ESG_CHUNK_OVERLAP_TOKENS", "200"))
+ESG_MAP_CONCURRENCY = int(os.getenv("ESG_MAP_CONCURRENCY", "4"))  # Parallel LLM calls
+ESG_MERGE_BUDGET_TOKENS = int(os.getenv("ESG_MERGE_BUDGET_TOKENS", "6000"))
+
+# Crew analysis input: index chunks per ESG theme (see context_packing.py)
+ESG_CONTEXT_TOKENS = int(os.getenv("ESG_CONTEXT_TOKENS", "2500"))  # Packing budget
+ESG_CONTEXT_TOP_K = int(os.getenv("ESG_CONTEXT_TOP_K", "8"))  # Chunks per theme
+
+# Request tracing (see tracing.py); set up in the background after startup
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")  # "none", "jsonl", "otlp"
+# Fraction of requests and jobs that are traced
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.01"))
+TRACING_JSONL_PATH = os.getenv("TRACING_JSONL_PATH", "./traces/spans.jsonl")
+# OTLP/HTTP endpoint of a local OpenTelemetry collector
+TRACING_OTLP_ENDPOINT = os.getenv(
+    "TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
 
-# --- Create a global message queue for streaming ---
-message_queue = Queue()
+# LLM admission control (see llm_governor.py), shared by chat and summaries
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # Calls in flight
+# Of which summary jobs may hold at most this many (clamped below the limit)
+LLM_MAX_BACKGROUND_CONCURRENCY = int(
+    os.getenv("LLM_MAX_BACKGROUND_CONCURRENCY", str(max(1, LLM_MAX_CONCURRENCY // 2)))
+)
+# Provider rate limits to stay under; 0 disables a budget
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+# Waiting calls beyond these bounds are rejected with 429 right away
+LLM_MAX_QUEUED = int(os.getenv("LLM_MAX_QUEUED", "100"))
+LLM_MAX_QUEUED_PER_CLIENT = int(os.getenv("LLM_MAX_QUEUED_PER_CLIENT", "20"))
+LLM_MAX_WAIT = float(os.getenv("LLM_MAX_WAIT", "30"))  # Seconds queued before 429
+CREW_COMPLETION_TOKENS = 1024  # Expected output of a crew LLM call, for the budget
+
+# --- LLM admission control ---
+# Every LLM call (chat, batch, map-reduce summaries, CrewAI agent steps)
+# takes a slot of the governor; summary jobs only get the background share.
+llm_governor = LLMGovernor(
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_background_concurrency=LLM_MAX_BACKGROUND_CONCURRENCY,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    max_queued=LLM_MAX_QUEUED,
+    max_queued_per_client=LLM_MAX_QUEUED_PER_CLIENT,
+    max_wait_seconds=LLM_MAX_WAIT,
+)
+Settings.llm = GovernedLLM(Settings.llm, llm_governor)
+
+# --- Summarization jobs: bounded scheduler + per-job progress channels ---
+job_scheduler = JobScheduler(max_workers=SUMMARY_WORKERS, max_queued=SUMMARY_MAX_QUEUED)
+job_events = JobEventBroker()
+
+# --- LlamaIndex: Load or Build Index (in the background) ---
+# The index and chat sessions are created by a background startup task so the
+# server binds its port immediately; /api/ready reports progress and /api/chat
+# answers 503 until the engine is available.
+# The persisted index carries a manifest of per-file content hashes, so only
+# added, changed or removed PDFs are (re-)parsed and embedded on startup.
+index: Optional[VectorStoreIndex] = None
+# Query engines (retriever + synthesizer) are stateless and shared by all chat
+# sessions; the streaming one is kept separate because CondenseQuestionChatEngine
+# toggles its synthesizer's streaming flag for the duration of a request.
+query_engine = None
+streaming_query_engine = None
+chat_sessions: Optional[ChatSessionPool] = None
+index_progress = IndexingProgress()
+# Reused across builds and refreshes so unchanged chunks are never re-embedded
+embedding_cache: Optional[EmbeddingCache] = None
+# Scoped to the indexed corpus version, which is set after every load/refresh
+answer_cache = AnswerCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL,
+    similarity_threshold=ANSWER_CACHE_SIMILARITY,
+)
 
-# --- LlamaIndex: Load or Build Index ---
-index = None
-try:
-    # Check if the storage directory exists
-    storage_exists = os.path.exists(PERSIST_DIR)
+# --- Metrics (Prometheus text format at /metrics, see metrics.py) ---
+metrics_registry = MetricsRegistry()
+http_request_seconds = metrics_registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request duration until the response is complete.",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = metrics_registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."
+)
+stage_seconds = metrics_registry.histogram(
+    "rag_stage_duration_seconds",
+    "Duration of chat pipeline stages: condense, retrieve, synthesize and "
+    "generate (streaming the answer tokens).",
+    ("stage",),
+)
+condense_decisions = metrics_registry.counter(
+    "chat_condense_decisions_total",
+    "Chat turns by whether the question was condensed or used as is "
+    "(first_turn, standalone).",
+    ("decision",),
+)
+condense_prompt_tokens = metrics_registry.histogram(
+    "chat_condense_prompt_tokens",
+    "Size of the condense-question prompt per follow-up chat turn, in tokens.",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+time_to_first_token_seconds = metrics_registry.histogram(
+    "chat_time_to_first_token_seconds",
+    "Time from a streaming chat request to its first answer token.",
+)
+chat_requests = metrics_registry.counter(
+    "chat_requests_total",
+    "Chat turns by endpoint and answer source.",
+    ("endpoint", "source"),
+)
+llm_tokens = metrics_registry.counter(
+    "llm_tokens_total",
+    "LLM tokens used, as reported by the provider or estimated.",
+    ("pipeline", "kind"),
+)
+crew_task_seconds = metrics_registry.histogram(
+    "crew_task_duration_seconds", "Duration of CrewAI tasks.", ("task",)
+)
+summary_job_seconds = metrics_registry.histogram(
+    "summary_job_duration_seconds",
+    "Run time of finished summarization jobs.",
+    ("kind", "status"),
+)
+summary_job_queue_seconds = metrics_registry.histogram(
+    "summary_job_queue_seconds",
+    "Time summarization jobs waited in the queue.",
+    ("kind",),
+)
+summary_jobs = metrics_registry.gauge(
+    "summary_jobs", "Summarization jobs running or queued.", ("state",)
+)
+cache_hit_ratio = metrics_registry.gauge(
+    "cache_hit_ratio",
+    "Hit ratio of the answer, embedding and summary caches.",
+    ("cache",),
+)
+active_chat_sessions = metrics_registry.gauge(
+    "chat_sessions", "Chat sessions held in memory."
+)
+llm_calls = metrics_registry.gauge(
+    "llm_calls", "LLM calls in flight or waiting for a slot.", ("state",)
+)
+llm_rejections = metrics_registry.gauge(
+    "llm_rejected_calls",
+    "LLM calls rejected since startup because the queue was full or the wait "
+    "too long.",
+    ("reason",),
+)
+instrument_llama_index(stage_seconds, llm_tokens)
 
-    if storage_exists:
-        try:
-            # Attempt to load the existing index
-            print(f"Loading existing index from '{PERSIST_DIR}'...")
-            storage_context = StorageContext.from_defaults(persist_dir=PERSIST_DIR)
-            index = load_index_from_storage(storage_context)
-            print("Index loaded successfully.")
-        except FileNotFoundError:
-            print(
-                f"Warning: Storage directory '{PERSIST_DIR}' found, but essential index files (like docstore.json) are missing."
-            )
-            print("Rebuilding index...")
-            storage_exists = (
-                False  # Treat as if storage doesn't exist to trigger rebuild
-            )
-        except Exception as e:
-            print(
-                f"Error loading index from '{PERSIST_DIR}': {e}. Attempting to rebuild."
-            )
-            logging.warning(f"Failed to load existing index, rebuilding: {e}")
-            storage_exists = (
-                False  # Treat as if storage doesn't exist to trigger rebuild
-            )
+# Serializes on-demand refreshes (see /api/reindex)
+index_refresh_lock = asyncio.Lock()
+
+# Seconds a client should wait before retrying while the engine is loading
+STARTUP_RETRY_AFTER = 5
 
-    if not storage_exists:
-        print(
-            f"Index storage directory '{PERSIST_DIR}' not found or incomplete. Building new index..."
+
+def create_chat_memory() -> BaseMemory:
+    """Creates the bounded memory that holds one session's conversation."""
+    if CHAT_MEMORY_POLICY == "buffer":
+        return ChatMemoryBuffer.from_defaults(token_limit=CHAT_SESSION_TOKEN_LIMIT)
+    return RollingSummaryMemory.from_defaults(
+        llm=Settings.llm if CHAT_MEMORY_POLICY == "summary" else None,
+        recent_turns=CHAT_MEMORY_RECENT_TURNS,
+        token_limit=CHAT_SESSION_TOKEN_LIMIT,
+        summary_token_limit=CHAT_MEMORY_SUMMARY_TOKENS,
+    )
+
+
+class TimedCondenseQuestionChatEngine(CondenseQuestionChatEngine):
+    """CondenseQuestionChatEngine that records how long condensing takes.
+
+    Also records the size of every condense prompt. First turns and (with
+    CHAT_SKIP_STANDALONE_CONDENSE) self-contained follow-ups go straight to
+    retrieval without the condense LLM call.
+    """
+
+    def _skip_condense(self, chat_history, last_message: str) -> bool:
+        if not chat_history:  # Nothing to condense
+            decision = "first_turn"
+        elif CHAT_SKIP_STANDALONE_CONDENSE and is_standalone(last_message):
+            decision = "standalone"
+        else:
+            decision = "condensed"
+        condense_decisions.inc(decision=decision)
+        return decision != "condensed"
+
+    def _condense_question(self, chat_history, last_message: str) -> str:
+        if self._skip_condense(chat_history, last_message):
+            return last_message
+        self._observe_prompt_size(chat_history, last_message)
+        with stage_seconds.time(stage="condense"), tracing.span("condense"):
+            return super()._condense_question(chat_history, last_message)
+
+    async def _acondense_question(self, chat_history, last_message: str) -> str:
+        if self._skip_condense(chat_history, last_message):
+            return last_message
+        self._observe_prompt_size(chat_history, last_message)
+        with stage_seconds.time(stage="condense"), tracing.span("condense"):
+            return await super()._acondense_question(chat_history, last_message)
+
+    def _observe_prompt_size(self, chat_history, last_message: str) -> None:
+        prompt = self._condense_question_prompt.format(
+            question=last_message, chat_history=messages_to_history_str(chat_history)
         )
-        if not os.path.exists(PDF_DIR) or not os.listdir(PDF_DIR):
-            print(f"Error: PDF directory '{PDF_DIR}' is empty or does not exist.")
-            sys.exit(1)
-
-        # Load the documents and create the index
-        print(f"Loading documents from '{PDF_DIR}'...")
-        documents = SimpleDirectoryReader(PDF_DIR).load_data()
-        if not documents:
-            print(f"Error: No documents loaded from '{PDF_DIR}'. Check PDF files.")
-            sys.exit(1)
-        print(f"Loaded {len(documents)} document sections.")
-
-        print("Building index...")
-        index = VectorStoreIndex.from_documents(documents)
-
-        # Store it for later use
-        print(f"Persisting index to '{PERSIST_DIR}'...")
-        # Ensure the directory exists before persisting
-        os.makedirs(PERSIST_DIR, exist_ok=True)
-        index.storage_context.persist(persist_dir=PERSIST_DIR)
-        print(f"Index built and saved successfully.")
-
-except Exception as e:
-    print(f"Fatal Error during index setup: {e}")
-    logging.exception("Index loading/building failed:")
-    sys.exit(1)
+        condense_prompt_tokens.observe(len(Settings.tokenizer(prompt)))
 
-# --- Ensure index is valid after setup ---
-if index is None:
-    print("Fatal Error: Index could not be loaded or built. Exiting.")
-    sys.exit(1)
 
+def create_chat_engine(session: ChatSession, streaming: bool = False):
+    """Binds a lightweight chat engine to a session's memory."""
+    # Using CondenseQuestionChatEngine to maintain conversation context
+    return TimedCondenseQuestionChatEngine.from_defaults(
+        query_engine=streaming_query_engine if streaming else query_engine,
+        memory=session.memory,
+        verbose=True,
+    )
 
-# --- LlamaIndex: Create Chat Engine ---
-# Using CondenseQuestionChatEngine to maintain conversation context
-# For stateless behavior per request, you might need to manage history explicitly
-chat_engine = index.as_chat_engine(
-    chat_mode="condense_question",
-    verbose=True,
-    # You can customize system prompts, memory buffers etc. here
-    # system_prompt="You are a helpful assistant knowledgeable about the provided document."
-)
-print("Chat engine created.")
+
+def load_index_and_chat_engine() -> None:
+    """Loads or builds the index and creates the chat session pool (runs in a worker thread)."""
+    global index, query_engine, streaming_query_engine, chat_sessions, embedding_cache
+
+    if not os.path.exists(PDF_DIR) or not os.listdir(PDF_DIR):
+        raise RuntimeError(f"PDF directory '{PDF_DIR}' is empty or does not exist.")
+
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+    index = load_or_build_index(
+        PDF_DIR,
+        PERSIST_DIR,
+        index_progress,
+        INGEST_WORKERS,
+        embedding_cache,
+        VECTOR_STORE_OPTIONS,
+    )
+    answer_cache.set_index_version(corpus_version(load_manifest(PERSIST_DIR)))
+    # Live retrievers see documents ingested later (see /api/documents)
+    query_engine = RetrieverQueryEngine.from_args(LiveIndexRetriever(index))
+    streaming_query_engine = RetrieverQueryEngine.from_args(
+        LiveIndexRetriever(index), streaming=True
+    )
+    chat_sessions = ChatSessionPool(
+        create_chat_memory,
+        max_sessions=CHAT_MAX_SESSIONS,
+        ttl_seconds=CHAT_SESSION_TTL,
+        max_total_chars=CHAT_MAX_TOTAL_CHARS,
+    )
+    print("Chat engine created.")
+
+
+async def startup_task() -> None:
+    """Background startup: index load/build and chat engine creation."""
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, load_index_and_chat_engine)
+        index_progress.finish("ready")
+    except Exception as e:
+        index_progress.error = str(e)
+        index_progress.finish("failed")
+        print(f"Fatal Error during index setup: {e}")
+        logging.exception("Index loading/building failed:")
+
+
+def require_chat_sessions() -> ChatSessionPool:
+    """Returns the chat session pool or raises a fast 503 while it is still loading."""
+    if chat_sessions is not None:
+        return chat_sessions
+    if index_progress.phase == "failed":
+        raise HTTPException(
+            status_code=503,
+            detail=f"Index setup failed: {index_progress.error}",
+        )
+    raise HTTPException(
+        status_code=503,
+        detail="The chat engine is still loading. Please retry shortly.",
+        headers={"Retry-After": str(STARTUP_RETRY_AFTER)},
+    )
+
+
+def require_index() -> VectorStoreIndex:
+    """Returns the index (crew summaries retrieve from it) or raises a fast 503."""
+    require_chat_sessions()  # Set together with the index
+    return index
+
+
+async def start_tracing() -> None:
+    """Sets up the configured trace exporter off the event loop (imports can be slow)."""
+    if TRACING_EXPORTER == "none":
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(
+            None,
+            lambda: tracing.configure(
+                TRACING_EXPORTER,
+                TRACING_SAMPLE_RATE,
+                jsonl_path=TRACING_JSONL_PATH,
+                otlp_endpoint=TRACING_OTLP_ENDPOINT,
+            ),
+        )
+    except Exception:
+        logging.exception("Tracing setup failed:")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_scheduler.start()
+    task = asyncio.create_task(startup_task())
+    tracing_task = asyncio.create_task(start_tracing())
+    yield
+    task.cancel()
+    tracing_task.cancel()
+    await job_scheduler.stop()
+    tracing.shutdown()
 
 
 # --- Helper Function to Load Document Content ---
 # This can be reused by LlamaIndex (implicitly) and CrewAI (explicitly)
-def load_all_document_text(directory: str) -> str:
-    """Loads and concatenates text content from all PDFs in a directory."""
-    all_text = ""
+# Extracted text is cached per file on disk and in memory (see text_cache.py),
+# so unchanged PDFs are never parsed twice.
+def load_document_corpus(directory: str) -> Tuple[str, str]:
+    """Loads the concatenated corpus text and its content fingerprint."""
     if not os.path.exists(directory) or not os.listdir(directory):
         print(f"Warning: Document directory '{directory}' is empty or missing.")
-        return ""
+        return "", ""
     try:
-        reader = SimpleDirectoryReader(directory)
-        documents = reader.load_data()
-        for doc in documents:
-            all_text += doc.get_content() + "\n\n---\n\n"  # Add separator
-        print(
-            f"Loaded text from {len(documents)} documents in '{directory}'. Total length: {len(all_text)}"
-        )
-        return all_text
+        entries = load_corpus_entries(directory, TEXT_CACHE_DIR, INGEST_WORKERS)
+        all_text = "".join(entry["text"] for entry in entries)
+        print(f"Loaded text from '{directory}'. Total length: {len(all_text)}")
+        return all_text, corpus_fingerprint(entries)
     except Exception as e:
         print(f"Error loading documents from {directory}: {e}")
         logging.exception("Document loading failed:")
-        return ""
+        return "", ""
 
 
-# --- CrewAI Summarization Logic with Streaming ---
-def run_esg_summary_crew_with_streaming(document_texts: str) -> str:
-    """Defines and runs the CrewAI agents to summarize ESG documents with streaming updates."""
-    if not document_texts:
-        return "Error: No document content provided to summarize."
-
-    # Define custom callbacks for agents
-    def agent_thinking_callback(agent, thought):
-        message_queue.put(
-            {
-                "status": "thinking",
-                "agent": "ESG Agent",
-                "thought": "ESG Agent finished...",
-            }
-        )
-
-    def task_output_callback(output: TaskOutput):
-        message_queue.put(
-            {
-                "status": "thinking",
-                "agent": "ESG Task",
-                "thought": "ESG Task finished...",
-            }
-        )
-
-    # Define Agents with callbacks
-    esg_analyst = Agent(
-        role="ESG Document Analyst",
-        goal="Analyze the provided ESG document texts to identify key themes, risks, opportunities, and metrics reported.",
-        backstory="""You are an expert ESG analyst with a keen eye for detail.
+# --- CrewAI Agent and Task Definitions ---
+# Shared by both summarization paths; also part of the summary cache key, so
+# editing a prompt invalidates previously cached summaries.
+ESG_ANALYST = {
+    "role": "ESG Document Analyst",
+    "goal": "Analyze the provided ESG document texts to identify key themes, risks, opportunities, and metrics reported.",
+    "backstory": """You are an expert ESG analyst with a keen eye for detail.
         You meticulously read through corporate sustainability and ESG reports
         to extract the most critical information relevant to environmental, social,
         and governance performance.""",
-        verbose=True,
-        allow_delegation=False,
-        # Add the callbacks
-        callback=task_output_callback,
-    )
+}
 
-    summary_writer = Agent(
-        role="Executive Summary Writer",
-        goal="Synthesize the analysis from the ESG Analyst into a concise, easy-to-understand executive summary.",
-        backstory="""You are a skilled writer specializing in creating high-level executive summaries
+SUMMARY_WRITER = {
+    "role": "Executive Summary Writer",
+    "goal": "Synthesize the analysis from the ESG Analyst into a concise, easy-to-understand executive summary.",
+    "backstory": """You are a skilled writer specializing in creating high-level executive summaries
         for busy stakeholders. You take complex information and distill it into clear,
         actionable insights, focusing on the most important takeaways.""",
-        verbose=True,
-        allow_delegation=False,
-        # Add the callbacks
-        callback=task_output_callback,
-    )
+}
+
+ANALYSIS_TASK = {
+    "description": (
+        "Review the following excerpts of ESG documents, labelled with their source: "
+        "\n\n---\n{docs}\n---\n\n"
+        "Identify and list the key environmental initiatives, social responsibility programs, "
+        "governance structures, major risks mentioned, key opportunities highlighted, "
+        "and any significant quantitative metrics reported (e.g., CO2 emissions, diversity ratios)."
+        "Provide a structured analysis."
+    ),
+    "expected_output": "A structured report detailing key ESG themes, risks, opportunities, and metrics found in the text.",
+}
+
+SUMMARY_TASK = {
+    "description": (
+        "Based on the ESG Analyst's report, write a concise executive summary (2-3 paragraphs). "
+        "The summary should highlight the company's main ESG strengths, weaknesses/risks, "
+        "and key performance indicators mentioned. Make it suitable for a board-level overview."
+    ),
+    "expected_output": "A well-structured executive summary of the ESG findings, approximately 2-3 paragraphs long.",
+}
+
+ESG_SUMMARY_CONFIG = {
+    "agents": [ESG_ANALYST, SUMMARY_WRITER],
+    "tasks": [ANALYSIS_TASK, SUMMARY_TASK],
+    "context": {
+        "themes": ESG_THEMES,
+        "token_budget": ESG_CONTEXT_TOKENS,
+        "top_k": ESG_CONTEXT_TOP_K,
+    },
+}
+
+# Map-reduce mode reads the whole corpus instead of selected excerpts
+ESG_MAP_REDUCE_CONFIG = {
+    "prompts": [MAP_PROMPT, MERGE_PROMPT, SUMMARY_PROMPT],
+    "chunk_tokens": ESG_CHUNK_TOKENS,
+    "overlap_tokens": ESG_CHUNK_OVERLAP_TOKENS,
+    "merge_budget_tokens": ESG_MERGE_BUDGET_TOKENS,
+}
+
+SummaryMode = Literal["crew", "map_reduce"]
+
+
+def summary_config(mode: SummaryMode) -> dict:
+    """Configuration that determines a summary's content (part of its cache key)."""
+    if mode == "map_reduce":
+        return {
+            "mode": mode,
+            "llm": Settings.llm.metadata.model_name,
+            **ESG_MAP_REDUCE_CONFIG,
+        }
+    # Crews use their own LLM (MODEL / OPENAI_MODEL_NAME), not Settings.llm
+    return {"llm": esg_crew_factory.model, **ESG_SUMMARY_CONFIG}
 
-    # Define Tasks with callbacks
-    analysis_task = Task(
-        description=(
-            "Review the following ESG document text: \n\n---\n{docs}\n---\n\n"
-            "Identify and list the key environmental initiatives, social responsibility programs, "
-            "governance structures, major risks mentioned, key opportunities highlighted, "
-            "and any significant quantitative metrics reported (e.g., CO2 emissions, diversity ratios)."
-            "Provide a structured analysis."
-        ).format(
-            docs=document_texts[:10000]
-        ),  # Pass document text, potentially truncated if too long for context window
-        expected_output="A structured report detailing key ESG themes, risks, opportunities, and metrics found in the text.",
-        agent=esg_analyst,
-        # Add the callbacks
-        callback=task_output_callback,
-    )
 
-    summary_task = Task(
-        description=(
-            "Based on the ESG Analyst's report, write a concise executive summary (2-3 paragraphs). "
-            "The summary should highlight the company's main ESG strengths, weaknesses/risks, "
-            "and key performance indicators mentioned. Make it suitable for a board-level overview."
-        ),
-        expected_output="A well-structured executive summary of the ESG findings, approximately 2-3 paragraphs long.",
-        agent=summary_writer,
-        context=[analysis_task],  # Depends on the output of the analysis task
-        # Add the callbacks
-        callback=task_output_callback,
-    )
+async def load_summary_input(mode: SummaryMode) -> Tuple[str, str]:
+    """Returns `(document_text, corpus_hash)` for a summary run in `mode`.
 
-    # Create and Run Crew
-    esg_crew = Crew(
-        agents=[esg_analyst, summary_writer],
-        tasks=[analysis_task, summary_task],
-        process=Process.sequential,  # Tasks run one after another
-        verbose=True,  # Enable verbose mode
+    Map-reduce analyses the full text of the corpus. Crews only read excerpts
+    retrieved from the index, so no text is loaded for them and their summaries
+    are keyed on the indexed corpus version instead.
+    """
+    if mode == "crew":
+        manifest = load_manifest(PERSIST_DIR)
+        if not (manifest or {}).get("files"):
+            raise HTTPException(status_code=404, detail="No documents are indexed.")
+        return "", corpus_version(manifest)
+    # Cached; parsing runs off the event loop
+    loop = asyncio.get_running_loop()
+    document_text, corpus_hash = await loop.run_in_executor(
+        None, load_document_corpus, PDF_DIR
     )
+    if not document_text:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No documents found or loaded from '{PDF_DIR}'.",
+        )
+    return document_text, corpus_hash
 
-    print("Kicking off ESG Summary Crew with streaming updates...")
-    message_queue.put(
-        {"status": "starting", "message": "Starting ESG analysis with CrewAI agents..."}
-    )
-    result = esg_crew.kickoff()
-    print("Crew finished.")
 
-    # Extract the string result from CrewOutput object
-    if hasattr(result, "raw"):
-        return result.raw  # Most recent versions use .raw attribute
-    elif hasattr(result, "output"):
-        return result.output  # Some versions use .output attribute
-    elif hasattr(result, "final_output"):
-        return result.final_output  # Some versions use .final_output attribute
-    else:
-        # If none of the expected attributes exist, convert to string as fallback
-        return str(result)
+# --- ESG Summary Cache ---
+summary_cache = SummaryCache(SUMMARY_CACHE_DIR)
 
 
-# --- Original CrewAI Summarization Logic (keep for /api/summarize_esg endpoint) ---
-def run_esg_summary_crew(document_texts: str) -> str:
-    """Defines and runs the CrewAI agents to summarize ESG documents."""
-    if not document_texts:
-        return "Error: No document content provided to summarize."
+# --- CrewAI crews ---
+# Agents are defined once; runs lease an LLM (and its keep-alive HTTP client)
+# from a pool sized for the concurrent summary jobs (see crew_factory.py), so
+# a lease rarely waits, and then without blocking the event loop.
+crew_llm_pool = LLMPool(
+    lambda: govern_crew_llm(create_llm(None), llm_governor, CREW_COMPLETION_TOKENS),
+    max_size=SUMMARY_WORKERS,
+)
+esg_crew_factory = CrewFactory(
+    [ESG_ANALYST, SUMMARY_WRITER], [ANALYSIS_TASK, SUMMARY_TASK], crew_llm_pool
+)
 
-    # Define Agents
-    esg_analyst = Agent(
-        role="ESG Document Analyst",
-        goal="Analyze the provided ESG document texts to identify key themes, risks, opportunities, and metrics reported.",
-        backstory="""You are an expert ESG analyst with a keen eye for detail.
-        You meticulously read through corporate sustainability and ESG reports
-        to extract the most critical information relevant to environmental, social,
-        and governance performance.""",
-        verbose=True,
-        allow_delegation=False,
-        # llm=OpenAI(temperature=0.1) # Optional: configure LLM per agent
-    )
 
-    summary_writer = Agent(
-        role="Executive Summary Writer",
-        goal="Synthesize the analysis from the ESG Analyst into a concise, easy-to-understand executive summary.",
-        backstory="""You are a skilled writer specializing in creating high-level executive summaries
-        for busy stakeholders. You take complex information and distill it into clear,
-        actionable insights, focusing on the most important takeaways.""",
-        verbose=True,
-        allow_delegation=False,
-    )
+def record_crew_metrics(run: CrewRun) -> None:
+    """Records task durations and token usage of a crew run.
 
-    # Define Tasks
-    analysis_task = Task(
-        description=(
-            "Review the following ESG document text: \n\n---\n{docs}\n---\n\n"
-            "Identify and list the key environmental initiatives, social responsibility programs, "
-            "governance structures, major risks mentioned, key opportunities highlighted, "
-            "and any significant quantitative metrics reported (e.g., CO2 emissions, diversity ratios)."
-            "Provide a structured analysis."
-        ).format(
-            docs=document_texts[:10000]
-        ),  # Pass document text, potentially truncated if too long for context window
-        expected_output="A structured report detailing key ESG themes, risks, opportunities, and metrics found in the text.",
-        agent=esg_analyst,
-    )
+    Finished tasks are also added as spans to the active trace, if any.
+    """
+    for crew_task in run.crew.tasks:
+        if crew_task.execution_duration is None:
+            continue
+        name = crew_task.name or crew_task.agent.role
+        crew_task_seconds.observe(crew_task.execution_duration, task=name)
+        tracing.record_span(
+            "crew_task",
+            int(crew_task.start_time.timestamp() * 1e9),
+            int(crew_task.end_time.timestamp() * 1e9),
+            task=name,
+        )
+    usage = run.token_usage()
+    llm_tokens.inc(usage.prompt_tokens, pipeline="crewai", kind="prompt")
+    llm_tokens.inc(usage.completion_tokens, pipeline="crewai", kind="completion")
 
-    summary_task = Task(
-        description=(
-            "Based on the ESG Analyst's report, write a concise executive summary (2-3 paragraphs). "
-            "The summary should highlight the company's main ESG strengths, weaknesses/risks, "
-            "and key performance indicators mentioned. Make it suitable for a board-level overview."
-        ),
-        expected_output="A well-structured executive summary of the ESG findings, approximately 2-3 paragraphs long.",
-        agent=summary_writer,
-        context=[analysis_task],  # Depends on the output of the analysis task
-    )
 
-    # Create and Run Crew
-    esg_crew = Crew(
-        agents=[esg_analyst, summary_writer],
-        tasks=[analysis_task, summary_task],
-        process=Process.sequential,  # Tasks run one after another
-        verbose=True,  # Enable verbose mode
-    )
+async def kickoff_crew(run: CrewRun):
+    """Runs a crew natively on the event loop.
+
+    Its LLM calls take governor slots one at a time (see `govern_crew_llm`),
+    so the slots are free between agent steps.
+    """
+    try:
+        return await run.crew.akickoff()
+    finally:
+        record_crew_metrics(run)
+
+
+# --- CrewAI Summarization Logic (mode=crew) ---
+async def run_esg_summary_crew(
+    publish: Optional[Callable[[dict], None]] = None,
+    check_cancelled: Callable[[], None] = lambda: None,
+) -> str:
+    """Runs the ESG analyst and summary writer crew on the most relevant excerpts.
 
-    print("Kicking off ESG Summary Crew...")
-    result = esg_crew.kickoff()
+    Needs the index to be loaded (see `require_index`).
+
+    Progress events are handed to `publish` (e.g. a job channel's publish);
+    `check_cancelled` is called after every agent step and task and raises to
+    abort.
+    """
+
+    def task_output_callback(output: TaskOutput):
+        if publish is not None:
+            publish(
+                {
+                    "status": "thinking",
+                    "agent": "ESG Task",
+                    "thought": "ESG Task finished...",
+                }
+            )
+        check_cancelled()
+
+    with tracing.span("pack_context"):
+        packed = await pack_theme_context(
+            index,
+            Settings.embed_model,
+            ESG_THEMES,
+            token_budget=ESG_CONTEXT_TOKENS,
+            top_k=ESG_CONTEXT_TOP_K,
+        )
+    print(f"Packed {packed.chunks} excerpts ({packed.tokens} tokens) for the analysis.")
+    docs = packed.text
+    async with esg_crew_factory.run(
+        {"docs": docs},
+        task_callback=task_output_callback,
+        step_callback=lambda step: check_cancelled(),  # Cancellation checkpoint
+    ) as run:
+        print("Kicking off ESG Summary Crew...")
+        if publish is not None:
+            publish(
+                {
+                    "status": "starting",
+                    "message": "Starting ESG analysis with CrewAI agents...",
+                }
+            )
+        result = await kickoff_crew(run)
     print("Crew finished.")
+
     # Extract the string result from CrewOutput object
     if hasattr(result, "raw"):
         return result.raw  # Most recent versions use .raw attribute
@@ -360,11 +714,35 @@ def run_esg_summary_crew(document_texts: str) -> str:
         return str(result)
 
 
+# --- Map-Reduce Summarization Logic (mode=map_reduce) ---
+async def run_esg_summary_map_reduce(
+    document_texts: str,
+    publish: Optional[Callable[[dict], None]] = None,
+    check_cancelled: Callable[[], None] = lambda: None,
+) -> str:
+    """Summarizes the full corpus with concurrent chunk analyses merged hierarchically."""
+    if not document_texts:
+        return "Error: No document content provided to summarize."
+
+    print("Kicking off map-reduce ESG summary...")
+    return await run_esg_map_reduce(
+        document_texts,
+        Settings.llm,
+        chunk_tokens=ESG_CHUNK_TOKENS,
+        overlap_tokens=ESG_CHUNK_OVERLAP_TOKENS,
+        max_concurrency=ESG_MAP_CONCURRENCY,
+        merge_budget_tokens=ESG_MERGE_BUDGET_TOKENS,
+        publish=publish,
+        check_cancelled=check_cancelled,
+    )
+
+
 # --- FastAPI App Setup ---
 app = FastAPI(
     title="LlamaIndex RAG Chat API",
     description="API to chat with a document using LlamaIndex and FastAPI.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS Middleware: Allows requests from your Next.js frontend (and other origins)
@@ -384,26 +762,116 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods (GET, POST, etc.)
     allow_headers=["*"],  # Allows all headers
 )
+app.add_middleware(
+    MetricsMiddleware,
+    request_seconds=http_request_seconds,
+    in_flight=http_requests_in_flight,
+)
+app.add_middleware(tracing.TracingMiddleware)
+app.add_middleware(ClientIdentityMiddleware)
 
 
 # --- API Request/Response Models (using Pydantic) ---
 class ChatRequest(BaseModel):
     message: str
+    # Conversation to continue; a new session is created when omitted or unknown
+    session_id: Optional[str] = None
     # Optional: Pass chat history from client if managing state there
     # chat_history: Optional[List[Tuple[str, str]]] = None # Example: [("user", "hi"), ("assistant", "hello")]
 
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: str
+    cached: bool = False
     # Optional: Return updated history if needed
     # chat_history: Optional[List[Tuple[str, str]]] = None
 
 
+class BatchChatRequest(BaseModel):
+    # Independent questions, each answered without chat history
+    questions: List[str]
+    # Stream answers as Server-Sent Events (in order) instead of one response
+    stream: bool = False
+
+
+class BatchAnswerResponse(BaseModel):
+    index: int
+    question: str
+    response: Optional[str] = None
+    sources: Optional[list] = None
+    cached: bool = False
+    error: Optional[str] = None
+
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchAnswerResponse]
+
+
+class ResetRequest(BaseModel):
+    session_id: str
+
+
 class SummaryResponse(BaseModel):
     summary: str
+    cached: bool = False
+
+
+class ReindexResponse(BaseModel):
+    added: List[str]
+    changed: List[str]
+    removed: List[str]
+    unchanged: int
+
+
+class IngestResponse(BaseModel):
+    job_id: str
+    files: List[str]
 
 
 # --- API Endpoints ---
+# --- Answer cache ---
+async def lookup_cached_answer(
+    question: str,
+) -> Tuple[Optional[CachedAnswer], Optional[List[float]]]:
+    """Looks a first-turn question up in the answer cache.
+
+    Returns the hit (if any) and the question's embedding when one was
+    computed for the similarity lookup, so a miss can be cached with it.
+    """
+    entry = answer_cache.lookup_exact(question)
+    if entry is not None:
+        return entry, None
+    if not answer_cache.semantic_enabled:
+        answer_cache.record_miss()
+        return None, None
+    embedding = await Settings.embed_model.aget_query_embedding(question)
+    match = answer_cache.lookup_similar(embedding)
+    return (match[0] if match else None), embedding
+
+
+def record_cached_turn(session: ChatSession, question: str, entry: CachedAnswer):
+    """Writes a turn answered from the cache to the session's history."""
+    session.memory.put(ChatMessage(role=MessageRole.USER, content=question))
+    session.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=entry.answer))
+
+
+def check_llm_admission() -> None:
+    """Answers 429 right away when the LLM queue has no room for this client."""
+    try:
+        llm_governor.check_admission()
+    except LLMOverloaded as e:
+        raise llm_overloaded_error(e)
+
+
+def llm_overloaded_error(e: LLMOverloaded) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"The language model is overloaded ({e}). Please retry later.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     """
@@ -412,6 +880,9 @@ async def chat_endpoint(request: ChatRequest):
     """
     if not request.message:
         raise HTTPException(status_code=400, detail="Message cannot be empty")
+    sessions = require_chat_sessions()
+    check_llm_admission()
+    session = sessions.get_or_create(request.session_id)
 
     print(f"Received message: {request.message}")
 
@@ -424,87 +895,412 @@ async def chat_endpoint(request: ChatRequest):
     try:
         # Process the message using the chat engine
         # The CondenseQuestionChatEngine handles history internally by default
-        # For async streaming response:
-        # streaming_response = await chat_engine.astream_chat(request.message)
-        # async def event_generator():
-        #     async for token in streaming_response.async_response_gen():
-        #         yield f"data: {json.dumps({'token': token})}\n\n"
-        # return StreamingResponse(event_generator(), media_type="text/event-stream")
+        # For a token-streaming response see /api/chat/stream
 
         # For simple non-streaming response:
-        response = await chat_engine.achat(request.message)  # Use achat for async call
+        async with session.lock:  # One turn at a time per session
+            # Answers only depend on the question when there is no history yet
+            first_turn = not session.memory.get_all()
+            cached, embedding = (
+                await lookup_cached_answer(request.message)
+                if first_turn
+                else (None, None)
+            )
+            if cached is not None:
+                record_cached_turn(session, request.message, cached)
+            else:
+                index_version = answer_cache.index_version
+                response = await create_chat_engine(session).achat(request.message)
+        sessions.record_usage(session)
+        chat_requests.inc(
+            endpoint="chat", source="engine" if cached is None else "cache"
+        )
+
+        if cached is not None:
+            print(f"Sending cached response: {cached.answer}")
+            return ChatResponse(
+                response=cached.answer, session_id=session.session_id, cached=True
+            )
 
         if not response or not response.response:
             raise HTTPException(
                 status_code=500, detail="Received empty response from chat engine."
             )
 
+        if first_turn:
+            answer_cache.put(
+                request.message,
+                response.response,
+                [serialize_source_node(s) for s in collect_source_nodes(response)],
+                embedding,
+                index_version,
+            )
         print(f"Sending response: {response.response}")
-        return ChatResponse(response=response.response)
+        return ChatResponse(response=response.response, session_id=session.session_id)
 
+    except LLMOverloaded as e:
+        raise llm_overloaded_error(e)
     except Exception as e:
         logging.exception("Error processing chat request:")  # Log the full traceback
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
 # --- Streaming Endpoints ---
+def format_sse(payload: dict) -> str:
+    """Formats one Server-Sent Event carrying a JSON payload."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def serialize_source_node(source) -> dict:
+    """Compact, JSON-friendly view of a retrieved source node."""
+    metadata = source.node.metadata
+    return {
+        "file_name": metadata.get("file_name"),
+        "page": metadata.get("page_label"),
+        "score": source.score,
+        "text": source.node.get_content()[:SOURCE_SNIPPET_CHARS],
+    }
+
+
+def collect_source_nodes(response) -> list:
+    """Source nodes of a chat response (streaming responses keep them on the tool output)."""
+    if response.source_nodes:
+        return response.source_nodes
+    return [
+        source_node
+        for tool_output in response.sources
+        for source_node in getattr(tool_output.raw_output, "source_nodes", [])
+    ]
+
+
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Streams the AI's response to a chat message as Server-Sent Events.
+
+    Each event is a JSON object with a `type`: `sources` (sent once retrieval
+    is done, before generation starts), `token` (one per generated chunk),
+    then `done` with timing/usage, or `error`.
+    """
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    sessions = require_chat_sessions()
+    check_llm_admission()
+    session = sessions.get_or_create(request.session_id)
+
+    print(f"Received streaming message: {request.message}")
+
+    async def event_generator():
+        started_at = time.perf_counter()
+        first_token_at = None
+        chunks = 0
+        response_chars = 0
+
+        cached = None
+        async with session.lock:  # One turn at a time per session
+            try:
+                first_turn = not session.memory.get_all()
+                if first_turn:
+                    cached, embedding = await lookup_cached_answer(request.message)
+                if cached is not None:
+                    # Replayed as a single token after its sources
+                    record_cached_turn(session, request.message, cached)
+                    retrieved_at = first_token_at = time.perf_counter()
+                    yield format_sse(
+                        {
+                            "type": "sources",
+                            "session_id": session.session_id,
+                            "sources": cached.sources,
+                        }
+                    )
+                    chunks, response_chars = 1, len(cached.answer)
+                    yield format_sse({"type": "token", "token": cached.answer})
+                else:
+                    index_version = answer_cache.index_version
+                    engine = create_chat_engine(session, streaming=True)
+                    response = await engine.astream_chat(request.message)
+                    retrieved_at = time.perf_counter()
+                    sources = [
+                        serialize_source_node(source)
+                        for source in collect_source_nodes(response)
+                    ]
+                    yield format_sse(
+                        {
+                            "type": "sources",
+                            "session_id": session.session_id,
+                            "sources": sources,
+                        }
+                    )
+
+                    tokens = []
+                    async for token in response.async_response_gen():
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            time_to_first_token_seconds.observe(
+                                first_token_at - started_at
+                            )
+                        chunks += 1
+                        response_chars += len(token)
+                        tokens.append(token)
+                        yield format_sse({"type": "token", "token": token})
+
+                    # The engine writes the answer to the session memory when the stream ends
+                    history_task = getattr(
+                        response, "awrite_response_to_history_task", None
+                    )
+                    if history_task is not None:
+                        await history_task
+                    stage_seconds.observe(
+                        time.perf_counter() - retrieved_at, stage="generate"
+                    )
+                    if first_turn:
+                        answer_cache.put(
+                            request.message,
+                            "".join(tokens),
+                            sources,
+                            embedding,
+                            index_version,
+                        )
+            except LLMOverloaded as e:
+                yield format_sse(
+                    {
+                        "type": "error",
+                        "message": str(e),
+                        "retry_after": e.retry_after,
+                    }
+                )
+                return
+            except Exception as e:
+                logging.exception("Error processing streaming chat request:")
+                yield format_sse({"type": "error", "message": str(e)})
+                return
+
+        sessions.record_usage(session)
+        chat_requests.inc(
+            endpoint="chat_stream", source="engine" if cached is None else "cache"
+        )
+        finished_at = time.perf_counter()
+        yield format_sse(
+            {
+                "type": "done",
+                "session_id": session.session_id,
+                "cached": cached is not None,
+                "timing": {
+                    "retrieval_ms": round((retrieved_at - started_at) * 1000, 1),
+                    "time_to_first_token_ms": (
+                        round((first_token_at - started_at) * 1000, 1)
+                        if first_token_at is not None
+                        else None
+                    ),
+                    "total_ms": round((finished_at - started_at) * 1000, 1),
+                },
+                "usage": {"chunks": chunks, "response_chars": response_chars},
+            }
+        )
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/chat/batch", response_model=BatchChatResponse)
+async def chat_batch_endpoint(request: BatchChatRequest):
+    """
+    Answers a list of independent questions (e.g. a compliance checklist).
+
+    Embeddings and retrieval run for the whole batch at once and answers are
+    synthesized concurrently (see batch_chat.py). Results come back in
+    question order, as one response or, with `stream`, as `answer` events
+    followed by `done`. A failed question carries an `error` instead of a
+    response.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="Questions cannot be empty")
+    if len(request.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch.",
+        )
+    if not all(question.strip() for question in request.questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty")
+    require_chat_sessions()
+    check_llm_admission()
+
+    print(f"Received batch of {len(request.questions)} questions")
+
+    def serialize_sources(source_nodes) -> list:
+        return [serialize_source_node(source) for source in source_nodes]
+
+    answers = answer_batch(
+        request.questions,
+        query_engine,
+        Settings.embed_model,
+        answer_cache,
+        serialize_sources,
+        max_concurrency=BATCH_CONCURRENCY,
+    )
+
+    def record(answer) -> dict:
+        if answer.error is None:
+            chat_requests.inc(
+                endpoint="chat_batch", source="cache" if answer.cached else "engine"
+            )
+        return asdict(answer)
+
+    if not request.stream:
+        try:
+            results = [record(answer) async for answer in answers]
+        except LLMOverloaded as e:
+            raise llm_overloaded_error(e)
+        except Exception as e:
+            logging.exception("Error processing batch chat request:")
+            raise HTTPException(
+                status_code=500, detail=f"Internal Server Error: {str(e)}"
+            )
+        return BatchChatResponse(results=results)
+
+    async def event_generator():
+        started_at = time.perf_counter()
+        failed = 0
+        try:
+            async for answer in answers:
+                failed += answer.error is not None
+                yield format_sse({"type": "answer", **record(answer)})
+        except Exception as e:
+            logging.exception("Error processing streaming batch chat request:")
+            yield format_sse({"type": "error", "message": str(e)})
+            return
+        yield format_sse(
+            {
+                "type": "done",
+                "questions": len(request.questions),
+                "failed": failed,
+                "total_ms": round((time.perf_counter() - started_at) * 1000, 1),
+            }
+        )
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/api/stream_summary")
-async def stream_summary():
-    """Stream the ESG summarization process in real-time."""
+async def stream_summary(job_id: Optional[str] = None):
+    """Stream the progress of an ESG summarization job in real-time.
+
+    Events published before the client connected are replayed first. Without
+    a `job_id` the most recently started job is followed.
+    """
+    channel = job_events.get(job_id) if job_id else job_events.latest()
+    if channel is None:
+        raise HTTPException(status_code=404, detail="Unknown summarization job.")
 
     async def event_generator():
-        while True:
-            # Check if there are new messages in the queue
-            if not message_queue.empty():
-                msg = message_queue.get()
-                if msg == "DONE":
-                    yield f"data: {json.dumps({'status': 'complete'})}\n\n"
-                    break
-                yield f"data: {json.dumps(msg)}\n\n"
-            await asyncio.sleep(0.1)  # Small delay to avoid CPU spinning
+        async for msg in channel.subscribe():
+            yield format_sse(msg)
+        yield format_sse({"status": "complete", "job_id": channel.job_id})
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 
-@app.get("/api/summarize_esg_stream")
-async def summarize_esg_stream_endpoint():
-    """Endpoint to trigger ESG document summarization with streaming results."""
-    print("Received request to stream ESG document summarization...")
+def submit_summary_job(
+    func: Callable[[Job], Awaitable[str]], kind: str, priority: int
+) -> Job:
+    """Queues a summarization job, answering 429 when the queue is full."""
+
+    # Jobs run outside the request's trace, so they start their own. Each job
+    # is its own fair-queuing lane for LLM calls, and as a cancellable
+    # background run it waits for LLM slots instead of being rejected; it
+    # only uses the background share of the slots, leaving the rest to chats.
+    async def traced_func(job: Job) -> str:
+        with tracing.span("summary_job", kind=kind, job_id=job.job_id):
+            with client_context(
+                f"summary:{job.job_id}", max_wait=math.inf, background=True
+            ):
+                return await func(job)
+
     try:
-        # Load document text
-        document_text = load_all_document_text(PDF_DIR)
-        if not document_text:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No documents found or loaded from '{PDF_DIR}'.",
-            )
+        job = job_scheduler.submit(traced_func, kind=kind, priority=priority)
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many summarization jobs queued ({e}). Please retry later.",
+            headers={"Retry-After": "30"},
+        )
+    job.future.add_done_callback(lambda _: record_job_metrics(job))
+    return job
 
-        # Clear any previous messages
-        while not message_queue.empty():
-            message_queue.get()
 
-        # Start the crew in a background thread
-        def run_crew_background():
-            try:
-                result = run_esg_summary_crew_with_streaming(document_text)
-                print(f"Background crew completed with result length: {len(result)}")
-                message_queue.put(
-                    {"status": "finished", "message": "Analysis complete!"}
+def record_job_metrics(job: Job) -> None:
+    if job.started_at is None:  # Cancelled while queued
+        return
+    summary_job_queue_seconds.observe(job.started_at - job.submitted_at, kind=job.kind)
+    summary_job_seconds.observe(
+        job.finished_at - job.started_at, kind=job.kind, status=job.status.value
+    )
+
+
+@app.get("/api/summarize_esg_stream")
+async def summarize_esg_stream_endpoint(priority: int = 0, mode: SummaryMode = "crew"):
+    """Endpoint to trigger ESG document summarization with streaming results.
+
+    The run is queued on the job scheduler (lower `priority` runs first);
+    follow it via /api/stream_summary and /api/jobs/{job_id}. With
+    `mode=map_reduce` the whole corpus is analysed instead of the excerpts most
+    relevant to each ESG theme.
+    """
+    print("Received request to stream ESG document summarization...")
+    try:
+        document_text, corpus_hash = await load_summary_input(mode)
+        cache_key = summary_cache_key(corpus_hash, summary_config(mode))
+        if mode == "crew":
+            require_index()
+
+        # Runs on the event loop as a scheduler job
+        async def run_crew_job(job: Job) -> str:
+            if mode == "map_reduce":
+                result = await run_esg_summary_map_reduce(
+                    document_text, channel.publish, job.check_cancelled
                 )
-                message_queue.put("DONE")  # Signal the end of the stream
-            except Exception as e:
-                print(f"Error in background crew: {e}")
-                message_queue.put({"status": "error", "message": str(e)})
-                message_queue.put("DONE")
+            else:
+                result = await run_esg_summary_crew(
+                    channel.publish, job.check_cancelled
+                )
+            print(f"Background crew completed with result length: {len(result)}")
+            if "Error:" in result:
+                raise RuntimeError(result)
+            summary_cache.put(cache_key, result)
+            channel.publish({"status": "finished", "message": "Analysis complete!"})
+            return result
+
+        job = submit_summary_job(run_crew_job, f"esg_summary_stream_{mode}", priority)
+
+        # Each job gets its own progress channel, closed whenever the job ends.
+        # Workers cannot pick the job up before this coroutine yields, so the
+        # channel exists before run_crew_job first publishes to it.
+        channel = job_events.create(job.job_id)
+        channel.publish({"status": "queued", "queued_jobs": job_scheduler.queue_depth})
+
+        def close_channel(_):
+            if job.status == JobStatus.CANCELLED:
+                channel.publish(
+                    {"status": "cancelled", "message": "Analysis cancelled."}
+                )
+            elif job.status == JobStatus.FAILED:
+                print(f"Error in background crew: {job.error}")
+                channel.publish({"status": "error", "message": job.error})
+            channel.close()  # Signal the end of the stream
 
-        # Start the thread
-        thread = threading.Thread(target=run_crew_background)
-        thread.daemon = True  # Thread will exit when main thread exits
-        thread.start()
+        job.future.add_done_callback(close_channel)
 
         return {
             "status": "started",
-            "message": "ESG analysis started. Connect to /api/stream_summary for updates.",
+            "job_id": job.job_id,
+            "message": f"ESG analysis started. Connect to /api/stream_summary?job_id={job.job_id} for updates.",
         }
 
     except Exception as e:
@@ -518,36 +1314,54 @@ async def summarize_esg_stream_endpoint():
 
 
 @app.get("/api/summarize_esg", response_model=SummaryResponse)
-async def summarize_esg_endpoint():
-    """Endpoint to trigger ESG document summarization using CrewAI."""
+async def summarize_esg_endpoint(
+    refresh: bool = False, priority: int = 0, mode: SummaryMode = "crew"
+):
+    """Endpoint to trigger ESG document summarization using CrewAI.
+
+    Summaries are cached per corpus and prompt configuration, and concurrent
+    requests share one crew run. Pass `refresh=true` to discard the cached
+    summary and run the crew again. Runs are queued on the job scheduler
+    (lower `priority` runs first). With `mode=map_reduce` the whole corpus is
+    analysed in concurrent chunks instead of the excerpts most relevant to
+    each ESG theme.
+    """
     print("Received request to summarize ESG documents...")
     try:
-        # Load document text (could be cached in a real app)
-        document_text = load_all_document_text(PDF_DIR)
-        if not document_text:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No documents found or loaded from '{PDF_DIR}'.",
-            )
+        document_text, corpus_hash = await load_summary_input(mode)
+
+        async def run_crew() -> str:
+            if mode == "crew":
+                require_index()
+
+            # Runs on a bounded scheduler worker
+            async def run_summary(job: Job) -> str:
+                if mode == "map_reduce":
+                    return await run_esg_summary_map_reduce(
+                        document_text, check_cancelled=job.check_cancelled
+                    )
+                return await run_esg_summary_crew(check_cancelled=job.check_cancelled)
+
+            job = submit_summary_job(run_summary, f"esg_summary_{mode}", priority)
+            summary_result = await job_scheduler.wait(job)
+            if isinstance(summary_result, str) and "Error:" in summary_result:
+                # Basic check if the crew function returned an error string
+                raise HTTPException(
+                    status_code=500, detail=f"Summarization failed: {summary_result}"
+                )
+            return summary_result
 
-        # Run the synchronous CrewAI task in a thread pool to avoid blocking FastAPI
-        loop = asyncio.get_running_loop()
-        summary_result = await loop.run_in_executor(
-            None,  # Use default executor (ThreadPoolExecutor)
-            run_esg_summary_crew,  # The function to run
-            document_text,  # Arguments to the function
+        cache_key = summary_cache_key(corpus_hash, summary_config(mode))
+        summary_result, is_cached = await summary_cache.get_or_compute(
+            cache_key, run_crew, refresh=refresh
         )
 
-        if isinstance(summary_result, str) and "Error:" in summary_result:
-            # Basic check if the crew function returned an error string
-            raise HTTPException(
-                status_code=500, detail=f"Summarization failed: {summary_result}"
-            )
-
         # No need to check length - we've already converted to string in run_esg_summary_crew
-        print(f"Sending summary result.")
-        return SummaryResponse(summary=summary_result)
+        print(f"Sending summary result (cached: {is_cached}).")
+        return SummaryResponse(summary=summary_result, cached=is_cached)
 
+    except JobCancelled:
+        raise HTTPException(status_code=409, detail="Summarization was cancelled.")
     except Exception as e:
         logging.exception("Error processing ESG summarization request:")
         # Check if it's an HTTPException we raised ourselves
@@ -559,25 +1373,257 @@ async def summarize_esg_endpoint():
             )
 
 
+@app.get("/api/jobs", summary="List Jobs")
+async def list_jobs():
+    """Scheduler load and the status of recent summarization jobs."""
+    return {
+        **job_scheduler.stats(),
+        "jobs": [job.to_dict() for job in job_scheduler.jobs()],
+    }
+
+
+@app.get("/api/jobs/{job_id}", summary="Job Status")
+async def get_job(job_id: str):
+    """Status and timing of one summarization or ingestion job."""
+    job = job_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    return job.to_dict()
+
+
+@app.delete("/api/jobs/{job_id}", summary="Cancel Job")
+async def cancel_job(job_id: str):
+    """Cancels a queued job immediately, or a running one at its next agent step."""
+    job = job_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    if not job_scheduler.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status.value}.")
+    return job.to_dict()
+
+
 @app.get("/api/health", summary="Health Check")
 async def health_check():
-    """Basic health check endpoint."""
+    """Basic liveness probe; answers as soon as the server is listening."""
     return {"status": "ok"}
 
 
-# --- Optional: Reset Chat History Endpoint ---
-@app.post("/api/reset", summary="Reset Chat History")
-async def reset_chat():
-    """Resets the chat engine's conversation history."""
+@app.get("/api/ready", summary="Readiness Check")
+async def readiness_check():
+    """Readiness probe with index loading progress; 503 until the chat engine is up."""
+    is_ready = chat_sessions is not None
+    body = {"ready": is_ready, **index_progress.to_dict()}
+    if is_ready:
+        return {
+            **body,
+            "chat_sessions": chat_sessions.stats(),
+            "embedding_cache": embedding_cache.stats(),
+            "vector_store": index.vector_store.stats(),
+            "answer_cache": answer_cache.stats(),
+            "tracing": tracing.tracer.stats(),
+            "llm_governor": llm_governor.stats(),
+            "crew_llm_pool": crew_llm_pool.stats(),
+        }
+    headers = {}
+    if index_progress.phase != "failed":
+        headers["Retry-After"] = str(STARTUP_RETRY_AFTER)
+    return JSONResponse(status_code=503, content=body, headers=headers)
+
+
+def collect_metrics() -> None:
+    """Copies load and cache statistics owned by other components into gauges."""
+    scheduler_stats = job_scheduler.stats()
+    summary_jobs.set(scheduler_stats["running"], state="running")
+    summary_jobs.set(scheduler_stats["queued"], state="queued")
+    cache_hit_ratio.set(answer_cache.stats()["hit_ratio"], cache="answer")
+    cache_hit_ratio.set(summary_cache.stats()["hit_ratio"], cache="summary")
+    if embedding_cache is not None:
+        cache_hit_ratio.set(embedding_cache.hit_ratio, cache="embedding")
+    if chat_sessions is not None:
+        active_chat_sessions.set(len(chat_sessions))
+    governor_stats = llm_governor.stats()
+    llm_calls.set(governor_stats["active"], state="running")
+    llm_calls.set(governor_stats["queued"], state="queued")
+    llm_calls.set(governor_stats["background_active"], state="running_background")
+    llm_rejections.set(governor_stats["rejected"], reason="queue_full")
+    llm_rejections.set(governor_stats["timeouts"], reason="wait_timeout")
+
+
+metrics_registry.add_collector(collect_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, summary="Metrics")
+async def metrics_endpoint():
+    """Pipeline stage latencies, token counts, cache hit ratios and load, for Prometheus."""
+    return PlainTextResponse(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+async def refresh_live_index() -> CorpusDiff:
+    """Applies corpus changes to the serving index (see `refresh_index(live=True)`).
+
+    Chats keep answering from the current index until the new nodes, already
+    embedded, are swapped in at once; cached answers are dropped in the same
+    step.
+    """
+
+    def drop_stale_answers(manifest: dict) -> None:
+        answer_cache.set_index_version(corpus_version(manifest))
+
+    def record_outcome(refresh: asyncio.Future) -> None:
+        error = None if refresh.cancelled() else refresh.exception()
+        if error is None:
+            index_progress.finish("ready")
+        else:
+            index_progress.error = str(error)
+            index_progress.finish("refresh_failed")
+
+    async with index_refresh_lock:
+        index_progress.start("refreshing")
+        loop = asyncio.get_running_loop()
+        refresh = loop.run_in_executor(
+            None,
+            refresh_index,
+            index,
+            PDF_DIR,
+            PERSIST_DIR,
+            index_progress,
+            INGEST_WORKERS,
+            embedding_cache,
+            True,  # live
+            drop_stale_answers,
+        )
+        refresh.add_done_callback(record_outcome)
+        try:
+            diff = await asyncio.shield(refresh)
+        except asyncio.CancelledError:
+            # The refresh thread cannot be interrupted; keep the lock until it is done
+            await asyncio.wait([refresh])
+            raise
+    return diff
+
+
+@app.post("/api/reindex", response_model=ReindexResponse, summary="Refresh Index")
+async def reindex_endpoint():
+    """Incrementally re-indexes added, changed or removed files in the PDF directory."""
+    require_chat_sessions()
+    if index_refresh_lock.locked():
+        raise HTTPException(status_code=409, detail="A re-index is already running.")
     try:
-        chat_engine.reset()
-        print("Chat history reset.")
-        return {"message": "Chat history reset successfully"}
+        diff = await refresh_live_index()
+        return ReindexResponse(
+            added=diff.added,
+            changed=diff.changed,
+            removed=diff.removed,
+            unchanged=len(diff.unchanged),
+        )
     except Exception as e:
-        logging.exception("Error resetting chat history:")
+        logging.exception("Error refreshing index:")
+        raise HTTPException(status_code=500, detail=f"Re-index failed: {str(e)}")
+
+
+def upload_file_name(upload: UploadFile) -> str:
+    """Validates an uploaded report and returns the name it is stored under."""
+    name = os.path.basename(upload.filename or "")
+    if not name.lower().endswith(".pdf") or name.startswith("."):
         raise HTTPException(
-            status_code=500, detail=f"Could not reset chat history: {str(e)}"
+            status_code=400, detail=f"'{upload.filename}' is not a PDF file name."
         )
+    if upload.size is not None and upload.size > INGEST_MAX_UPLOAD_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=413,
+            detail=f"'{name}' is larger than {INGEST_MAX_UPLOAD_MB:g} MB.",
+        )
+    upload.file.seek(0)
+    if upload.file.read(5) != b"%PDF-":
+        raise HTTPException(status_code=400, detail=f"'{name}' is not a PDF.")
+    return name
+
+
+def store_upload(upload: UploadFile, name: str) -> None:
+    """Copies an uploaded report into the PDF directory atomically."""
+    os.makedirs(PDF_DIR, exist_ok=True)
+    # Hidden while incomplete, so corpus listings skip it
+    tmp_path = os.path.join(PDF_DIR, f".{name}.upload")
+    upload.file.seek(0)
+    with open(tmp_path, "wb") as f:
+        shutil.copyfileobj(upload.file, f)
+    os.replace(tmp_path, os.path.join(PDF_DIR, name))
+
+
+@app.post(
+    "/api/documents",
+    response_model=IngestResponse,
+    status_code=202,
+    summary="Ingest Documents",
+)
+async def ingest_documents_endpoint(
+    files: List[UploadFile] = File(...), priority: int = 0
+):
+    """Adds PDF reports to the corpus and indexes them without a restart.
+
+    Answers right away with the id of an ingestion job (see /api/jobs/{job_id})
+    that parses and embeds the files in the background, then swaps them into
+    the live index and persists it. A file with an existing name replaces that
+    report.
+    """
+    require_chat_sessions()
+    names = [upload_file_name(upload) for upload in files]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Duplicate file names.")
+
+    loop = asyncio.get_running_loop()
+    for upload, name in zip(files, names):
+        await loop.run_in_executor(None, store_upload, upload, name)
+    print(f"Stored {len(names)} uploaded document(s): {', '.join(names)}")
+
+    async def run_ingest(job: Job) -> str:
+        with tracing.span("ingest_job", job_id=job.job_id, files=len(names)):
+            diff = await refresh_live_index()
+        return (
+            f"{len(diff.added)} added, {len(diff.changed)} changed, "
+            f"{len(diff.removed)} removed"
+        )
+
+    try:
+        job = job_scheduler.submit(
+            run_ingest, kind="ingest_documents", priority=priority
+        )
+    except QueueFull as e:
+        # The files are in place; the next ingestion or re-index picks them up
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many jobs queued ({e}). Please retry later.",
+            headers={"Retry-After": "30"},
+        )
+    job.future.add_done_callback(lambda _: record_job_metrics(job))
+    return IngestResponse(job_id=job.job_id, files=names)
+
+
+@app.delete("/api/summarize_esg/cache", summary="Invalidate Summary Cache")
+async def invalidate_summary_cache():
+    """Drops all cached ESG summaries."""
+    summary_cache.invalidate()
+    return {"message": "Summary cache cleared"}
+
+
+@app.delete("/api/chat/cache", summary="Invalidate Answer Cache")
+async def invalidate_answer_cache():
+    """Drops all cached chat answers."""
+    answer_cache.invalidate()
+    return {"message": "Answer cache cleared"}
+
+
+# --- Optional: Reset Chat History Endpoint ---
+@app.post("/api/reset", summary="Reset Chat History")
+async def reset_chat(request: ResetRequest):
+    """Resets the conversation history of one chat session."""
+    sessions = require_chat_sessions()
+    if not sessions.reset(request.session_id):
+        raise HTTPException(status_code=404, detail="Unknown chat session.")
+    print(f"Chat history reset for session {request.session_id}.")
+    return {"message": "Chat history reset successfully"}
 
 
 # --- Run the app (for local development) ---
@@ -0,0 +1,388 @@
+"""In-process metrics in the Prometheus text format.
+
+A small dependency-free registry of counters, gauges and histograms, rendered
+at /metrics for any Prometheus-compatible scraper. Recording a sample is a
+dict lookup and a few additions under a lock, so instrumenting hot paths
+costs microseconds. Values owned by other components (cache statistics,
+scheduler load) are read by collector callbacks at scrape time instead of
+being tracked twice. LlamaIndex pipeline stages and LLM token usage are
+recorded by an instrumentation event handler (see `instrument_llama_index`).
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from llama_index.core import Settings
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMCompletionEndEvent,
+)
+from llama_index.core.instrumentation.events.retrieval import (
+    RetrievalEndEvent,
+    RetrievalStartEvent,
+)
+from llama_index.core.instrumentation.events.synthesis import (
+    SynthesizeEndEvent,
+    SynthesizeStartEvent,
+)
+from pydantic import PrivateAttr
+
+# Seconds; covers sub-millisecond cache hits up to multi-minute crew runs
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+    600,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra="") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + (
+        [extra] if extra else []
+    )
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """A named metric family with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        # Counter families are named without the _total suffix of their samples
+        self.family_name = name[: -len("_total")] if self.kind == "counter" else name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(sample name, formatted labels, value) triples for the text format."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.family_name} {self.documentation}",
+            f"# TYPE {self.family_name} {self.kind}",
+        ]
+        lines += [
+            f"{name}{labels} {_format_value(value)}"
+            for name, labels, value in self.samples()
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing total."""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            (self.name, _format_labels(self.labelnames, key), value)
+            for key, value in items
+        ]
+
+
+class Gauge(Metric):
+    """Value that goes up and down (current load, ratios)."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            (self.name, _format_labels(self.labelnames, key), value)
+            for key, value in items
+        ]
+
+
+class Histogram(Metric):
+    """Cumulative-bucket distribution of observed values (usually seconds)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [non-cumulative bucket counts (+Inf last), sum, count]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes the duration of the `with` block, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._values.items()
+            )
+        samples = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                samples.append(
+                    (
+                        f"{self.name}_bucket",
+                        _format_labels(self.labelnames, key, le),
+                        cumulative,
+                    )
+                )
+            labels = _format_labels(self.labelnames, key)
+            samples += [
+                (f"{self.name}_sum", labels, total),
+                (f"{self.name}_count", labels, count),
+            ]
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics plus collectors that refresh derived gauges at scrape time."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        if not name.endswith("_total"):
+            raise ValueError(f"Counter names must end in _total: {name}")
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect: Callable[[], None]) -> None:
+        """Registers a callback run before every scrape (e.g. to set gauges)."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            collect()
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing HTTP requests until their last body chunk is sent.
+
+    Streaming responses are therefore measured to the end of the stream.
+    Requests are labelled with their route template (not the raw path), so
+    ids in URLs do not create new series.
+    """
+
+    def __init__(self, app, request_seconds: Histogram, in_flight: Gauge):
+        self.app = app
+        # Labelled by method, route and status
+        self.request_seconds = request_seconds
+        self.in_flight = in_flight
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = "500"
+        finished = False
+
+        def observe():
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.request_seconds.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=route,
+                status=status,
+            )
+
+        async def send_wrapper(message):
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                finished = True
+                observe()
+
+        with self.in_flight.track_inprogress():
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if not finished:  # Failed or client disconnected mid-response
+                    observe()
+
+
+class LlamaIndexMetricsHandler(BaseEventHandler):
+    """Times retrieval and synthesis and counts LLM tokens from LlamaIndex events.
+
+    Start and end events of a stage are paired by their span id. Providers
+    that report no usage (e.g. streamed OpenAI responses) have their tokens
+    estimated with the global tokenizer.
+    """
+
+    stage_seconds: Histogram
+    llm_tokens: Counter
+    max_open_spans: int = 10000
+
+    # (stage, span id) -> start time of stages whose end event is pending
+    _started: Dict[Tuple[str, Optional[str]], float] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LlamaIndexMetricsHandler"
+
+    def handle(self, event: BaseEvent, **kwargs) -> None:
+        if isinstance(event, (RetrievalStartEvent, SynthesizeStartEvent)):
+            if len(self._started) >= self.max_open_spans:
+                self._started.clear()  # Spans whose end event never came
+            self._started[(_stage_of(event), event.span_id)] = time.perf_counter()
+        elif isinstance(event, (RetrievalEndEvent, SynthesizeEndEvent)):
+            stage = _stage_of(event)
+            started = self._started.pop((stage, event.span_id), None)
+            if started is not None:
+                self.stage_seconds.observe(time.perf_counter() - started, stage=stage)
+        elif isinstance(event, LLMChatEndEvent) and event.response is not None:
+            self._count_tokens(
+                event.response.additional_kwargs,
+                "\n".join(str(message.content) for message in event.messages),
+                event.response.message.content or "",
+            )
+        elif isinstance(event, LLMCompletionEndEvent):
+            self._count_tokens(
+                event.response.additional_kwargs, event.prompt, event.response.text
+            )
+
+    def _count_tokens(self, usage: dict, prompt: str, completion: str) -> None:
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        if not prompt_tokens and not completion_tokens:
+            prompt_tokens = len(Settings.tokenizer(prompt))
+            completion_tokens = len(Settings.tokenizer(completion))
+        self.llm_tokens.inc(prompt_tokens, pipeline="llama_index", kind="prompt")
+        self.llm_tokens.inc(
+            completion_tokens, pipeline="llama_index", kind="completion"
+        )
+
+
+def _stage_of(event: BaseEvent) -> str:
+    if isinstance(event, (RetrievalStartEvent, RetrievalEndEvent)):
+        return "retrieve"
+    return "synthesize"
+
+
+def instrument_llama_index(stage_seconds: Histogram, llm_tokens: Counter) -> None:
+    """Attaches the metrics handler to LlamaIndex's root instrumentation dispatcher.
+
+    `stage_seconds` needs a `stage` label; `llm_tokens` needs `pipeline` and `kind`.
+    """
+    get_dispatcher().add_event_handler(
+        LlamaIndexMetricsHandler(stage_seconds=stage_seconds, llm_tokens=llm_tokens)
+    )
@@ -0,0 +1,46 @@
+"""Multi-process parsing of source documents.
+
+PDF extraction is CPU-bound and single-threaded, so files are fanned out over
+a process pool and yielded as soon as each one is parsed. Callers can start
+node parsing and embedding of early files while later ones are still being
+extracted.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Tuple
+
+from llama_index.core import SimpleDirectoryReader
+from llama_index.core.schema import Document
+
+
+def load_file_documents(path: str) -> List[Document]:
+    """Parses a single source file into LlamaIndex documents with stable ids."""
+    return SimpleDirectoryReader(input_files=[path], filename_as_id=True).load_data()
+
+
+def default_ingest_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def parse_files(paths: List[str], workers: int) -> Iterator[Tuple[str, List[Document]]]:
+    """Parses files across `workers` processes, yielding `(path, documents)` as they complete.
+
+    With a single worker (or a single file) parsing stays in-process, which
+    avoids the pool start-up cost for small refreshes.
+    """
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield path, load_file_documents(path)
+        return
+
+    # "spawn" rather than fork: the server process runs threads (event loop,
+    # executors) that must not be duplicated into the children mid-operation
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(paths)), mp_context=context
+    ) as pool:
+        futures = {pool.submit(load_file_documents, path): path for path in paths}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
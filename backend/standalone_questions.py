@@ -0,0 +1,104 @@
+"""Local check whether a follow-up chat message needs condensing.
+
+The condense step costs an LLM round-trip per follow-up turn, but some
+follow-ups are already self-contained ("What are the Scope 1 emissions of
+UBS in 2023?"). A message is treated as standalone only with positive
+evidence that it names its own subject (a year, an acronym or product code,
+or a capitalized name after the first word) and nothing that points back at
+the conversation: no pronouns or demonstratives, no "what about ..."-style
+openers and no additive words like "also" or "instead", in English or
+German.
+
+This is a heuristic. Wrongly skipping retrieves for an incomplete question
+(elliptical follow-ups such as "Explain the difference for a 15 year term"
+carry no tell-tale word), so it is off by default; see
+CHAT_SKIP_STANDALONE_CONDENSE in main.py.
+"""
+
+import re
+
+MIN_STANDALONE_WORDS = 4
+
+# Words that usually refer to something said earlier
+REFERENCE_WORDS = frozenset("""
+    it its it's itself they them their theirs themselves this that that's
+    these those he him his she her hers there then here former latter above
+    aforementioned previous previously earlier same such one ones another
+    other others else also too again instead more less further additionally
+    es er sie ihn ihm ihr ihre ihrer ihren ihrem ihres sein seine seiner
+    seinen seinem seines das dies diese dieser dieses diesem diesen jene
+    jener jenes jenen jenem dort da dabei dafür dagegen daher damit danach
+    daran darauf daraus darin darüber darum davon dazu dasselbe derselbe
+    dieselbe denselben demselben gleiche gleichen auch ebenfalls ebenso noch
+    sonst stattdessen außerdem zudem weitere weiteren obige obigen oben
+    vorher genannte genannten andere anderen anderer anderes
+    """.split())
+
+# Openers that continue the previous question ("and for 2022?", "und bei ...")
+FOLLOW_UP_OPENERS = (
+    "and",
+    "but",
+    "or",
+    "so",
+    "for",
+    "what about",
+    "how about",
+    "why",
+    "why not",
+    "what else",
+    "elaborate",
+    "continue",
+    "go on",
+    "compared",
+    "compare",
+    "versus",
+    "vs",
+    "und",
+    "aber",
+    "oder",
+    "bei",
+    "für",
+    "was ist mit",
+    "wie ist es mit",
+    "wie sieht es mit",
+    "warum",
+    "wieso",
+    "weshalb",
+    "im vergleich",
+    "verglichen",
+    "mehr",
+    "genauer",
+)
+
+_WORD = re.compile(r"\w+(?:'\w+)*")
+_YEAR = re.compile(r"(?:19|20)\d\d")
+
+
+def _names_subject(words: list) -> bool:
+    """True if some word looks like a year, an acronym / product code or a name."""
+    for position, word in enumerate(words):
+        if _YEAR.fullmatch(word):
+            return True
+        if word.isupper() and sum(c.isupper() for c in word) >= 2:  # SARON, CO2
+            return True
+        # The first word is capitalized anyway
+        if position and len(word) > 1 and word[0].isupper():
+            return True
+    return False
+
+
+def is_standalone(question: str) -> bool:
+    """True if `question` can be answered without the chat history."""
+    words = _WORD.findall(question.replace("’", "'"))
+    lowered = [word.lower() for word in words]
+    if len(words) < MIN_STANDALONE_WORDS:
+        return False
+    opening = " ".join(lowered[:4])
+    if any(
+        opening == opener or opening.startswith(opener + " ")
+        for opener in FOLLOW_UP_OPENERS
+    ):
+        return False
+    if REFERENCE_WORDS.intersection(lowered):
+        return False
+    return _names_subject(words)
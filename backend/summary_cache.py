@@ -0,0 +1,141 @@
+"""Cache for ESG summaries with coalescing of concurrent requests.
+
+Summaries are keyed by a fingerprint of the document corpus plus the prompt /
+agent configuration, held in memory and mirrored to a local on-disk store.
+Concurrent requests for the same key share a single in-flight run instead of
+each starting their own multi-minute crew. The cache has no lock: it must only
+be used from the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+
+def fingerprint(value) -> str:
+    """Stable SHA-256 of a JSON-serializable value."""
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def corpus_fingerprint(entries: Iterable[dict]) -> str:
+    """Fingerprint of a corpus from its text cache entries (file name + content hash)."""
+    return fingerprint(
+        sorted((os.path.basename(entry["path"]), entry["sha256"]) for entry in entries)
+    )
+
+
+def summary_cache_key(corpus_hash: str, config: dict) -> str:
+    return fingerprint({"corpus": corpus_hash, "config": config})
+
+
+class SummaryCache:
+    """In-memory + on-disk summary store with per-key request coalescing."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._memory: Dict[str, dict] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            entry = self._read_disk_entry(key)
+            if entry is None:
+                return None
+            self._memory[key] = entry
+        return entry["summary"]
+
+    def put(self, key: str, summary: str) -> None:
+        """Stores a summary in memory and on disk."""
+        entry = {"key": key, "summary": summary, "created_at": time.time()}
+        self._memory[key] = entry
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._entry_path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._entry_path(key))
+        except OSError as e:
+            logging.warning(f"Could not persist summary cache entry {key}: {e}")
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drops one entry, or the whole cache when no key is given."""
+        keys = [key] if key else list(self._memory) + self._disk_keys()
+        for k in set(keys):
+            self._memory.pop(k, None)
+            try:
+                os.remove(self._entry_path(k))
+            except FileNotFoundError:
+                pass
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[str]],
+        refresh: bool = False,
+    ) -> Tuple[str, bool]:
+        """Returns `(summary, cached)`, running `compute` at most once per key at a time.
+
+        With `refresh=True` the stored entry is ignored and a new run is started,
+        unless one is already in flight, which is then shared.
+        """
+        if not refresh:
+            summary = self.get(key)
+            if summary is not None:
+                self.hits += 1
+                return summary, True
+            self.misses += 1
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._compute_and_store(key, compute))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so a disconnecting client does not cancel the shared run
+        return await asyncio.shield(future), False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    async def _compute_and_store(
+        self, key: str, compute: Callable[[], Awaitable[str]]
+    ) -> str:
+        summary = await compute()
+        self.put(key, summary)
+        return summary
+
+    def _read_disk_entry(self, key: str) -> Optional[dict]:
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable summary cache entry '{path}': {e}")
+            return None
+
+    def _disk_keys(self) -> list:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [
+            name[: -len(".json")]
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(".json")
+        ]
@@ -0,0 +1,21 @@
+"""Test setup: backend modules importable, fake models as LlamaIndex defaults."""
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from llama_index.core import Settings  # noqa: E402
+
+from fake_models import FakeEmbedding, FakeLLM  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fake_models():
+    Settings.llm = FakeLLM()
+    Settings.embed_model = FakeEmbedding()
+    yield
@@ -0,0 +1,68 @@
+import time
+
+from answer_cache import AnswerCache, normalize_question
+
+
+def filled_cache(**kwargs) -> AnswerCache:
+    cache = AnswerCache(**kwargs)
+    cache.set_index_version("v1")
+    return cache
+
+
+def test_exact_lookup_ignores_case_whitespace_and_punctuation():
+    cache = filled_cache()
+    cache.put("What are Scope 1 emissions?", "Direct emissions.", [], None, "v1")
+    assert normalize_question("  what are  scope 1 EMISSIONS ") == (
+        "what are scope 1 emissions"
+    )
+    assert cache.lookup_exact("what are scope 1 emissions").answer == (
+        "Direct emissions."
+    )
+    assert cache.lookup_exact("What are Scope 2 emissions?") is None
+
+
+def test_similar_lookup_respects_the_threshold():
+    cache = filled_cache(similarity_threshold=0.9)
+    cache.put("q", "a", [], [1.0, 0.0], "v1")
+    entry, similarity = cache.lookup_similar([1.0, 0.1])
+    assert entry.answer == "a" and similarity > 0.9
+    assert cache.lookup_similar([0.0, 1.0]) is None
+    assert cache.stats()["semantic_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    cache = filled_cache(ttl_seconds=60)
+    cache.put("q", "a", [], [1.0, 0.0], "v1")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.lookup_exact("q") is None
+    assert cache.lookup_similar([1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = filled_cache(max_entries=2)
+    cache.put("first", "1", [], None, "v1")
+    cache.put("second", "2", [], None, "v1")
+    cache.lookup_exact("first")  # Now more recent than "second"
+    cache.put("third", "3", [], None, "v1")
+    assert cache.lookup_exact("second") is None
+    assert cache.lookup_exact("first").answer == "1"
+    assert cache.lookup_exact("third").answer == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_new_index_version_drops_answers_and_rejects_stale_puts():
+    cache = filled_cache()
+    cache.put("q", "old", [], [1.0, 0.0], "v1")
+    cache.set_index_version("v1")  # Same version: kept
+    assert cache.lookup_exact("q").answer == "old"
+
+    cache.set_index_version("v2")
+    assert cache.lookup_exact("q") is None
+    assert cache.lookup_similar([1.0, 0.0]) is None
+    # An answer computed against the previous index arrives late
+    cache.put("q", "old", [], [1.0, 0.0], "v1")
+    assert cache.lookup_exact("q") is None
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+from crew_factory import LLMPool
+
+
+def counting_pool(max_size: int) -> LLMPool:
+    created = []
+
+    def create():
+        created.append(object())
+        return created[-1]
+
+    return LLMPool(create, max_size=max_size)
+
+
+def test_async_lease_waits_without_blocking_the_loop():
+    pool = counting_pool(max_size=1)
+    order = []
+
+    async def hold(name: str, seconds: float):
+        async with pool.alease() as llm:
+            order.append(name)
+            await asyncio.sleep(seconds)
+            return llm
+
+    async def tick():
+        await asyncio.sleep(0.01)
+        order.append("tick")  # Runs while the second lease is waiting
+
+    async def main():
+        return await asyncio.gather(hold("first", 0.05), hold("second", 0), tick())
+
+    first, second, _ = asyncio.run(main())
+    assert first is second
+    assert order == ["first", "tick", "second"]
+    assert pool.stats() == {"created": 1, "idle": 1, "waiting": 0}
+
+
+def test_cancelled_waiter_passes_its_turn_on():
+    pool = counting_pool(max_size=1)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with pool.alease():
+                await release.wait()
+
+        async def lease_once():
+            async with pool.alease() as llm:
+                return llm
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(lease_once())
+        waiting = asyncio.ensure_future(lease_once())
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.sleep(0)  # The release wakes the first waiter...
+        cancelled.cancel()  # ...which goes away before it can take the LLM
+        await holder
+        return await asyncio.wait_for(waiting, 1)
+
+    assert asyncio.run(main()) is not None
+    assert pool.stats()["waiting"] == 0
+
+
+def test_sync_lease_waits_for_an_async_release():
+    pool = counting_pool(max_size=1)
+    leased = threading.Event()
+
+    def lease_in_thread():
+        with pool.lease():
+            leased.set()
+
+    async def main():
+        async with pool.alease():
+            thread = threading.Thread(target=lease_in_thread)
+            thread.start()
+            await asyncio.sleep(0.05)
+            assert not leased.is_set()
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+    asyncio.run(main())
+    assert leased.is_set()
@@ -0,0 +1,66 @@
+import os
+
+from llama_index.core import Settings
+
+from indexing import (
+    IndexingProgress,
+    load_manifest,
+    load_or_build_index,
+    refresh_index,
+)
+from synthetic_corpus import generate_corpus, write_pdf
+
+
+def node_count(index) -> int:
+    return len(index.index_struct.nodes_dict)
+
+
+def test_build_then_load_applies_only_changes(tmp_path):
+    data, storage = str(tmp_path / "data"), str(tmp_path / "storage")
+    generate_corpus(data, files=2, pages=2)
+    index = load_or_build_index(data, storage)
+    assert sorted(load_manifest(storage)["files"]) == [
+        "report_000.pdf",
+        "report_001.pdf",
+    ]
+
+    write_pdf(os.path.join(data, "extra.pdf"), [["Zephyrwind cut methane."]])
+    reloaded = load_or_build_index(data, storage)
+    assert node_count(reloaded) == node_count(index) + 1
+    assert "extra.pdf" in load_manifest(storage)["files"]
+
+
+def test_failed_refresh_keeps_the_loaded_index(tmp_path, monkeypatch):
+    data, storage = str(tmp_path / "data"), str(tmp_path / "storage")
+    generate_corpus(data, files=2, pages=2)
+    index = load_or_build_index(data, storage)
+    manifest = load_manifest(storage)
+
+    os.remove(os.path.join(data, "report_001.pdf"))
+    write_pdf(os.path.join(data, "extra.pdf"), [["Zephyrwind cut methane."]])
+
+    def fail(*args, **kwargs):
+        raise ConnectionError("embedding API unavailable")
+
+    monkeypatch.setattr(type(Settings.embed_model), "_get_text_embeddings", fail)
+    progress = IndexingProgress()
+    reloaded = load_or_build_index(data, storage, progress)
+
+    # Served unchanged (the removed file is not dropped either), not rebuilt
+    assert node_count(reloaded) == node_count(index)
+    assert load_manifest(storage) == manifest
+    assert "embedding API unavailable" in progress.error
+
+
+def test_progress_counts_each_run_from_zero(tmp_path):
+    data, storage = str(tmp_path / "data"), str(tmp_path / "storage")
+    generate_corpus(data, files=2, pages=3)
+    progress = IndexingProgress()
+    index = load_or_build_index(data, storage, progress)
+    progress.finish()
+    assert (progress.files_total, progress.documents_parsed) == (2, 2)
+
+    write_pdf(os.path.join(data, "extra.pdf"), [["Zephyrwind cut methane."]])
+    refresh_index(index, data, storage, progress, live=True)
+    assert (progress.files_total, progress.documents_parsed) == (1, 1)
+    assert progress.finished_at is None
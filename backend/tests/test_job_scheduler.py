@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from job_scheduler import JobCancelled, JobScheduler, JobStatus, QueueFull
+
+
+def run(scenario):
+    """Runs `scenario(scheduler)` against a started scheduler with one worker."""
+
+    async def main():
+        scheduler = JobScheduler(max_workers=1, max_queued=2)
+        await scheduler.start()
+        try:
+            return await scenario(scheduler)
+        finally:
+            await scheduler.stop()
+
+    return asyncio.run(main())
+
+
+def test_cancel_running_coroutine_job():
+    async def scenario(scheduler):
+        started = asyncio.Event()
+
+        async def work(job):
+            started.set()
+            await asyncio.sleep(10)
+
+        job = scheduler.submit(work, "summary")
+        await started.wait()
+        assert scheduler.cancel(job.job_id)
+        with pytest.raises(JobCancelled):
+            await scheduler.wait(job)
+        assert not scheduler.cancel("missing")
+        return job
+
+    assert run(scenario).status == JobStatus.CANCELLED
+
+
+def test_cancel_queued_job_never_runs_it():
+    ran = []
+
+    async def scenario(scheduler):
+        release = asyncio.Event()
+
+        async def blocker(job):
+            await release.wait()
+            return "first"
+
+        async def work(job):
+            ran.append(job.job_id)
+
+        first = scheduler.submit(blocker, "summary")
+        queued = scheduler.submit(work, "summary")
+        assert scheduler.cancel(queued.job_id)
+        assert queued.status == JobStatus.CANCELLED
+        release.set()
+        assert await scheduler.wait(first) == "first"
+        assert not scheduler.cancel(first.job_id)  # Already finished
+        return queued
+
+    queued = run(scenario)
+    assert ran == []
+    assert queued.started_at is None
+
+
+def test_cancel_blocking_job_stops_at_checkpoint():
+    async def scenario(scheduler):
+        started = threading.Event()
+
+        def work(job):
+            started.set()
+            while True:
+                job.check_cancelled()
+                time.sleep(0.01)
+
+        job = scheduler.submit(work, "summary")
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        scheduler.cancel(job.job_id)
+        with pytest.raises(JobCancelled):
+            await scheduler.wait(job)
+        return job
+
+    assert run(scenario).status == JobStatus.CANCELLED
+
+
+def test_submit_beyond_queue_limit_raises():
+    async def scenario(scheduler):
+        release = asyncio.Event()
+
+        async def blocker(job):
+            await release.wait()
+
+        scheduler.submit(blocker, "summary")
+        await asyncio.sleep(0)  # Let the worker take the first job
+        scheduler.submit(blocker, "summary")
+        scheduler.submit(blocker, "summary")
+        with pytest.raises(QueueFull):
+            scheduler.submit(blocker, "summary")
+        release.set()
+
+    run(scenario)
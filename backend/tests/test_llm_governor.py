@@ -0,0 +1,37 @@
+import logging
+
+import pytest
+
+from llm_governor import LLMGovernor, LLMOverloaded, client_context
+
+
+@pytest.mark.parametrize(
+    "max_concurrency, background, expected",
+    [(8, 4, 4), (8, 8, 7), (8, 0, 1), (2, 1, 1), (1, 1, 1), (1, 0, 1)],
+)
+def test_background_share_is_clamped(max_concurrency, background, expected):
+    governor = LLMGovernor(
+        max_concurrency=max_concurrency, max_background_concurrency=background
+    )
+    assert governor.max_background_concurrency == expected
+
+
+def test_clamping_is_logged(caplog):
+    with caplog.at_level(logging.WARNING):
+        LLMGovernor(max_concurrency=4, max_background_concurrency=4)
+    assert "using 3" in caplog.text
+
+
+def test_background_calls_leave_a_slot_for_interactive_calls():
+    governor = LLMGovernor(
+        max_concurrency=2, max_background_concurrency=1, max_wait_seconds=0.05
+    )
+    with client_context("summary", background=True):
+        background = governor.acquire_sync(10)
+        # The background share is used up, so this one times out
+        with pytest.raises(LLMOverloaded):
+            governor.acquire_sync(10)
+    interactive = governor.acquire_sync(10)
+    assert governor.stats()["active"] == 2
+    interactive.release()
+    background.release()
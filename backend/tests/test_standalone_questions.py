@@ -0,0 +1,40 @@
+import pytest
+
+from standalone_questions import is_standalone
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "What are the Scope 1 emissions in 2023?",
+        "How much CO2 did UBS emit last year?",
+        "What is the current SARON mortgage rate of Raiffeisen?",
+        "Wie hoch war der CO2-Ausstoss von Raiffeisen 2022?",
+        "Welche Klimaziele hat die UBS bis 2030 gesetzt?",
+    ],
+)
+def test_self_contained_questions_are_standalone(question):
+    assert is_standalone(question)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        # Back-references and follow-up openers
+        "What does it say about water usage?",
+        "And what about the social targets for 2022?",
+        "How did that change compared to 2021?",
+        "Were there also targets for Scope 3?",
+        "Und was ist mit dem Zinssatz für 2022?",
+        "Wie hoch ist das bei einer SARON-Hypothek?",
+        "Gilt das auch für Renditeobjekte?",
+        "Bei einer Laufzeit von 10 Jahren?",
+        # Elliptical: nothing points back, but nothing names a subject either
+        "Explain the difference for a 15 year term please",
+        "what are the main risks mentioned",
+        # Too short to carry a subject
+        "Raiffeisen in 2022?",
+    ],
+)
+def test_follow_ups_need_condensing(question):
+    assert not is_standalone(question)
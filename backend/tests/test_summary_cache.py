@@ -0,0 +1,58 @@
+import asyncio
+
+from summary_cache import SummaryCache, summary_cache_key
+
+
+def test_concurrent_requests_share_one_run(tmp_path):
+    cache = SummaryCache(str(tmp_path))
+    runs = []
+
+    async def compute():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "summary"
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.get_or_compute("k", compute) for _ in range(5))
+        )
+
+    assert asyncio.run(main()) == [("summary", False)] * 5
+    assert len(runs) == 1
+    assert asyncio.run(cache.get_or_compute("k", compute)) == ("summary", True)
+    assert len(runs) == 1
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_run(tmp_path):
+    cache = SummaryCache(str(tmp_path))
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "summary"
+
+    async def main():
+        first = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        second = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == ("summary", False)
+    assert cache.get("k") == "summary"
+
+
+def test_entries_survive_a_restart_until_invalidated(tmp_path):
+    SummaryCache(str(tmp_path)).put("k", "summary")
+    reloaded = SummaryCache(str(tmp_path))
+    assert reloaded.get("k") == "summary"
+
+    reloaded.invalidate()
+    assert SummaryCache(str(tmp_path)).get("k") is None
+
+
+def test_key_depends_on_corpus_and_config():
+    config = {"mode": "crew", "llm": "gpt-4.1-mini"}
+    key = summary_cache_key("corpus", config)
+    assert key == summary_cache_key("corpus", dict(config))
+    assert key != summary_cache_key("other", config)
+    assert key != summary_cache_key("corpus", dict(config, llm="gpt-4o"))
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from vector_store import MmapVectorStore
+
+DIM = 16
+
+
+def make_nodes(ref_doc_id: str, count: int, seed: int):
+    rng = np.random.default_rng(seed)
+    return [
+        TextNode(
+            id_=f"{ref_doc_id}-{i}",
+            text="",
+            embedding=rng.standard_normal(DIM).tolist(),
+            relationships={
+                NodeRelationship.SOURCE: RelatedNodeInfo(node_id=ref_doc_id)
+            },
+        )
+        for i in range(count)
+    ]
+
+
+def top_ids(store, node, k=1):
+    query = VectorStoreQuery(query_embedding=node.embedding, similarity_top_k=k)
+    return store.query(query).ids
+
+
+def persist_and_reload(store, tmp_path, **kwargs):
+    store.persist(str(tmp_path / "default__vector_store.json"))
+    return MmapVectorStore.from_persist_dir(str(tmp_path), **kwargs)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_persist_and_reload_keep_every_vector(tmp_path, dtype):
+    nodes = make_nodes("a", 20, seed=0)
+    store = MmapVectorStore(dtype=dtype)
+    store.add(nodes)
+
+    reloaded = persist_and_reload(store, tmp_path)
+    assert reloaded.dtype == dtype
+    assert reloaded.node_count == 20
+    for node in nodes:
+        assert top_ids(reloaded, node) == [node.node_id]
+
+
+def test_delete_drops_all_nodes_of_a_document(tmp_path):
+    first, second = make_nodes("a", 5, seed=0), make_nodes("b", 5, seed=1)
+    store = MmapVectorStore()
+    store.add(first)
+    store = persist_and_reload(store, tmp_path)
+    store.add(second)  # Mix persisted and unpersisted rows
+
+    store.delete("a")
+    store.delete("missing")
+    assert store.node_count == 5
+    assert set(top_ids(store, first[0], k=10)) == {n.node_id for n in second}
+
+    reloaded = persist_and_reload(store, tmp_path)
+    assert reloaded.node_count == 5
+    reloaded.delete("b")
+    assert reloaded.node_count == 0
+    assert top_ids(reloaded, first[0]) == []
+
+
+def test_re_adding_a_node_replaces_it(tmp_path):
+    node = make_nodes("a", 1, seed=0)[0]
+    store = MmapVectorStore()
+    store.add([node])
+    store = persist_and_reload(store, tmp_path)
+
+    moved = make_nodes("a", 1, seed=5)[0]
+    store.add([moved])
+    assert store.node_count == 1
+    store.delete("a")
+    assert store.node_count == 0
+
+
+def test_changes_made_while_persisting_are_kept(tmp_path, monkeypatch):
+    store = MmapVectorStore()
+    first, late = make_nodes("a", 5, seed=0), make_nodes("b", 3, seed=1)
+    store.add(first)
+    write_files = MmapVectorStore._write_files
+
+    def write_files_with_concurrent_changes(self, *args):
+        write_files(self, *args)
+        # Another thread modifies the store before it is re-mapped
+        self.add(late)
+        self.delete_nodes([first[0].node_id])
+
+    monkeypatch.setattr(
+        MmapVectorStore, "_write_files", write_files_with_concurrent_changes
+    )
+    store.persist(str(tmp_path / "default__vector_store.json"))
+    monkeypatch.undo()
+
+    assert store.node_count == 7
+    assert store.stats()["unpersisted"] == 3
+    assert first[0].node_id not in top_ids(store, first[0], k=10)
+    for node in late + first[1:]:
+        assert top_ids(store, node) == [node.node_id]
+    store.delete("b")
+    assert store.node_count == 4
+
+    reloaded = persist_and_reload(store, tmp_path)
+    assert reloaded.node_count == 4
+
+
+def test_ivf_search_finds_exact_matches(tmp_path):
+    nodes = make_nodes("a", 200, seed=0)
+    store = MmapVectorStore(search="ivf", ivf_min_rows=100, ivf_probes=4)
+    store.add(nodes)
+
+    reloaded = persist_and_reload(
+        store, tmp_path, search="ivf", ivf_min_rows=100, ivf_probes=4
+    )
+    assert reloaded.stats()["search"] == "ivf"
+    for node in nodes[:20]:
+        assert top_ids(reloaded, node) == [node.node_id]
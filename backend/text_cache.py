@@ -0,0 +1,142 @@
+"""Persistent cache of text extracted from the source documents.
+
+PDF extraction is the slowest CPU step of the summarization endpoints, so the
+extracted text of every file is cached on disk, keyed by path, size, mtime and
+content hash, with an in-memory layer on top. A repeat request for an
+unchanged corpus does not parse a single PDF.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from llama_index.core.schema import Document
+
+from indexing import hash_file, list_corpus_files
+from parallel_ingest import parse_files
+
+# Separator placed after each document section in the concatenated corpus text
+DOCUMENT_SEPARATOR = "\n\n---\n\n"
+CACHE_VERSION = 1
+
+# In-memory layer: absolute path -> cache entry (size, mtime, sha256, text)
+_memory_cache: Dict[str, dict] = {}
+_memory_lock = threading.Lock()
+
+
+def _entry_path(cache_dir: str, path: str) -> str:
+    key = hashlib.sha1(path.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def _read_disk_entry(cache_dir: str, path: str) -> Optional[dict]:
+    entry_path = _entry_path(cache_dir, path)
+    if not os.path.exists(entry_path):
+        return None
+    try:
+        with open(entry_path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable text cache entry '{entry_path}': {e}")
+        return None
+    if entry.get("version") != CACHE_VERSION or entry.get("path") != path:
+        return None
+    return entry
+
+
+def _write_disk_entry(cache_dir: str, entry: dict) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_path = _entry_path(cache_dir, entry["path"])
+    tmp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, entry_path)
+
+
+def _join_text(documents: List[Document]) -> str:
+    """Joins a file's document sections in one linear pass."""
+    return "".join(doc.get_content() + DOCUMENT_SEPARATOR for doc in documents)
+
+
+def _lookup_entry(path: str, cache_dir: str) -> Tuple[Optional[dict], dict]:
+    """Looks a file up in the cache without parsing it.
+
+    Returns `(entry, stub)`: the cached entry on a hit, otherwise `None` and a
+    stub (path, size, mtime, sha256) that only lacks the extracted text.
+    Lookup order: memory (stat match), disk (stat match), disk (content hash
+    match, e.g. after a copy or touch).
+    """
+    stat = os.stat(path)
+
+    def matches_stat(entry: Optional[dict]) -> bool:
+        return (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime"] == stat.st_mtime
+        )
+
+    with _memory_lock:
+        entry = _memory_cache.get(path)
+    if matches_stat(entry):
+        return entry, entry
+
+    entry = _read_disk_entry(cache_dir, path)
+    if not matches_stat(entry):
+        sha256 = hash_file(path)
+        if entry is None or entry["sha256"] != sha256:
+            stub = {"version": CACHE_VERSION, "path": path, "sha256": sha256}
+            stub["size"] = stat.st_size
+            stub["mtime"] = stat.st_mtime
+            return None, stub
+        entry["size"] = stat.st_size
+        entry["mtime"] = stat.st_mtime
+        _write_disk_entry(cache_dir, entry)
+
+    _remember(entry)
+    return entry, entry
+
+
+def _remember(entry: dict) -> None:
+    with _memory_lock:
+        _memory_cache[entry["path"]] = entry
+
+
+def _store_parsed(stub: dict, documents: List[Document], cache_dir: str) -> dict:
+    entry = dict(stub, text=_join_text(documents))
+    _write_disk_entry(cache_dir, entry)
+    _remember(entry)
+    return entry
+
+
+def load_corpus_entries(directory: str, cache_dir: str, workers: int = 1) -> List[dict]:
+    """Returns cache entries for every file in the corpus, in a stable order.
+
+    Files missing from the cache are parsed across `workers` processes.
+    """
+    paths = [
+        os.path.abspath(os.path.join(directory, name))
+        for name in list_corpus_files(directory)
+    ]
+    entries: Dict[str, dict] = {}
+    misses: Dict[str, dict] = {}
+    for path in paths:
+        entry, stub = _lookup_entry(path, cache_dir)
+        if entry is not None:
+            entries[path] = entry
+        else:
+            misses[path] = stub
+
+    if misses:
+        print(f"Extracting text from {len(misses)} files ({workers} workers)...")
+        for path, documents in parse_files(list(misses), workers):
+            entries[path] = _store_parsed(misses[path], documents, cache_dir)
+
+    # Drop memory entries of files that no longer exist
+    with _memory_lock:
+        for path in list(_memory_cache):
+            if path not in entries and not os.path.exists(path):
+                del _memory_cache[path]
+    return [entries[path] for path in paths]
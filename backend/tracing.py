@@ -0,0 +1,413 @@
+"""Optional, sampled request tracing.
+
+Tracing is off until `configure` is called, which the server does from a
+background task after it has bound its port, so nothing here runs at import
+time. Each HTTP request (and each summarization job) starts a trace with
+probability `sample_rate`; unsampled requests only pay for one random number
+and a context variable. Spans of sampled traces cover the chat pipeline
+stages and every LLM call, and are handed to a background thread that
+exports them in batches:
+
+- "jsonl": one JSON object per span appended to a local file
+- "otlp": OTLP/HTTP to a (local) OpenTelemetry collector; needs the optional
+  opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http packages
+- "none": tracing stays disabled
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionStartEvent,
+)
+from llama_index.core.instrumentation.events.retrieval import (
+    RetrievalEndEvent,
+    RetrievalStartEvent,
+)
+from llama_index.core.instrumentation.events.synthesis import (
+    SynthesizeEndEvent,
+    SynthesizeStartEvent,
+)
+from pydantic import PrivateAttr
+
+EXPORTERS = ("none", "jsonl", "otlp")
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL_SECONDS = 2.0
+MAX_PENDING_SPANS = 10000  # Spans beyond this are dropped rather than queued
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: int
+    span_id: int
+    parent_id: Optional[int] = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": f"{self.trace_id:032x}",
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent_id:016x}" if self.parent_id else None,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+# The active span, or _UNSAMPLED inside a trace that was not sampled
+_UNSAMPLED = object()
+_current: contextvars.ContextVar = contextvars.ContextVar("span", default=None)
+
+
+class JsonlExporter:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(
+                json.dumps(span.to_dict(), default=str) + "\n" for span in spans
+            )
+
+    def shutdown(self) -> None:
+        pass
+
+
+class OtlpExporter:
+    """Converts spans to OpenTelemetry SDK spans and sends them over OTLP/HTTP."""
+
+    def __init__(self, endpoint: str, service_name: str):
+        from opentelemetry import trace as trace_api
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import ReadableSpan
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        self._trace_api = trace_api
+        self._readable_span = ReadableSpan
+        self._success = SpanExportResult.SUCCESS
+        self._resource = Resource.create({"service.name": service_name})
+        self._exporter = OTLPSpanExporter(endpoint=endpoint)
+
+    def _context(self, trace_id: int, span_id: int):
+        return self._trace_api.SpanContext(
+            trace_id,
+            span_id,
+            is_remote=False,
+            trace_flags=self._trace_api.TraceFlags(self._trace_api.TraceFlags.SAMPLED),
+        )
+
+    def export(self, spans: List[Span]) -> None:
+        status_code = self._trace_api.StatusCode
+        result = self._exporter.export(
+            [
+                self._readable_span(
+                    name=span.name,
+                    context=self._context(span.trace_id, span.span_id),
+                    parent=(
+                        self._context(span.trace_id, span.parent_id)
+                        if span.parent_id
+                        else None
+                    ),
+                    resource=self._resource,
+                    attributes={
+                        key: (
+                            value
+                            if isinstance(value, (bool, int, float))
+                            else str(value)
+                        )
+                        for key, value in span.attributes.items()
+                        if value is not None
+                    },
+                    status=self._trace_api.Status(
+                        status_code.ERROR if span.error else status_code.OK,
+                        span.error,
+                    ),
+                    start_time=span.start_ns,
+                    end_time=span.end_ns,
+                )
+                for span in spans
+            ]
+        )
+        if result != self._success:
+            raise RuntimeError(f"OTLP export returned {result.name}")
+
+    def shutdown(self) -> None:
+        self._exporter.shutdown()
+
+
+class Tracer:
+    """Samples traces, tracks the active span and exports finished spans in batches."""
+
+    def __init__(self, exporter=None, sample_rate: float = 0.01):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.exported = 0
+        self.dropped = 0
+        self._pending: queue.Queue = queue.Queue(maxsize=MAX_PENDING_SPANS)
+        self._thread: Optional[threading.Thread] = None
+        if exporter is not None:
+            self._thread = threading.Thread(
+                target=self._export_loop, name="trace-exporter", daemon=True
+            )
+            self._thread.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None and self.sample_rate > 0
+
+    def start_span(self, name: str, **attributes) -> Optional[Span]:
+        """Starts a span under the active one, or a new sampled-or-not trace.
+
+        Returns None when the span is not recorded. The span does not become
+        the active one (see `span` for that); finish it with `end_span`.
+        """
+        if not self.enabled:
+            return None
+        parent = _current.get()
+        if parent is _UNSAMPLED:
+            return None
+        if parent is None:
+            if random.random() >= self.sample_rate:
+                return None
+            trace_id, parent_id = random.getrandbits(128) or 1, None
+        else:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        return Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=random.getrandbits(64) or 1,
+            parent_id=parent_id,
+            attributes=attributes,
+        )
+
+    def end_span(
+        self,
+        span: Optional[Span],
+        error: Optional[str] = None,
+        end_ns: Optional[int] = None,
+    ) -> None:
+        if span is None:
+            return
+        span.end_ns = end_ns or time.time_ns()
+        span.error = error
+        try:
+            self._pending.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Records the `with` block as a span and makes it the active one."""
+        if not self.enabled:
+            yield None
+            return
+        span = self.start_span(name, **attributes)
+        token = _current.set(span if span is not None else _UNSAMPLED)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            _current.reset(token)
+            self.end_span(span, error)
+
+    def shutdown(self) -> None:
+        """Flushes pending spans and stops the export thread."""
+        if self._thread is None:
+            return
+        self._pending.put(None)
+        self._thread.join(timeout=10)
+        self.exporter.shutdown()
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "sample_rate": self.sample_rate,
+            "exported": self.exported,
+            "dropped": self.dropped,
+        }
+
+    def _export_loop(self) -> None:
+        # Collects spans for up to EXPORT_INTERVAL_SECONDS after the first one
+        while True:
+            batch = [self._pending.get()]
+            if batch[0] is None:
+                return
+            deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+            stopping = False
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    span = self._pending.get(timeout=deadline - time.monotonic())
+                except (queue.Empty, ValueError):  # ValueError: deadline passed
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            try:
+                self.exporter.export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logging.warning(f"Dropped {len(batch)} spans, export failed: {e}")
+            if stopping:
+                return
+
+
+class TracingMiddleware:
+    """ASGI middleware starting one (sampled) trace per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            return await self.app(scope, receive, send)
+        with tracer.span(f"{scope['method']} {scope['path']}") as span:
+            if span is None:
+                return await self.app(scope, receive, send)
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+            # Name by route template once routing has happened
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                span.name = f"{scope['method']} {route}"
+
+
+class TracingEventHandler(BaseEventHandler):
+    """Turns LlamaIndex retrieval, synthesis and LLM events into child spans."""
+
+    # (kind, LlamaIndex span id) -> span whose end event is pending
+    _open: Dict[Tuple[str, Optional[str]], Span] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TracingEventHandler"
+
+    def handle(self, event: BaseEvent, **kwargs) -> None:
+        if not tracer.enabled or not isinstance(_current.get(), Span):
+            return
+        if isinstance(event, RetrievalStartEvent):
+            self._start("retrieve", event)
+        elif isinstance(event, RetrievalEndEvent):
+            span = self._end("retrieve", event)
+            if span is not None:
+                span.set_attribute("retrieval.nodes", len(event.nodes))
+                tracer.end_span(span)
+        elif isinstance(event, SynthesizeStartEvent):
+            self._start("synthesize", event)
+        elif isinstance(event, SynthesizeEndEvent):
+            tracer.end_span(self._end("synthesize", event))
+        elif isinstance(event, (LLMChatStartEvent, LLMCompletionStartEvent)):
+            span = self._start("llm", event)
+            if span is not None and event.model_dict.get("model"):
+                span.set_attribute("llm.model", event.model_dict["model"])
+        elif isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent)):
+            span = self._end("llm", event)
+            if span is not None and event.response is not None:
+                usage = event.response.additional_kwargs or {}
+                for key in ("prompt_tokens", "completion_tokens"):
+                    if key in usage:
+                        span.set_attribute(f"llm.{key}", usage[key])
+                tracer.end_span(span)
+
+    def _start(self, kind: str, event: BaseEvent) -> Optional[Span]:
+        span = tracer.start_span(kind)
+        if span is not None:
+            if len(self._open) >= MAX_PENDING_SPANS:
+                self._open.clear()  # Spans whose end event never came
+            self._open[(kind, event.span_id)] = span
+        return span
+
+    def _end(self, kind: str, event: BaseEvent) -> Optional[Span]:
+        return self._open.pop((kind, event.span_id), None)
+
+
+# Disabled until configured
+tracer = Tracer()
+_handler_installed = False
+
+
+def configure(
+    exporter: str,
+    sample_rate: float,
+    jsonl_path: str = "traces.jsonl",
+    otlp_endpoint: str = "http://localhost:4318/v1/traces",
+    service_name: str = "rag-chat-api",
+) -> None:
+    """Replaces the global tracer; falls back to no tracing if the exporter fails."""
+    global tracer, _handler_installed
+    if exporter not in EXPORTERS:
+        raise ValueError(
+            f"Unknown tracing exporter '{exporter}', use one of {EXPORTERS}"
+        )
+    backend = None
+    try:
+        if exporter == "jsonl":
+            backend = JsonlExporter(jsonl_path)
+        elif exporter == "otlp":
+            backend = OtlpExporter(otlp_endpoint, service_name)
+    except Exception as e:  # e.g. the optional OpenTelemetry packages are missing
+        print(f"Tracing disabled: could not set up the '{exporter}' exporter: {e}")
+        logging.exception("Tracing setup failed:")
+    previous, tracer = tracer, Tracer(backend, sample_rate)
+    previous.shutdown()
+    if backend is not None and not _handler_installed:
+        get_dispatcher().add_event_handler(TracingEventHandler())
+        _handler_installed = True
+    if backend is not None:
+        print(f"Tracing enabled: {exporter} exporter, sample rate {sample_rate}.")
+
+
+def span(name: str, **attributes):
+    """`Tracer.span` of the current global tracer."""
+    return tracer.span(name, **attributes)
+
+
+def record_span(name: str, start_ns: int, end_ns: int, **attributes) -> None:
+    """Records an already finished operation as a child of the active span."""
+    recorded = tracer.start_span(name, **attributes)
+    if recorded is not None:
+        recorded.start_ns = start_ns
+        tracer.end_span(recorded, end_ns=end_ns)
+
+
+def shutdown() -> None:
+    tracer.shutdown()
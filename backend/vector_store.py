@@ -0,0 +1,510 @@
+"""Memory-mapped binary vector store.
+
+Replaces LlamaIndex's JSON `SimpleVectorStore` persistence: embeddings are
+kept as one contiguous, L2-normalized float32 (or per-row scaled int8) `.npy`
+matrix that is memory-mapped read-only at load time, next to a compact JSON
+side file with node ids, ref doc ids and metadata. Loading no longer parses
+every embedding, resident memory only holds the pages that queries touch,
+and those pages are shared by every worker process that maps the same file.
+
+Nodes added after loading live in memory until the next `persist`, which
+writes a compacted matrix and re-maps it. The files are written from a
+snapshot, so queries and writes are not blocked while a large store persists.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+import fsspec
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.simple import DEFAULT_VECTOR_STORE, NAMESPACE_SEP
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import (
+    build_metadata_filter_fn,
+    node_to_metadata_dict,
+)
+
+from ann_index import IVFIndex
+
+STORE_VERSION = 1
+VECTOR_DTYPES = ("float32", "int8")
+SEARCH_MODES = ("exact", "ivf")
+# Rows scored per matrix product, bounding the temporary memory of a query
+QUERY_BLOCK_ROWS = 65536
+
+
+def store_base_path(persist_dir: str, namespace: str = DEFAULT_VECTOR_STORE) -> str:
+    return os.path.join(persist_dir, f"{namespace}{NAMESPACE_SEP}vector_store")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _quantize(vectors: np.ndarray):
+    """Symmetric per-row int8 quantization; returns (codes, scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _rows_as_float(
+    rows: List[int],
+    vectors: Optional[np.ndarray],
+    scales: Optional[np.ndarray],
+    added: List[np.ndarray],
+) -> np.ndarray:
+    """Normalized float32 vectors of the given rows (persisted or added)."""
+    persisted = 0 if vectors is None else vectors.shape[0]
+    rows = np.asarray(rows, dtype=np.int64)
+    # Live rows are in ascending order, so persisted rows come first
+    parts = []
+    old = rows[rows < persisted]
+    if len(old):
+        block = np.asarray(vectors[old], dtype=np.float32)
+        if scales is not None:
+            block = block * scales[old, None]
+        parts.append(block)
+    new = rows[rows >= persisted]
+    if len(new):
+        parts.append(np.stack([added[row - persisted] for row in new]))
+    return np.concatenate(parts)
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """Vector store with a memory-mapped embedding matrix (cosine similarity).
+
+    With `search="ivf"`, persisted stores of at least `ivf_min_rows` vectors
+    get an inverted-file index (see ann_index.py) and queries only score the
+    vectors of the `ivf_probes` closest lists; rows added since the last
+    persist are always scored exactly.
+    """
+
+    stores_text: bool = False
+    dtype: str = "float32"
+    search: str = "exact"
+    ivf_lists: int = 0  # 0: sqrt(number of vectors)
+    ivf_probes: int = 8
+    ivf_min_rows: int = 20000
+
+    _lock: threading.RLock = PrivateAttr()
+    # Serializes persists, which write outside `_lock`
+    _persist_lock: threading.Lock = PrivateAttr()
+    # Persisted rows: memory-mapped matrix (+ int8 scales) and its IVF index
+    _vectors: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: Optional[np.ndarray] = PrivateAttr(default=None)
+    _ivf: Optional[IVFIndex] = PrivateAttr(default=None)
+    # Per-row info for persisted rows followed by rows added since loading
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[str] = PrivateAttr(default_factory=list)
+    _metadata: List[dict] = PrivateAttr(default_factory=list)
+    _dead: Set[int] = PrivateAttr(default_factory=set)
+    _row_of: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _rows_of_ref: Dict[str, Set[int]] = PrivateAttr(default_factory=dict)
+    # Normalized float32 vectors of the rows added since loading
+    _added: List[np.ndarray] = PrivateAttr(default_factory=list)
+
+    def __init__(self, dtype: str = "float32", **kwargs: Any) -> None:
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype '{dtype}'.")
+        if kwargs.get("search", "exact") not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode '{kwargs['search']}'.")
+        super().__init__(dtype=dtype, **kwargs)
+        self._lock = threading.RLock()
+        self._persist_lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @classmethod
+    def from_persist_dir(
+        cls,
+        persist_dir: str,
+        namespace: str = DEFAULT_VECTOR_STORE,
+        fs: Optional[fsspec.AbstractFileSystem] = None,
+        **kwargs: Any,
+    ) -> "MmapVectorStore":
+        """Maps a persisted store; raises FileNotFoundError if there is none.
+
+        The dtype is the persisted one; `kwargs` set the search options.
+        """
+        base_path = store_base_path(persist_dir, namespace)
+        with open(f"{base_path}.meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported vector store version in '{base_path}'.")
+        kwargs.pop("dtype", None)
+        store = cls(dtype=meta["dtype"], **kwargs)
+        with store._lock:
+            store._install(*store._load_files(base_path, meta), meta)
+        return store
+
+    def _load_files(self, base_path: str, meta: dict):
+        """Maps the persisted files; returns (vectors, scales, ivf)."""
+        vectors = np.load(f"{base_path}.vectors.npy", mmap_mode="r")
+        scales = None
+        if meta["dtype"] == "int8":
+            scales = np.load(f"{base_path}.scales.npy", mmap_mode="r")
+        if vectors.shape[0] != len(meta["ids"]):
+            raise ValueError(f"Vector store files in '{base_path}' are inconsistent.")
+        ivf = None
+        if self.search == "ivf" and os.path.exists(f"{base_path}.ivf.npz"):
+            ivf = IVFIndex.load(f"{base_path}.ivf.npz")
+            if ivf.n_rows != vectors.shape[0]:
+                ivf = None  # Stale; rebuilt on the next persist
+        return vectors, scales, ivf
+
+    def _install(self, vectors, scales, ivf, meta: dict) -> None:
+        """Replaces all rows by the mapped files (caller holds `_lock`)."""
+        self._vectors = vectors
+        self._scales = scales
+        self._ivf = ivf
+        self._ids = list(meta["ids"])
+        self._ref_doc_ids = list(meta["ref_doc_ids"])
+        self._metadata = list(meta["metadata"])
+        self._dead = set()
+        self._row_of = {node_id: row for row, node_id in enumerate(self._ids)}
+        self._rows_of_ref = {}
+        for row, ref_doc_id in enumerate(self._ref_doc_ids):
+            self._rows_of_ref.setdefault(ref_doc_id, set()).add(row)
+        self._added = []
+
+    @property
+    def _persisted_rows(self) -> int:
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    @property
+    def node_count(self) -> int:
+        # Not __len__: StorageContext tests vector stores for truthiness
+        return len(self._ids) - len(self._dead)
+
+    def stats(self) -> dict:
+        return {
+            "vectors": self.node_count,
+            "dtype": self.dtype,
+            "search": "ivf" if self._ivf is not None else "exact",
+            "ivf_lists": self._ivf.n_lists if self._ivf is not None else 0,
+            "ivf_probes": self.ivf_probes,
+            "unpersisted": len(self._added),
+        }
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        vectors = _normalize(
+            np.asarray([node.get_embedding() for node in nodes], dtype=np.float32)
+        )
+        with self._lock:
+            for node, vector in zip(nodes, vectors):
+                metadata = node_to_metadata_dict(
+                    node, remove_text=True, flat_metadata=False
+                )
+                metadata.pop("_node_content", None)
+                self._append(node.node_id, node.ref_doc_id or "None", metadata, vector)
+        return [node.node_id for node in nodes]
+
+    def _append(
+        self, node_id: str, ref_doc_id: str, metadata: dict, vector: np.ndarray
+    ) -> None:
+        self._drop(node_id)
+        row = len(self._ids)
+        self._row_of[node_id] = row
+        self._rows_of_ref.setdefault(ref_doc_id, set()).add(row)
+        self._ids.append(node_id)
+        self._ref_doc_ids.append(ref_doc_id)
+        self._metadata.append(metadata)
+        self._added.append(vector)
+
+    def _drop(self, node_id: str) -> None:
+        row = self._row_of.pop(node_id, None)
+        if row is None:
+            return
+        self._dead.add(row)
+        ref_doc_id = self._ref_doc_ids[row]
+        rows = self._rows_of_ref[ref_doc_id]
+        rows.discard(row)
+        if not rows:
+            del self._rows_of_ref[ref_doc_id]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._lock:
+            for row in list(self._rows_of_ref.get(ref_doc_id, ())):
+                self._drop(self._ids[row])
+
+    def delete_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        with self._lock:
+            for row in self._candidate_rows(node_ids, filters):
+                self._drop(self._ids[row])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors = self._scales = self._ivf = None
+            self._ids, self._ref_doc_ids, self._metadata = [], [], []
+            self._dead, self._row_of, self._added = set(), {}, []
+            self._rows_of_ref = {}
+
+    def get_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+    ) -> List[BaseNode]:
+        raise NotImplementedError("MmapVectorStore does not store nodes directly.")
+
+    def _live_rows(self) -> List[int]:
+        return [row for row in range(len(self._ids)) if row not in self._dead]
+
+    def _candidate_rows(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+    ) -> List[int]:
+        if node_ids is not None:
+            rows = [self._row_of[i] for i in node_ids if i in self._row_of]
+        else:
+            rows = self._live_rows()
+        if filters is not None:
+            filter_fn = build_metadata_filter_fn(
+                lambda row: self._metadata[row], filters
+            )
+            rows = [row for row in rows if filter_fn(row)]
+        return rows
+
+    def _persisted_scores(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Scores of the given persisted rows (sorted, for sequential reads)."""
+        block = self._vectors[rows]
+        if self._scales is None:
+            return block @ query
+        return (block.astype(np.float32) @ query) * self._scales[rows]
+
+    def _block_scores(self, query: np.ndarray, start: int, stop: int) -> np.ndarray:
+        block = self._vectors[start:stop]
+        if self._scales is None:
+            return block @ query
+        return (block.astype(np.float32) @ query) * self._scales[start:stop]
+
+    def _exact_scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query with every row (dead rows included)."""
+        persisted = self._persisted_rows
+        parts = [
+            self._block_scores(query, start, min(start + QUERY_BLOCK_ROWS, persisted))
+            for start in range(0, persisted, QUERY_BLOCK_ROWS)
+        ]
+        if self._added:
+            parts.append(np.stack(self._added) @ query)
+        if not parts:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate(parts)
+
+    def _ivf_candidates(self, query: np.ndarray, n_probes: int):
+        """Rows of the probed lists plus all unpersisted rows, with their scores."""
+        persisted = self._persisted_rows
+        rows = self._ivf.probe(query, n_probes)
+        scores = self._persisted_scores(query, rows)
+        if self._added:
+            rows = np.concatenate([rows, np.arange(persisted, len(self._ids))])
+            scores = np.concatenate([scores, np.stack(self._added) @ query])
+        return rows, scores
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """Top-k by cosine similarity; `ivf_probes` may be overridden per query."""
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(
+                f"Unsupported query mode for MmapVectorStore: {query.mode}"
+            )
+        vector = np.asarray(query.query_embedding, dtype=np.float32)
+        vector = _normalize(vector[None, :])[0]
+
+        with self._lock:
+            if query.node_ids is not None or query.filters is not None:
+                # Restricted queries are usually small; score them exactly
+                rows = np.asarray(
+                    self._candidate_rows(query.node_ids, query.filters), dtype=np.int64
+                )
+                scores = self._exact_scores(vector)[rows]
+            elif self._ivf is not None:
+                n_probes = kwargs.get("ivf_probes") or self.ivf_probes
+                rows, scores = self._ivf_candidates(vector, n_probes)
+            else:
+                rows = None
+                scores = self._exact_scores(vector)
+            if self._dead:
+                dead = np.fromiter(self._dead, dtype=np.int64)
+                if rows is None:
+                    scores[dead] = -np.inf
+                else:
+                    scores = np.where(np.isin(rows, dead), -np.inf, scores)
+
+            k = min(query.similarity_top_k, len(scores))
+            if k == 0:
+                return VectorStoreQueryResult(similarities=[], ids=[])
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            top = top[np.isfinite(scores[top])]
+            top_rows = top if rows is None else rows[top]
+            return VectorStoreQueryResult(
+                similarities=[float(scores[i]) for i in top],
+                ids=[self._ids[row] for row in top_rows],
+            )
+
+    def persist(
+        self, persist_path: str, fs: Optional[fsspec.AbstractFileSystem] = None
+    ) -> None:
+        """Writes the live rows as a compacted matrix and re-maps it (local files only).
+
+        `persist_path` is the JSON path StorageContext passes to every vector
+        store; its extension is replaced by the store's own file suffixes.
+        """
+        base_path = os.path.splitext(persist_path)[0]
+        os.makedirs(os.path.dirname(base_path) or ".", exist_ok=True)
+        with self._persist_lock:
+            with self._lock:
+                # Persisted rows are read-only maps and added rows are only
+                # appended, so the snapshot stays valid while it is written
+                rows = self._live_rows()
+                snapshot_rows = len(self._ids)
+                vectors, scales, added = self._vectors, self._scales, self._added
+                old_ivf = self._ivf
+                dim = self._dimension()
+                meta = {
+                    "version": STORE_VERSION,
+                    "dtype": self.dtype,
+                    "dim": dim,
+                    "ids": [self._ids[row] for row in rows],
+                    "ref_doc_ids": [self._ref_doc_ids[row] for row in rows],
+                    "metadata": [self._metadata[row] for row in rows],
+                }
+            self._write_files(base_path, meta, rows, vectors, scales, added, old_ivf)
+            mapped = self._load_files(base_path, meta)
+            with self._lock:
+                if self._added is not added:
+                    return  # Cleared while writing; the files are still consistent
+                self._remap(mapped, meta, rows, snapshot_rows)
+
+    def _write_files(
+        self,
+        base_path: str,
+        meta: dict,
+        rows: List[int],
+        vectors: Optional[np.ndarray],
+        scales: Optional[np.ndarray],
+        added: List[np.ndarray],
+        old_ivf: Optional[IVFIndex],
+    ) -> None:
+        dim = meta["dim"]
+        np_dtype = np.int8 if self.dtype == "int8" else np.float32
+        tmp_vectors = f"{base_path}.vectors.tmp.npy"
+        out = np.lib.format.open_memmap(
+            tmp_vectors, mode="w+", dtype=np_dtype, shape=(len(rows), dim)
+        )
+        new_scales = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), QUERY_BLOCK_ROWS):
+            block = _rows_as_float(
+                rows[start : start + QUERY_BLOCK_ROWS], vectors, scales, added
+            )
+            stop = start + len(block)
+            if self.dtype == "int8":
+                out[start:stop], new_scales[start:stop] = _quantize(block)
+            else:
+                out[start:stop] = block
+        out.flush()
+
+        def fetch_rows(new_rows: np.ndarray) -> np.ndarray:
+            block = np.asarray(out[new_rows], dtype=np.float32)
+            if self.dtype == "int8":
+                block = block * new_scales[new_rows, None]
+            return block
+
+        ivf = self._build_ivf(old_ivf, np.asarray(rows, dtype=np.int64), fetch_rows)
+        del out
+
+        if self.dtype == "int8":
+            np.save(f"{base_path}.scales.tmp.npy", new_scales)
+            os.replace(f"{base_path}.scales.tmp.npy", f"{base_path}.scales.npy")
+        os.replace(tmp_vectors, f"{base_path}.vectors.npy")
+        if ivf is not None:
+            ivf.save(f"{base_path}.ivf.npz")
+        elif os.path.exists(f"{base_path}.ivf.npz"):
+            os.remove(f"{base_path}.ivf.npz")
+        # The side file is written last; its row count guards against a
+        # torn write of the matrix
+        tmp_meta = f"{base_path}.meta.json.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f, separators=(",", ":"))
+        os.replace(tmp_meta, f"{base_path}.meta.json")
+
+    def _remap(self, mapped, meta: dict, rows: List[int], snapshot_rows: int) -> None:
+        """Switches to the written files, replaying changes made while writing.
+
+        `rows` are the persisted (old) rows in file order; rows from
+        `snapshot_rows` on were added during the write. Caller holds `_lock`.
+        """
+        old_persisted = self._persisted_rows
+        dropped = [new for new, old in enumerate(rows) if old in self._dead]
+        pending = [
+            (
+                self._ids[row],
+                self._ref_doc_ids[row],
+                self._metadata[row],
+                self._added[row - old_persisted],
+            )
+            for row in range(snapshot_rows, len(self._ids))
+            if row not in self._dead
+        ]
+        self._install(*mapped, meta)
+        for new in dropped:
+            self._drop(self._ids[new])
+        for node_id, ref_doc_id, metadata, vector in pending:
+            self._append(node_id, ref_doc_id, metadata, vector)
+
+    def _build_ivf(
+        self,
+        old_ivf: Optional[IVFIndex],
+        old_rows: np.ndarray,
+        fetch_rows: Callable[[np.ndarray], np.ndarray],
+    ) -> Optional[IVFIndex]:
+        """IVF index for the compacted rows (`old_rows` maps new -> old row).
+
+        Rows that were already indexed keep their list; new rows are assigned
+        to the existing centroids. The lists are re-trained from scratch once
+        the store has doubled in size since training.
+        """
+        n_rows = len(old_rows)
+        if self.search != "ivf" or n_rows < self.ivf_min_rows:
+            return None
+        if old_ivf is None or n_rows > 2 * old_ivf.trained_rows:
+            print(f"Training IVF index over {n_rows} vectors...")
+            return IVFIndex.train(fetch_rows, n_rows, self.ivf_lists)
+        known = np.full(n_rows, -1, dtype=np.int32)
+        indexed = old_rows < old_ivf.n_rows
+        known[indexed] = old_ivf.assignments[old_rows[indexed]]
+        return old_ivf.with_rows(fetch_rows, np.arange(n_rows), n_rows, known)
+
+    def _dimension(self) -> int:
+        if self._vectors is not None and self._vectors.shape[0]:
+            return self._vectors.shape[1]
+        if self._added:
+            return self._added[0].shape[0]
+        return 0
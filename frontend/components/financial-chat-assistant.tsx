@@ -29,6 +29,8 @@ export function FinancialChatAssistant() {
   ])
   const [input, setInput] = useState("")
   const [isLoading, setIsLoading] = useState(false)
+  // Backend chat session; assigned by the server on the first message
+  const [sessionId, setSessionId] = useState<string | null>(null)
   const messagesEndRef = useRef<HTMLDivElement>(null)
 
   // Sample financial questions for demonstration
@@ -62,43 +64,68 @@ export function FinancialChatAssistant() {
     setInput("")
     setIsLoading(true)
 
+    const assistantId = (Date.now() + 1).toString()
+
     try {
-      // Call the FastAPI backend
-      const response = await fetch("http://127.0.0.1:8000/api/chat", {
+      // Call the FastAPI backend; the answer is streamed as Server-Sent Events
+      const response = await fetch("http://127.0.0.1:8000/api/chat/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ message: input }),
+        body: JSON.stringify({ message: input, session_id: sessionId }),
       })
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error(`API request failed with status ${response.status}`)
       }
 
-      const data = await response.json()
-
-      // Add assistant message with the response from the API
-      const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        content: data.response,
-        role: "assistant",
-        timestamp: new Date(),
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        // Events are separated by a blank line; keep any partial event in the buffer
+        const events = buffer.split("\n\n")
+        buffer = events.pop() ?? ""
+
+        for (const event of events) {
+          if (!event.startsWith("data: ")) continue
+          const data = JSON.parse(event.slice("data: ".length))
+
+          if (data.type === "sources" || data.type === "done") {
+            setSessionId(data.session_id)
+          } else if (data.type === "token") {
+            // The first token replaces the loading indicator with the assistant message
+            setIsLoading(false)
+            setMessages((prev) =>
+              prev.some((message) => message.id === assistantId)
+                ? prev.map((message) =>
+                    message.id === assistantId ? { ...message, content: message.content + data.token } : message,
+                  )
+                : [...prev, { id: assistantId, content: data.token, role: "assistant", timestamp: new Date() }],
+            )
+          } else if (data.type === "error") {
+            throw new Error(data.message)
+          }
+        }
       }
-
-      setMessages((prev) => [...prev, assistantMessage])
     } catch (error) {
       console.error("Error calling chat API:", error)
 
-      // Add error message
+      // Add error message (replacing a partially streamed answer, if any)
       const errorMessage: Message = {
-        id: (Date.now() + 1).toString(),
+        id: assistantId,
         content: "Sorry, I'm having trouble connecting to the server. Please try again later.",
         role: "assistant",
         timestamp: new Date(),
       }
 
-      setMessages((prev) => [...prev, errorMessage])
+      setMessages((prev) => [...prev.filter((message) => message.id !== assistantId), errorMessage])
     } finally {
       setIsLoading(false)
     }